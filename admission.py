@@ -0,0 +1,200 @@
+# admission.py — rate limits and an analysis concurrency cap shared by all workers
+# --------------------------------------------------------------
+# One tab or script hammering /session burns the OpenAI quota, and a flood
+# of /analyze calls can tie up every worker. RateLimiter keeps token buckets
+# (capacity N, refilled at N per period) in a local SQLite file, so every
+# gunicorn worker on the machine draws from the same buckets; a request
+# that finds a bucket empty is refused at once with the time until the next
+# token. ConcurrencyLimit caps analyses in flight across all workers and
+# refuses the rest right away instead of letting them queue into timeouts.
+#
+# Both fail open: if the database cannot be used, requests are let through
+# and the error is counted.
+
+import math
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from local_db import LocalDB, pid_alive
+
+ADMISSION_PATH = os.getenv(
+    "ADMISSION_PATH", os.path.join(tempfile.gettempdir(), "msu-task-chat-admission.sqlite3"))
+ANALYSIS_MAX_INFLIGHT = int(os.getenv("ANALYSIS_MAX_INFLIGHT", str(max(2, 2 * (os.cpu_count() or 1)))))
+ANALYSIS_SLOT_TIMEOUT = float(os.getenv("ANALYSIS_SLOT_TIMEOUT", "600"))  # seconds before a slot is reclaimed
+ANALYSIS_OVERLOAD_RETRY_AFTER = int(os.getenv("ANALYSIS_OVERLOAD_RETRY_AFTER", "5"))
+
+BUCKET_MAX_IDLE = 3600  # seconds; an idle bucket is full again long before this, so its row can go
+PURGE_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slots (
+    id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL
+);
+"""
+
+
+def parse_limit(spec):
+    """'N/SECONDS' -> (N, SECONDS); '' or '0' -> None (no limit). Raises ValueError."""
+    spec = (spec or "").strip()
+    if spec in ("", "0"):
+        return None
+    count, _, period = spec.partition("/")
+    count, period = int(count), float(period or 60)
+    if count <= 0 or period <= 0:
+        raise ValueError(f"Invalid rate limit {spec!r}, expected N/SECONDS")
+    return count, period
+
+
+class RateLimited(Exception):
+    """A token bucket is empty; retry_after is the wait in seconds for the next token."""
+
+    def __init__(self, retry_after, scope):
+        super().__init__(f"Rate limit exceeded ({scope}), retry in {retry_after}s")
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+class Overloaded(Exception):
+    """Every analysis slot on the machine is taken."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many analyses in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token buckets shared by every worker through a local SQLite file."""
+
+    def __init__(self, path=ADMISSION_PATH):
+        self.path = path
+        self.db = LocalDB(path, SCHEMA, timeout=2)
+        self.counters = {"allowed": 0, "limited": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def acquire(self, buckets):
+        """
+        Take one token from every (key, scope, capacity, period) bucket, or
+        none of them and raise RateLimited naming the bucket that ran out.
+        """
+        if not buckets:
+            return
+        now = time.time()
+        try:
+            with self.db.transaction() as db:
+                levels, short = [], None
+                for key, scope, capacity, period in buckets:
+                    row = db.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                    tokens = capacity if row is None else \
+                        min(capacity, row[0] + (now - row[1]) * capacity / period)
+                    if tokens < 1:
+                        wait = (1 - tokens) * period / capacity
+                        if short is None or wait > short[0]:
+                            short = (wait, scope)
+                    levels.append((key, tokens - 1))
+                if short is None:
+                    db.executemany("INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                                   [(key, tokens, now) for key, tokens in levels])
+                if now - self._last_purge > PURGE_INTERVAL:
+                    self._last_purge = now
+                    db.execute("DELETE FROM buckets WHERE updated_at < ?", (now - BUCKET_MAX_IDLE,))
+        except sqlite3.Error:
+            self._count("errors")
+            return  # fail open
+        if short is not None:
+            self._count("limited")
+            raise RateLimited(max(1, math.ceil(short[0])), short[1])
+        self._count("allowed")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+class ConcurrencyLimit:
+    """At most `limit` slots held at once across every worker; 0 means no cap."""
+
+    def __init__(self, limit=ANALYSIS_MAX_INFLIGHT, path=ADMISSION_PATH, timeout=ANALYSIS_SLOT_TIMEOUT,
+                 retry_after=ANALYSIS_OVERLOAD_RETRY_AFTER):
+        self.limit = limit
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.db = LocalDB(path, SCHEMA, timeout=2)
+        self.counters = {"admitted": 0, "rejected": 0, "reclaimed": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, count=1):
+        """
+        Hold count slots (at most the limit) for the block, all or none;
+        raises Overloaded when fewer are free.
+        """
+        if self.limit <= 0:
+            yield
+            return
+        slot_ids = self._acquire(max(1, min(count, self.limit)))
+        try:
+            yield
+        finally:
+            if slot_ids:
+                try:
+                    self.db.connection().executemany("DELETE FROM slots WHERE id = ?",
+                                                     [(slot_id,) for slot_id in slot_ids])
+                except sqlite3.Error:
+                    self._count("errors")  # reclaimed after the timeout
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["limit"] = self.limit
+        try:
+            stats["in_flight"] = self.db.connection().execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+        except sqlite3.Error:
+            stats["in_flight"] = None
+        return stats
+
+    def _acquire(self, count):
+        slot_ids = [secrets.token_hex(8) for _ in range(count)]
+        now = time.time()
+        try:
+            with self.db.transaction() as db:
+                in_flight = db.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+                if in_flight + count > self.limit:
+                    # Slots of workers that died or hung mid-analysis
+                    stale = [slot for slot, pid, started_at in db.execute("SELECT id, pid, started_at FROM slots")
+                             if started_at < now - self.timeout or not pid_alive(pid)]
+                    db.executemany("DELETE FROM slots WHERE id = ?", [(slot,) for slot in stale])
+                    self._count("reclaimed", len(stale))
+                    in_flight -= len(stale)
+                admitted = in_flight + count <= self.limit
+                if admitted:
+                    db.executemany("INSERT INTO slots (id, pid, started_at) VALUES (?, ?, ?)",
+                                   [(slot_id, os.getpid(), now) for slot_id in slot_ids])
+        except sqlite3.Error:
+            self._count("errors")
+            return None  # fail open
+        if not admitted:
+            self._count("rejected")
+            raise Overloaded(self.retry_after)
+        self._count("admitted")
+        return slot_ids
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
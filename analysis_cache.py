@@ -0,0 +1,148 @@
+# analysis_cache.py — analysis results shared by all workers, keyed by transcript
+# --------------------------------------------------------------
+# Learners often press "Analyze My Chat" several times on the same
+# conversation. Results are stored in a local SQLite file under a SHA-256
+# of the normalized conversation plus the bot id, so a repeat from any
+# gunicorn worker (or analysis process) on the same machine is a lookup.
+#
+# Entries older than ANALYSIS_CACHE_TTL seconds are ignored and deleted;
+# beyond ANALYSIS_CACHE_MAX_ENTRIES the least recently used go first.
+# ANALYSIS_CACHE_MAX_ENTRIES=0 disables the cache. The cache is an
+# optimization only: any SQLite error is counted and treated as a miss.
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from local_db import LocalDB
+
+ANALYSIS_CACHE_PATH = os.getenv(
+    "ANALYSIS_CACHE_PATH", os.path.join(tempfile.gettempdir(), "msu-task-chat-analysis-cache.sqlite3"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "2000"))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "86400"))  # seconds
+
+# Bump when the metrics change, so results computed by older code are not served
+ANALYSIS_CACHE_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_last_used ON analyses (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def conversation_key(conversation, bot_id):
+    """
+    Hash of the conversation's roles and texts plus bot_id. Whitespace is
+    collapsed, since none of the metrics depend on it, and any other message
+    fields are ignored.
+    """
+    normalized = [[msg.get("role"), " ".join(str(msg.get("text", "")).split())]
+                  for msg in conversation]
+    payload = json.dumps([ANALYSIS_CACHE_VERSION, bot_id, normalized],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    SQLite-backed map from conversation_key() to a JSON-serializable
+    analysis dict. Safe to use from several threads and processes.
+    """
+
+    def __init__(self, path=ANALYSIS_CACHE_PATH, max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+                 ttl=ANALYSIS_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.errors = 0  # per process; hits and misses are counted in the database
+        self.last_error = None
+        self.db = LocalDB(path, SCHEMA, timeout=5)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """The cached analysis for key, or None."""
+        if not self.enabled:
+            return None
+        try:
+            now = time.time()
+            with self.db.transaction() as db:
+                row = db.execute("SELECT value FROM analyses WHERE key = ? AND created_at > ?",
+                                 (key, now - self.ttl)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE analyses SET last_used = ? WHERE key = ?", (now, key))
+                self._count(db, "hits" if row is not None else "misses")
+            return json.loads(row[0]) if row is not None else None
+        except (sqlite3.Error, ValueError) as e:
+            self._failed(e)
+            return None
+
+    def put(self, key, analysis):
+        """Store analysis under key and evict expired and least recently used entries."""
+        if not self.enabled:
+            return
+        try:
+            value = json.dumps(analysis, ensure_ascii=False)
+            now = time.time()
+            with self.db.transaction() as db:
+                db.execute("INSERT OR REPLACE INTO analyses (key, value, created_at, last_used) "
+                           "VALUES (?, ?, ?, ?)", (key, value, now, now))
+                evicted = db.execute("DELETE FROM analyses WHERE created_at <= ?", (now - self.ttl,)).rowcount
+                evicted += db.execute(
+                    "DELETE FROM analyses WHERE key IN "
+                    "(SELECT key FROM analyses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)).rowcount
+                self._count(db, "stores")
+                if evicted:
+                    self._count(db, "evictions", evicted)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self._failed(e)
+
+    def clear(self):
+        with self.db.transaction() as db:
+            db.execute("DELETE FROM analyses")
+            db.execute("DELETE FROM counters")
+
+    def stats(self):
+        stats = {
+            "enabled": self.enabled,
+            "path": self.path,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "errors_this_process": self.errors,
+            "last_error": self.last_error
+        }
+        if not self.enabled:
+            return stats
+        try:
+            db = self.db.connection()
+            stats.update({"hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+            stats.update(db.execute("SELECT name, value FROM counters").fetchall())
+            stats["entries"] = db.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+        except sqlite3.Error as e:
+            self._failed(e)
+        return stats
+
+    def _count(self, db, name, amount=1):
+        db.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def _failed(self, e):
+        self.errors += 1
+        self.last_error = f"{type(e).__name__}: {e}"
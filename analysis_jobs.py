@@ -0,0 +1,270 @@
+# analysis_jobs.py — asynchronous analysis jobs with progress and cancellation
+# --------------------------------------------------------------
+# A 30-minute practice session takes a while to analyze, and running it
+# inside the request holds a request thread and risks gunicorn's timeout.
+# Instead the page submits a job, polls its status (state, progress, queue
+# position) and downloads the report once it is done.
+#
+# Jobs live in a local SQLite file, so a status poll or download can land on
+# any worker. Every worker runs ANALYSIS_JOB_RUNNERS runner threads that
+# claim queued jobs and hand them to the analysis process pool, so request
+# threads only ever insert or read a row. At most ANALYSIS_JOB_QUEUE_MAX
+# jobs may be queued or running per machine; past that, submit() raises
+# QueueFull with a suggested retry delay. Finished jobs are kept for
+# ANALYSIS_JOB_TTL seconds. A running job whose worker stops sending
+# heartbeats for ANALYSIS_JOB_STALE seconds is marked failed.
+
+import json
+import math
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+from local_db import LocalDB
+
+ANALYSIS_JOBS_PATH = os.getenv(
+    "ANALYSIS_JOBS_PATH", os.path.join(tempfile.gettempdir(), "msu-task-chat-analysis-jobs.sqlite3"))
+ANALYSIS_JOB_RUNNERS = int(os.getenv("ANALYSIS_JOB_RUNNERS", "1"))  # per worker
+ANALYSIS_JOB_QUEUE_MAX = int(os.getenv("ANALYSIS_JOB_QUEUE_MAX", "32"))  # queued + running, per machine
+ANALYSIS_JOB_TTL = float(os.getenv("ANALYSIS_JOB_TTL", "3600"))  # seconds a finished job is kept
+ANALYSIS_JOB_STALE = float(os.getenv("ANALYSIS_JOB_STALE", "60"))  # seconds without a heartbeat
+
+POLL_INTERVAL = 1.0  # seconds between checks for jobs submitted to other workers
+PURGE_INTERVAL = 60
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    progress TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state_created ON jobs (state, created_at);
+"""
+
+
+class QueueFull(Exception):
+    """Too many jobs queued or running; retry_after is a suggested delay in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Analysis queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobCancelled(Exception):
+    """Raised from inside a job once cancellation has been requested."""
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue. run(job_id, payload) executes one job and
+    returns its JSON-serializable result; it may call progress() to report
+    how far it got, which raises JobCancelled once the job is cancelled.
+    """
+
+    def __init__(self, run, path=ANALYSIS_JOBS_PATH, runners=ANALYSIS_JOB_RUNNERS,
+                 queue_max=ANALYSIS_JOB_QUEUE_MAX, ttl=ANALYSIS_JOB_TTL, stale=ANALYSIS_JOB_STALE):
+        self.run = run
+        self.path = path
+        self.runners = max(1, runners)
+        self.queue_max = queue_max
+        self.ttl = ttl
+        self.stale = stale
+        self.db = LocalDB(path, SCHEMA)
+        self._wake = threading.Event()
+        self._running = set()  # job ids being run by this process
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_purge = 0.0
+
+    def submit(self, payload, result=None):
+        """
+        Queue a job and return its id. Passing result records an already
+        finished job (e.g. a cache hit), so it is polled and downloaded the
+        same way. Raises QueueFull.
+        """
+        self._ensure_started()
+        job_id = secrets.token_urlsafe(12)
+        now = time.time()
+        with self.db.transaction() as db:
+            if result is None:
+                active = db.execute("SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)",
+                                    (QUEUED, RUNNING)).fetchone()[0]
+                if active >= self.queue_max:
+                    raise QueueFull(self._retry_after(db, active))
+                db.execute("INSERT INTO jobs (id, state, payload, created_at) VALUES (?, ?, ?, ?)",
+                           (job_id, QUEUED, json.dumps(payload), now))
+            else:
+                db.execute("INSERT INTO jobs (id, state, payload, result, created_at, started_at, finished_at) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (job_id, DONE, json.dumps(payload), json.dumps(result), now, now, now))
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id):
+        """Public view of a job (no payload or result), or None if unknown."""
+        self._ensure_started()  # pick up jobs left queued by a worker that went away
+        db = self.db.connection()
+        row = db.execute("SELECT state, error, progress, cancel_requested, created_at, started_at, finished_at "
+                         "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        state, error, progress, cancel_requested, created_at, started_at, finished_at = row
+        status = {
+            "job_id": job_id,
+            "state": state,
+            "progress": json.loads(progress) if progress else None,
+            "error": error,
+            "cancel_requested": bool(cancel_requested),
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at
+        }
+        if state == QUEUED:
+            status["queue_position"] = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ? AND created_at < ?", (QUEUED, created_at)).fetchone()[0]
+        return status
+
+    def result(self, job_id):
+        """(payload, result) of a finished job, or None if it is not done."""
+        row = self.db.connection().execute(
+            "SELECT payload, result FROM jobs WHERE id = ? AND state = ?", (job_id, DONE)).fetchone()
+        return (json.loads(row[0]), json.loads(row[1])) if row else None
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or ask a running one to stop. Returns the new status."""
+        now = time.time()
+        with self.db.transaction() as db:
+            db.execute("UPDATE jobs SET state = ?, finished_at = ?, progress = NULL WHERE id = ? AND state = ?",
+                       (CANCELLED, now, job_id, QUEUED))
+            db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = ?", (job_id, RUNNING))
+        return self.status(job_id)
+
+    def progress(self, job_id, stage, done=None, total=None):
+        """Record progress and heartbeat; raises JobCancelled if the job was cancelled."""
+        progress = {"stage": stage}
+        if total:
+            progress.update(done=done, total=total, percent=round(100 * done / total))
+        db = self.db.connection()
+        db.execute("UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ?",
+                   (json.dumps(progress), time.time(), job_id))
+        row = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0]:
+            raise JobCancelled(job_id)
+
+    def stats(self):
+        db = self.db.connection()
+        stats = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+        stats.update(db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        avg = db.execute("SELECT AVG(finished_at - started_at) FROM (SELECT finished_at, started_at FROM jobs "
+                         "WHERE state = ? ORDER BY finished_at DESC LIMIT 50)", (DONE,)).fetchone()[0]
+        stats.update({
+            "avg_run_seconds": round(avg, 3) if avg is not None else None,
+            "queue_max": self.queue_max,
+            "runners_per_worker": self.runners,
+            "running_here": len(self._running)
+        })
+        return stats
+
+    def _retry_after(self, db, active):
+        # Rough time until a slot frees up: recent average run time, spread
+        # over the runners of this worker, bounded to something sensible
+        avg = db.execute("SELECT AVG(finished_at - started_at) FROM (SELECT finished_at, started_at FROM jobs "
+                         "WHERE state = ? ORDER BY finished_at DESC LIMIT 50)", (DONE,)).fetchone()[0]
+        estimate = (avg or 2.0) * (active - self.queue_max + 1) / self.runners
+        return int(min(60, max(1, math.ceil(estimate))))
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so each worker starts its own runners
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._running = set()
+        for i in range(self.runners):
+            threading.Thread(target=self._run_forever, name=f"analysis-job-{i}", daemon=True).start()
+        threading.Thread(target=self._heartbeat_forever, name="analysis-job-heartbeat", daemon=True).start()
+
+    def _claim(self):
+        now = time.time()
+        with self.db.transaction() as db:
+            row = db.execute("SELECT id, payload FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1",
+                             (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET state = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                       (RUNNING, now, now, row[0]))
+        return row[0], json.loads(row[1])
+
+    def _finish(self, job_id, state, result=None, error=None):
+        self.db.connection().execute(
+            "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (state, json.dumps(result) if result is not None else None, error, time.time(), job_id))
+
+    def _run_forever(self):
+        while True:
+            try:
+                claimed = self._claim()
+            except Exception:
+                claimed = None  # database busy; try again shortly
+            if claimed is None:
+                self._maintain()
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+
+            job_id, payload = claimed
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                self._finish(job_id, DONE, result=self.run(job_id, payload))
+            except JobCancelled:
+                self._finish(job_id, CANCELLED)
+            except Exception as e:
+                self._finish(job_id, FAILED, error=f"{type(e).__name__}: {e}")
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    def _heartbeat_forever(self):
+        # Keeps long single steps of a job from looking like a dead worker
+        while True:
+            time.sleep(self.stale / 3)
+            with self._lock:
+                running = list(self._running)
+            if running:
+                try:
+                    self.db.connection().executemany(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE id = ?", [(time.time(), j) for j in running])
+                except Exception:
+                    pass
+
+    def _maintain(self):
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            with self.db.transaction() as db:
+                db.execute("UPDATE jobs SET state = ?, error = ?, finished_at = ? "
+                           "WHERE state = ? AND heartbeat_at < ?",
+                           (FAILED, "Worker stopped while running the job", now, RUNNING, now - self.stale))
+                db.execute("DELETE FROM jobs WHERE state IN (?, ?, ?) AND finished_at < ?",
+                           (*FINISHED_STATES, now - self.ttl))
+        except Exception:
+            pass
@@ -0,0 +1,226 @@
+# analysis_pool.py — run CPU-bound analyses outside the request threads
+# --------------------------------------------------------------
+# With threaded workers (see gunicorn.conf.py) /session requests spend
+# their time waiting on OpenAI with the GIL released, but an /analyze run
+# tokenizing, tagging and scoring a long transcript holds the GIL and slows
+# every other thread in the worker. Analyses therefore run in a small pool
+# of child processes, so a class pressing "Analyze My Chat" at once cannot
+# starve session creation.
+#
+# The children are forked from the worker, so they share the NLP models it
+# already loaded. At most ANALYSIS_MAX_PENDING analyses may be queued or
+# running per worker; past that, callers wait up to ANALYSIS_QUEUE_TIMEOUT
+# seconds for a slot and then get AnalysisBusy. ANALYSIS_PROCESSES=0 runs
+# analyses inline in the request thread, as before.
+#
+# Batch analysis (/analyze/batch) uses a separate pool of
+# ANALYSIS_BATCH_PROCESSES processes, started on the first batch, and fans a
+# whole roster out over it with imap_unordered(). The default splits the
+# machine's cores between the WEB_CONCURRENCY workers (at least one each),
+# so the batch pools of all workers together use about one process per core.
+# Every call queued or running holds one of the pool's max_pending slots
+# (default: two per process), so concurrent batches in a worker share the
+# processes instead of each queueing a full window.
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+ANALYSIS_PROCESSES = int(os.getenv("ANALYSIS_PROCESSES", "1"))  # per worker; 0 = inline
+ANALYSIS_MAX_PENDING = int(os.getenv("ANALYSIS_MAX_PENDING", "8"))  # queued + running, per worker
+ANALYSIS_QUEUE_TIMEOUT = float(os.getenv("ANALYSIS_QUEUE_TIMEOUT", "5"))  # seconds to wait for a slot
+ANALYSIS_BATCH_PROCESSES = int(os.getenv(  # per worker
+    "ANALYSIS_BATCH_PROCESSES", str(max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("WEB_CONCURRENCY", "1")))))))
+
+
+class AnalysisBusy(Exception):
+    """Every analysis slot in this worker stayed taken for the whole timeout."""
+
+
+def _init_child(parent_pid):
+    # A worker killed with SIGKILL cannot shut its pool down; exit with it
+    # instead of lingering as an orphan
+    def watch_parent():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=watch_parent, name="parent-watch", daemon=True).start()
+
+
+def _noop():
+    return os.getpid()
+
+
+class AnalysisPool:
+    """
+    Per-process pool that runs fn(*args) in forked child processes. fn and
+    its arguments must be picklable, i.e. module-level functions and plain data.
+    """
+
+    def __init__(self, processes=ANALYSIS_PROCESSES, max_pending=ANALYSIS_MAX_PENDING,
+                 queue_timeout=ANALYSIS_QUEUE_TIMEOUT):
+        self.processes = processes
+        self.max_pending = max(1, max_pending)
+        self.queue_timeout = queue_timeout
+        self.counters = {
+            "completed": 0,
+            "failed": 0,
+            "rejected_busy": 0,
+            "pool_restarts": 0,
+            "wait_ms_max": 0.0
+        }
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return self.processes > 0
+
+    def start(self):
+        """Fork the child processes now rather than on the first analysis."""
+        executor = self._get_executor()
+        if executor is not None:
+            for future in [executor.submit(_noop) for _ in range(self.processes)]:
+                future.result()
+
+    def run(self, fn, *args):
+        """Run fn(*args) in the pool (or inline when disabled) and return its result."""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.counters["rejected_busy"] += 1
+            raise AnalysisBusy(f"{self.max_pending} analyses already in progress")
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._pending += 1
+            self.counters["wait_ms_max"] = max(self.counters["wait_ms_max"], wait_ms)
+
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                result = fn(*args)
+            else:
+                try:
+                    result = executor.submit(fn, *args).result()
+                except BrokenProcessPool:
+                    self._discard_executor(executor)
+                    raise
+        except Exception:
+            with self._lock:
+                self.counters["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+        with self._lock:
+            self.counters["completed"] += 1
+        return result
+
+    def imap_unordered(self, fn, arg_tuples):
+        """
+        Run fn(*args) for every args in arg_tuples, keeping every process
+        busy, and yield (position, result, error) as each call finishes.
+        A failing call yields its exception and does not stop the others.
+        Each queued or running call holds a slot; with none free, the caller
+        waits for its own calls to finish, or for another caller's.
+        """
+        executor = self._get_executor()
+        if executor is None:
+            for position, args in enumerate(arg_tuples):
+                try:
+                    yield position, fn(*args), None
+                except Exception as e:
+                    yield position, None, e
+            return
+
+        items = enumerate(arg_tuples)
+        item = next(items, None)
+        pending = {}
+        try:
+            while True:
+                # Blocking only when nothing of ours is running, so two
+                # callers each holding slots cannot wait on each other
+                while item is not None and self._slots.acquire(blocking=not pending):
+                    position, args = item
+                    pending[self._submit(executor, fn, args)] = (position, executor)
+                    item = next(items, None)
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    position, owner = pending.pop(future)
+                    try:
+                        result, error = future.result(), None
+                    except BrokenProcessPool as e:
+                        # Everything queued on the dead pool fails; new work goes to a fresh one
+                        self._discard_executor(owner)
+                        executor = self._get_executor()
+                        result, error = None, e
+                    except Exception as e:
+                        result, error = None, e
+                    with self._lock:
+                        self.counters["completed" if error is None else "failed"] += 1
+                    yield position, result, error
+        finally:
+            for future in pending:
+                future.cancel()  # the caller stopped listening
+
+    def _submit(self, executor, fn, args):
+        # The slot taken by the caller is released when the call finishes,
+        # is cancelled or fails, even if nobody reads the result
+        with self._lock:
+            self._pending += 1
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._release_slot()
+            raise
+        future.add_done_callback(self._release_slot)
+        return future
+
+    def _release_slot(self, _=None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["pending"] = self._pending
+        stats["enabled"] = self.enabled
+        stats["processes"] = self.processes
+        stats["max_pending"] = self.max_pending
+        return stats
+
+    def _get_executor(self):
+        # Child processes belong to the worker that forked them; a fresh
+        # worker (or the gunicorn master's copy of this object) makes its own
+        if not self.enabled:
+            return None
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=_init_child,
+                    initargs=(pid,)
+                )
+                self._pid = pid
+            return self._executor
+
+    def _discard_executor(self, executor):
+        # A child died mid-analysis (e.g. out of memory); start a new pool
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.counters["pool_restarts"] += 1
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,192 @@
+# analysis_sessions.py — running analysis aggregates for conversations in progress
+# --------------------------------------------------------------
+# The browser posts each turn to /analyze/turns as it is appended to the
+# transcript. The turn is stored and its counts (see turn_counts() in
+# server.py) are folded into the session's aggregate, so "Analyze My Chat"
+# only has to derive the metrics from that aggregate instead of re-analyzing
+# the whole practice session, and the final upload is just the session id.
+#
+# Sessions live in a local SQLite file shared by every worker, since turns
+# of one conversation can land on different workers. Turns are keyed by
+# their position in the transcript, so a retried post is ignored and turns
+# may arrive in any order. Sessions idle for ANALYSIS_SESSION_TTL seconds
+# are deleted. Turns longer than ANALYSIS_SESSION_MAX_TURN_CHARS and new
+# sessions beyond ANALYSIS_SESSION_MAX_LIVE live ones are refused, so the
+# file cannot be grown without bound.
+
+import json
+import os
+import tempfile
+import time
+
+from local_db import LocalDB
+
+ANALYSIS_SESSIONS_PATH = os.getenv(
+    "ANALYSIS_SESSIONS_PATH", os.path.join(tempfile.gettempdir(), "msu-task-chat-analysis-sessions.sqlite3"))
+ANALYSIS_SESSION_TTL = float(os.getenv("ANALYSIS_SESSION_TTL", "21600"))  # seconds since the last turn
+ANALYSIS_SESSION_MAX_TURNS = int(os.getenv("ANALYSIS_SESSION_MAX_TURNS", "2000"))
+ANALYSIS_SESSION_MAX_TURN_CHARS = int(os.getenv("ANALYSIS_SESSION_MAX_TURN_CHARS", "10000"))
+ANALYSIS_SESSION_MAX_LIVE = int(os.getenv("ANALYSIS_SESSION_MAX_LIVE", "2000"))  # whole machine
+
+PURGE_INTERVAL = 60  # seconds between sweeps for expired sessions, per process
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    bot_id TEXT,
+    aggregate TEXT,
+    folded TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (session_id, idx)
+);
+"""
+
+
+class TooManyTurns(Exception):
+    """The session already holds ANALYSIS_SESSION_MAX_TURNS turns."""
+
+
+class TurnTooLong(Exception):
+    """A turn's text is longer than ANALYSIS_SESSION_MAX_TURN_CHARS."""
+
+
+class TooManySessions(Exception):
+    """ANALYSIS_SESSION_MAX_LIVE sessions are live; retry_after is a suggested delay in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many conversations in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AnalysisSessionStore:
+    """
+    Transcript plus running aggregate per session id. The aggregate is
+    opaque here: fold(aggregate, counts) merges one turn's counts into it
+    (aggregate is None for the first folded turn) and returns it, and
+    load_aggregate() restores it after the JSON round trip.
+    """
+
+    def __init__(self, fold, load_aggregate, path=ANALYSIS_SESSIONS_PATH, ttl=ANALYSIS_SESSION_TTL,
+                 max_turns=ANALYSIS_SESSION_MAX_TURNS, max_turn_chars=ANALYSIS_SESSION_MAX_TURN_CHARS,
+                 max_live=ANALYSIS_SESSION_MAX_LIVE):
+        self.fold = fold
+        self.load_aggregate = load_aggregate
+        self.path = path
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.max_turn_chars = max_turn_chars
+        self.max_live = max_live
+        self.db = LocalDB(path, SCHEMA)
+        self._last_purge = 0.0
+
+    def check(self, session_id, texts):
+        """
+        Raise TurnTooLong or TooManySessions if add_turns() would refuse
+        these turn texts, so callers can skip counting them. add_turns()
+        checks again, since other workers may add sessions in between.
+        """
+        self._check_lengths(texts)
+        db = self.db.connection()
+        if db.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is None:
+            self._check_room(db, time.time())
+
+    def add_turns(self, session_id, bot_id, turns):
+        """
+        Store turns, given as (index, role, text, counts) tuples, and fold the
+        counts of the new ones into the aggregate. counts=None stores the turn
+        without folding it (e.g. while the NLP models are still loading).
+        Returns the number of turns stored for the session.
+        """
+        self._check_lengths(text for _, _, text, _ in turns)
+        self._maybe_purge()
+        now = time.time()
+        with self.db.transaction() as db:  # one writer per session update, across workers
+            row = db.execute("SELECT aggregate, folded FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                self._check_room(db, now)
+                aggregate, folded = None, []
+                db.execute("INSERT INTO sessions (id, bot_id, aggregate, folded, updated_at) "
+                           "VALUES (?, ?, NULL, '[]', ?)", (session_id, bot_id, now))
+            else:
+                aggregate = self.load_aggregate(json.loads(row[0])) if row[0] else None
+                folded = json.loads(row[1])
+
+            stored = db.execute("SELECT COUNT(*) FROM turns WHERE session_id = ?", (session_id,)).fetchone()[0]
+            for index, role, text, counts in turns:
+                inserted = db.execute("INSERT OR IGNORE INTO turns (session_id, idx, role, text) "
+                                      "VALUES (?, ?, ?, ?)", (session_id, index, role, text)).rowcount
+                if not inserted:
+                    continue  # already stored by an earlier (retried) post
+                if stored >= self.max_turns:
+                    raise TooManyTurns(f"Sessions are limited to {self.max_turns} turns")  # rolls back the post
+                stored += 1
+                if counts is not None:
+                    aggregate = self.fold(aggregate, counts)
+                    folded.append(index)
+
+            db.execute("UPDATE sessions SET aggregate = ?, folded = ?, updated_at = ? WHERE id = ?",
+                       (json.dumps(aggregate) if aggregate is not None else None,
+                        json.dumps(folded), now, session_id))
+        return stored
+
+    def load(self, session_id):
+        """
+        The session as {"bot_id", "turns": [(index, role, text)], "folded": set,
+        "aggregate"}, or None if it does not exist or has expired.
+        """
+        db = self.db.connection()
+        row = db.execute("SELECT bot_id, aggregate, folded FROM sessions WHERE id = ? AND updated_at > ?",
+                         (session_id, time.time() - self.ttl)).fetchone()
+        if row is None:
+            return None
+        turns = db.execute("SELECT idx, role, text FROM turns WHERE session_id = ? ORDER BY idx",
+                           (session_id,)).fetchall()
+        return {
+            "bot_id": row[0],
+            "turns": turns,
+            "folded": set(json.loads(row[2])),
+            "aggregate": self.load_aggregate(json.loads(row[1])) if row[1] else None
+        }
+
+    def delete(self, session_id):
+        with self.db.transaction() as db:
+            db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self):
+        db = self.db.connection()
+        return {
+            "path": self.path,
+            "ttl_seconds": self.ttl,
+            "max_turns": self.max_turns,
+            "max_turn_chars": self.max_turn_chars,
+            "max_live": self.max_live,
+            "sessions": db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            "turns": db.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+        }
+
+    def _check_lengths(self, texts):
+        if any(len(text) > self.max_turn_chars for text in texts):
+            raise TurnTooLong(f"Turns are limited to {self.max_turn_chars} characters")
+
+    def _check_room(self, db, now):
+        live = db.execute("SELECT COUNT(*) FROM sessions WHERE updated_at > ?", (now - self.ttl,)).fetchone()[0]
+        if live >= self.max_live:
+            raise TooManySessions(PURGE_INTERVAL)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        with self.db.transaction() as db:
+            db.execute("DELETE FROM turns WHERE session_id IN (SELECT id FROM sessions WHERE updated_at <= ?)",
+                       (now - self.ttl,))
+            db.execute("DELETE FROM sessions WHERE updated_at <= ?", (now - self.ttl,))
@@ -0,0 +1,55 @@
+# benchmarks/batch_throughput.py — batch analysis throughput by process count
+# --------------------------------------------------------------
+# Run from the repository root (needs the NLTK data, see nltk_bundle.py):
+#   python -m benchmarks.batch_throughput [--students 60] [--turns 60]
+#
+# Analyzes the same synthetic class roster through AnalysisPool.imap_unordered
+# (what /analyze/batch uses) with 1, 2, 4, ... processes up to the number of
+# cores, bypassing the analysis cache, and prints conversations per second.
+# Throughput should grow close to linearly until the cores run out.
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("NLP_WARMUP", "eager")
+
+import analysis_pool  # noqa: E402
+import server  # noqa: E402
+from benchmarks.synthetic import make_roster  # noqa: E402
+
+
+def process_counts(cores):
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure batch analysis throughput per process count.")
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if not server.ANALYSIS_AVAILABLE:
+        raise SystemExit(f"NLP analysis unavailable: {server.NLP_ERROR_MESSAGE}")
+    roster = [(item["conversation"], item["bot_id"]) for item in make_roster(args.students, args.turns)]
+
+    print(f"{'processes':>10}{'seconds':>10}{'conv/s':>10}{'speedup':>10}{'errors':>8}")
+    baseline = None
+    for processes in process_counts(args.max_processes):
+        pool = analysis_pool.AnalysisPool(processes=processes)
+        pool.start()  # fork before timing
+        start = time.perf_counter()
+        errors = sum(1 for _, _, error in pool.imap_unordered(server.run_analysis, roster) if error)
+        elapsed = time.perf_counter() - start
+        rate = len(roster) / elapsed
+        baseline = baseline or rate
+        print(f"{processes:>10}{elapsed:>10.2f}{rate:>10.1f}{rate / baseline:>10.2f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
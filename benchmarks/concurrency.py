@@ -0,0 +1,108 @@
+# benchmarks/concurrency.py — /session throughput by worker class and concurrency
+# --------------------------------------------------------------
+# Run from the repository root:
+#   python -m benchmarks.concurrency [--latency 0.5] [--levels 1,2,4,8,16]
+#
+# Points one gunicorn worker at a local stub that takes --latency seconds
+# per session (standing in for OpenAI), then sends --rounds x N concurrent
+# /session requests at each concurrency level N while --analyze-clients
+# threads keep posting /analyze. Done once with the sync worker and once
+# with the threaded one: sync throughput stays at about 1/latency however
+# many learners connect, threaded throughput grows with N up to
+# GUNICORN_THREADS, and /analyze running in the analysis processes does not
+# push /session latency up.
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.gunicorn_runner import NO_RATE_LIMITS, running_gunicorn
+from benchmarks.fake_upstream import start_fake
+
+WORKER_CLASSES = {
+    "sync": {"GUNICORN_WORKER_CLASS": "sync"},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread"}
+}
+
+CONVERSATION = [
+    {"role": "assistant" if i % 2 else "user",
+     "text": "Well, I think the report is, um, basically finished but we still need to "
+             "double-check the figures with the finance team before Friday."}
+    for i in range(40)
+]
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+def create_session(base_url):
+    start = time.perf_counter()
+    resp = requests.post(f"{base_url}/session", json={"bot_id": "apt-en"}, timeout=60)
+    resp.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def keep_analyzing(base_url, stop, counts):
+    with requests.Session() as http:
+        while not stop.is_set():
+            resp = http.post(f"{base_url}/analyze", json={"conversation": CONVERSATION}, timeout=60)
+            counts[resp.status_code] = counts.get(resp.status_code, 0) + 1
+
+
+def run_level(base_url, concurrency, rounds, analyze_clients):
+    stop = threading.Event()
+    analyze_counts = {}
+    analyzers = [threading.Thread(target=keep_analyzing, args=(base_url, stop, analyze_counts), daemon=True)
+                 for _ in range(analyze_clients)]
+    for t in analyzers:
+        t.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = sorted(pool.map(lambda _: create_session(base_url), range(concurrency * rounds)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    for t in analyzers:
+        t.join()
+    return {
+        "concurrency": concurrency,
+        "sessions_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "analyses": sum(analyze_counts.values())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare /session concurrency of sync and threaded workers.")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub upstream delay in seconds")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=2, help="requests per client at each level")
+    parser.add_argument("--threads", type=int, default=8, help="GUNICORN_THREADS for gthread")
+    parser.add_argument("--analyze-clients", type=int, default=2)
+    args = parser.parse_args()
+    levels = [int(n) for n in args.levels.split(",")]
+
+    stub, stub_url, _ = start_fake(latency=args.latency)
+    print(f"{'worker':<9}{'clients':>8}{'sessions/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'analyses':>10}")
+    try:
+        for name, env in WORKER_CLASSES.items():
+            env = dict(env, OPENAI_API_BASE=stub_url, OPENAI_API_KEY="sk-bench",
+                       GUNICORN_THREADS=str(args.threads), NLP_WARMUP="eager", **NO_RATE_LIMITS)
+            with running_gunicorn(env, workers=1, args=["--timeout", "120"]) as (_, base_url):
+                for concurrency in levels:
+                    row = run_level(base_url, concurrency, args.rounds, args.analyze_clients)
+                    print(f"{name:<9}{row['concurrency']:>8}{row['sessions_per_s']:>12}"
+                          f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['analyses']:>10}")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# benchmarks/fake_upstream.py — local stand-in for the OpenAI Realtime API
+# --------------------------------------------------------------
+# Emulates what the app talks to upstream, so the whole stack can be run
+# and load-tested offline:
+#   POST /v1/realtime/sessions      mints a fake ephemeral session after
+#                                   --latency (+/- --jitter) seconds; fails
+#                                   with --error-status at --error-rate and
+#                                   answers 429 beyond --rate-limit N/SECONDS
+#   POST /v1/realtime               the SDP exchange: same latency and
+#                                   errors, answers a placeholder SDP. It is
+#                                   not a WebRTC peer, so browsers use replay
+#   GET  /v1/realtime/recordings    names of the recorded event streams
+#   GET  /v1/realtime/replay/<name> a recorded data-channel event stream as
+#                                   NDJSON, paced as recorded (?speed=4 plays
+#                                   four times faster, ?speed=0 at once)
+#
+# Recordings are JSONL files in benchmarks/recordings/ (or --recordings),
+# one {"t": seconds since start, "event": {...}} per line; "synthetic"
+# is always available and built from benchmarks.synthetic.
+#
+# Run it on its own and point the server at it:
+#   python -m benchmarks.fake_upstream --port 8100 --latency 0.3
+#   OPENAI_API_BASE=http://127.0.0.1:8100/v1 \
+#   RT_REPLAY_URL=http://127.0.0.1:8100/v1/realtime/replay/coffee_shop?speed=4 python server.py
+# With RT_REPLAY_URL set, Connect on /realtime plays the recording through
+# the page's event handler instead of opening a call, so transcripts,
+# /analyze/turns and "Analyze My Chat" all run as in class.
+
+import argparse
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from admission import parse_limit
+from benchmarks.synthetic import make_conversation
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+DEFAULT_MODEL = "gpt-4o-realtime-preview-2024-12-17"
+SESSION_LIFETIME = 60  # seconds, like the real ephemeral keys
+WORDS_PER_SECOND = 2.5  # speaking pace for synthetic recordings
+
+ERROR_BODIES = {
+    401: ("invalid_api_key", "You didn't provide an API key."),
+    404: ("not_found", "Unknown endpoint."),
+    429: ("rate_limit_exceeded", "Rate limit reached for realtime sessions. Please try again later."),
+    500: ("server_error", "The server had an error while processing your request."),
+    502: ("server_error", "Bad gateway."),
+    503: ("server_error", "The engine is currently overloaded, please try again later.")
+}
+
+PLACEHOLDER_SDP = (
+    "v=0\r\no=- 0 0 IN IP4 127.0.0.1\r\ns=fake-upstream\r\nt=0 0\r\n"
+    "m=audio 9 UDP/TLS/RTP/SAVPF 111\r\nc=IN IP4 0.0.0.0\r\na=inactive\r\n"
+)
+
+
+def load_recording(path):
+    """[(t, event)] from a JSONL recording, ordered by t."""
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                events.append((float(entry["t"]), entry["event"]))
+    events.sort(key=lambda entry: entry[0])
+    return events
+
+
+def recording_from_conversation(conversation, pause=0.8):
+    """
+    [(t, event)] for a conversation of {'role', 'text'} turns, timed as if
+    spoken at WORDS_PER_SECOND with `pause` seconds between turns. Learner
+    turns end in an input transcription, bot turns in an audio transcript
+    and response.done, as the Realtime API sends them.
+    """
+    events, t = [(0.0, {"type": "session.created"})], 0.0
+    for index, msg in enumerate(conversation):
+        t += pause + len(msg['text'].split()) / WORDS_PER_SECOND
+        item_id = f"item_fake_{index:04d}"
+        if msg['role'] == 'user':
+            events.append((t, {"type": "input_audio_buffer.committed", "item_id": item_id}))
+            events.append((t + 0.3, {
+                "type": "conversation.item.input_audio_transcription.completed",
+                "item_id": item_id, "content_index": 0, "transcript": msg['text']
+            }))
+        else:
+            response_id = f"resp_fake_{index:04d}"
+            events.append((t, {
+                "type": "response.audio_transcript.done", "response_id": response_id,
+                "item_id": item_id, "output_index": 0, "content_index": 0, "transcript": msg['text']
+            }))
+            events.append((t + 0.05, {"type": "response.done", "response": {
+                "id": response_id, "status": "completed",
+                "output": [{"id": item_id, "type": "message", "role": "assistant",
+                            "content": [{"type": "audio", "transcript": msg['text']}]}]
+            }}))
+    for number, (_, event) in enumerate(events):
+        event.setdefault("event_id", f"event_fake_{number:05d}")
+    return events
+
+
+def conversation_from_events(events):
+    """The transcript the page builds from these events: [{'role', 'text'}]."""
+    conversation = []
+    for _, event in events:
+        kind = event.get("type")
+        if kind == "conversation.item.input_audio_transcription.completed" and event.get("transcript"):
+            conversation.append({"role": "user", "text": event["transcript"]})
+        elif kind == "response.audio_transcript.done" and event.get("transcript"):
+            conversation.append({"role": "assistant", "text": event["transcript"]})
+        elif kind == "response.done":
+            for item in (event.get("response") or {}).get("output") or []:
+                if item.get("type") == "message" and item.get("role") == "assistant":
+                    conversation += [{"role": "assistant", "text": c["text"]}
+                                     for c in item.get("content") or [] if c.get("type") == "text" and c.get("text")]
+    return conversation
+
+
+def start_fake(latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, rate_limit=None,
+               recordings=RECORDINGS_DIR, seed=None, host="127.0.0.1", port=0):
+    """
+    Start the fake upstream in a daemon thread; returns (server, base_url,
+    stats). base_url ends in /v1, ready for OPENAI_API_BASE. rate_limit is
+    'N/SECONDS' or None. stats counts connections, requests, sessions,
+    sdp_offers, replays and answers by status.
+    """
+    stats = {"connections": 0, "requests": 0, "sessions": 0, "sdp_offers": 0, "replays": 0, "status": {}}
+    lock = threading.Lock()
+    rng = random.Random(seed)
+    limit = parse_limit(rate_limit) if rate_limit else None
+    bucket = {"tokens": float(limit[0]) if limit else 0.0, "updated": time.monotonic()}
+
+    def take_token():
+        """0 when a request may go ahead, else the seconds until the next token."""
+        if limit is None:
+            return 0
+        capacity, period = limit
+        with lock:
+            now = time.monotonic()
+            bucket["tokens"] = min(capacity, bucket["tokens"] + (now - bucket["updated"]) * capacity / period)
+            bucket["updated"] = now
+            if bucket["tokens"] >= 1:
+                bucket["tokens"] -= 1
+                return 0
+            return (1 - bucket["tokens"]) * period / capacity
+
+    def delay():
+        with lock:
+            return max(0.0, latency + rng.uniform(-jitter, jitter))
+
+    def fails():
+        with lock:
+            return error_rate > 0 and rng.random() < error_rate
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def setup(self):
+            super().setup()
+            with lock:
+                stats["connections"] += 1
+
+        def send(self, status, body, content_type="application/json", headers=None):
+            with lock:
+                stats["status"][str(status)] = stats["status"].get(str(status), 0) + 1
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_error_body(self, status, headers=None):
+            kind, message = ERROR_BODIES.get(status, ("server_error", "Fake upstream error."))
+            body = json.dumps({"error": {"message": message, "type": kind, "code": kind}}).encode("utf-8")
+            self.send(status, body, headers=headers)
+
+        def upstream_call(self):
+            """Latency, rate limit and injected errors shared by the POST endpoints; True to go on."""
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                self.send_error_body(401)
+                return False
+            wait = take_token()
+            if wait:
+                self.send_error_body(429, {"Retry-After": str(max(1, round(wait)))})
+                return False
+            time.sleep(delay())
+            if fails():
+                self.send_error_body(error_status)
+                return False
+            return True
+
+        def do_OPTIONS(self):
+            # Preflight for the page fetching the SDP and replay endpoints cross-origin
+            self.send_response(204)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Authorization, Content-Type, OpenAI-Beta")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            payload = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            with lock:
+                stats["requests"] += 1
+            path = urlsplit(self.path).path.rstrip("/")
+            if path.endswith("/realtime/sessions"):
+                if not self.upstream_call():
+                    return
+                try:
+                    model = json.loads(payload or b"{}").get("model") or DEFAULT_MODEL
+                except (ValueError, AttributeError):
+                    model = DEFAULT_MODEL
+                with lock:
+                    stats["sessions"] += 1
+                body = json.dumps({
+                    "id": f"sess_fake_{secrets.token_hex(8)}",
+                    "object": "realtime.session",
+                    "model": model,
+                    "client_secret": {"value": f"ek_fake_{secrets.token_hex(12)}",
+                                      "expires_at": int(time.time()) + SESSION_LIFETIME}
+                }).encode("utf-8")
+                self.send(200, body)
+            elif path.endswith("/realtime"):
+                if not self.upstream_call():
+                    return
+                with lock:
+                    stats["sdp_offers"] += 1
+                self.send(201, PLACEHOLDER_SDP.encode("utf-8"), "application/sdp")
+            else:
+                self.send_error_body(404)
+
+        def do_GET(self):
+            with lock:
+                stats["requests"] += 1
+            url = urlsplit(self.path)
+            path = url.path.rstrip("/")
+            if path.endswith("/realtime/recordings"):
+                self.send(200, json.dumps(recording_names(recordings)).encode("utf-8"))
+            elif "/realtime/replay/" in path:
+                name = path.rsplit("/", 1)[1]
+                try:
+                    speed = float(parse_qs(url.query).get("speed", ["1"])[0])
+                except ValueError:
+                    speed = 1.0
+                events = find_recording(recordings, name)
+                if events is None:
+                    self.send_error_body(404)
+                    return
+                with lock:
+                    stats["replays"] += 1
+                self.stream(events, speed)
+            else:
+                self.send_error_body(404)
+
+        def stream(self, events, speed):
+            with lock:
+                stats["status"]["200"] = stats["status"].get("200", 0) + 1
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            start = time.monotonic()
+            try:
+                for t, event in events:
+                    if speed > 0:
+                        time.sleep(max(0.0, start + t / speed - time.monotonic()))
+                    line = (json.dumps(event) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # the page disconnected mid-replay
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1", stats
+
+
+def recording_names(directory):
+    names = ["synthetic"]
+    if os.path.isdir(directory):
+        names += sorted(name[:-len(".jsonl")] for name in os.listdir(directory) if name.endswith(".jsonl"))
+    return names
+
+
+def find_recording(directory, name):
+    """Events of the named recording, or None. "synthetic" is a fresh 40-turn conversation."""
+    if name == "synthetic":
+        return recording_from_conversation(make_conversation(40, seed=random.randrange(1 << 30)))
+    if name not in recording_names(directory):
+        return None
+    return load_recording(os.path.join(directory, name + ".jsonl"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per session or SDP call")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds around --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--rate-limit", default=None, help="N/SECONDS calls before answering 429")
+    parser.add_argument("--recordings", default=RECORDINGS_DIR)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, base_url, stats = start_fake(args.latency, args.jitter, args.error_rate, args.error_status,
+                                         args.rate_limit, args.recordings, args.seed, args.host, args.port)
+    print(f"Fake Realtime upstream on {base_url}")
+    print(f"  OPENAI_API_BASE={base_url}")
+    for name in recording_names(args.recordings):
+        print(f"  RT_REPLAY_URL={base_url}/realtime/replay/{name}?speed=4")
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(stats))
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
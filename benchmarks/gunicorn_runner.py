@@ -0,0 +1,72 @@
+# benchmarks/gunicorn_runner.py — boot gunicorn on a free port for a benchmark
+# --------------------------------------------------------------
+# Starts `gunicorn -c gunicorn.conf.py server:app` from the repository root
+# with extra environment and command-line settings, waits until /health
+# answers and every worker is up, and stops it afterwards.
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Benchmark clients all come from 127.0.0.1, so the per-address limits
+# (see admission.py) would throttle them like one abusive client
+NO_RATE_LIMITS = {f"RATE_LIMIT_{group}{scope}": "0"
+                  for group in ("SESSION", "ANALYZE", "TURNS") for scope in ("", "_ADDRESS", "_GLOBAL")}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    """Pids of the direct children of pid (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+@contextmanager
+def running_gunicorn(env=None, workers=1, args=(), boot_timeout=120):
+    """Yield (process, base_url) for a gunicorn serving server:app."""
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--workers", str(workers),
+         "--bind", f"127.0.0.1:{port}", *args, "server:app"],
+        cwd=REPO_ROOT, env=dict(os.environ, **(env or {})),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + boot_timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with status {proc.returncode}")
+            try:
+                if requests.get(f"{base_url}/health", timeout=1).ok \
+                        and len(children(proc.pid)) >= workers:
+                    break
+            except requests.RequestException:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError("gunicorn did not become ready")
+            time.sleep(0.25)
+        yield proc, base_url
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
@@ -0,0 +1,62 @@
+# benchmarks/import_time.py — enforce the server.py import-time budget
+# --------------------------------------------------------------
+# Run from the repository root:
+#   python -m benchmarks.import_time [--runs 5] [--budget-ms 1000]
+#
+# Imports server.py in fresh interpreters with NLP_WARMUP=lazy and checks
+# that the median import time stays under IMPORT_TIME_BUDGET_MS and that
+# nltk/textstat were not imported. A gunicorn worker pays this before it can
+# serve /realtime, so NLP setup must stay off the import path. Exits with
+# status 1 when the budget is exceeded.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET_MS = 1000
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"ms": elapsed, "heavy": sorted(m for m in ("nltk", "textstat") if m in sys.modules)}))
+"""
+
+
+def measure(runs):
+    env = dict(os.environ, NLP_WARMUP="lazy")
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True,
+                             text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the server.py import-time budget.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+    median_ms = statistics.median(r["ms"] for r in results)
+    heavy = sorted({m for r in results for m in r["heavy"]})
+    print(f"import server: median {median_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    if heavy:
+        print(f"FAIL: imported at module load: {', '.join(heavy)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
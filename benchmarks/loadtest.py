@@ -0,0 +1,335 @@
+# benchmarks/loadtest.py — classroom load test across gunicorn configurations
+# --------------------------------------------------------------
+# Run from the repository root:
+#   python -m benchmarks.loadtest [--students 10,20,40,80] [--workers 1,2]
+#       [--worker-classes gthread,sync] [--threads 4,8] [--upstream-latency 0.5]
+#
+# Simulates a class starting a practice session together, with /session
+# pointed at the local fake upstream (benchmarks/fake_upstream.py). Every
+# student goes through four waves, each starting once the previous one
+# has finished, and starts each wave at a random moment within --ramp
+# seconds. The requests are the ones the /realtime page makes:
+#   page     GET /realtime and /bots.json
+#   session  POST /session
+#   chat     POST /analyze/turns for each turn of a synthetic transcript of
+#            --turns turns (a different one per student, so the cache does
+#            not help), --turn-interval seconds apart. Real chats are
+#            slower; this packs one into a shorter, busier window.
+#   report   "Analyze My Chat": POST /analyze/jobs with the session id
+#            (retried on 503/429 and falling back to the whole transcript
+#            like the page), poll the job every --poll-interval seconds and
+#            download the result. "report" is the time from the click to
+#            the downloaded report.
+# A report that comes back without the NLP analysis (analysis_available
+# false) stops the run, since its timings would mean nothing.
+#
+# Each gunicorn configuration (--workers x --worker-classes x --threads;
+# threads only apply to gthread) runs the student counts from small to
+# large. A count passes when every route answers fewer than
+# --max-error-rate of its requests with an error and has a p95 within its
+# --slo. The largest passing count is how many students one instance of
+# that configuration carries. Per-route throughput and p50/p95/p99 go to
+# --output as JSON.
+#
+# Rate limits are off, so they do not hide the server's own capacity. The
+# machine-wide analysis cap stays on: its 503s count as errors.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from benchmarks.fake_upstream import start_fake
+from benchmarks.gunicorn_runner import NO_RATE_LIMITS, running_gunicorn
+from benchmarks.suite import git_commit, percentile
+from benchmarks.synthetic import BOT_IDS, make_conversation
+
+WAVES = ("page", "session", "chat", "report")
+DEFAULT_SLO = "/realtime=500,/bots.json=500,/session=3000,/analyze/turns=1000,report=15000"  # p95, ms
+SUBMIT_RETRIES = 3  # as the page does on 503/429
+
+
+def parse_slo(spec):
+    """'/route=ms,...' -> {route: ms}."""
+    slo = {}
+    for part in spec.split(","):
+        route, _, ms = part.partition("=")
+        slo[route.strip()] = float(ms)
+    return slo
+
+
+def configurations(workers, worker_classes, threads):
+    """(workers, worker class, threads) to try; sync workers run one thread, so only once."""
+    configs = []
+    for count, worker_class in itertools.product(workers, worker_classes):
+        for thread_count in (threads if worker_class == "gthread" else [1]):
+            configs.append((count, worker_class, thread_count))
+    return configs
+
+
+class Student:
+    """One simulated learner with its own keep-alive connection, client id and transcript."""
+
+    def __init__(self, base_url, number, seed, args):
+        self.base_url = base_url
+        self.args = args
+        self.http = requests.Session()
+        self.http.headers["X-Client-Id"] = f"loadtest-{seed}-{number:04d}"
+        rng = random.Random(seed * 100003 + number)
+        self.bot_id = rng.choice(BOT_IDS)
+        self.conversation = make_conversation(rng.randint(*args.turns), seed=seed * 100003 + number)
+        self.session_id = f"loadtest-{seed}-{number:04d}-{rng.getrandbits(32):08x}"
+        self.analysis_available = None  # from the downloaded report
+
+    def call(self, route, method, path, **kwargs):
+        """((route, status, ms), response); status and response are None when the request itself failed."""
+        start = time.perf_counter()
+        try:
+            resp = self.http.request(method, f"{self.base_url}{path}", timeout=kwargs.pop("timeout", 60), **kwargs)
+            resp.content  # the whole body, as a browser would wait for it
+        except requests.RequestException:
+            resp = None
+        return (route, resp.status_code if resp is not None else None, (time.perf_counter() - start) * 1000), resp
+
+    def page(self):
+        return [self.call(route, "GET", route)[0] for route in ("/realtime", "/bots.json")]
+
+    def session(self):
+        return [self.call("/session", "POST", "/session", json={"bot_id": self.bot_id}, timeout=120)[0]]
+
+    def chat(self):
+        samples = []
+        for index in range(len(self.conversation)):
+            samples.append(self.call("/analyze/turns", "POST", "/analyze/turns", json={
+                "session_id": self.session_id, "bot_id": self.bot_id, "turns": [self.turn(index)]})[0])
+            time.sleep(self.args.turn_interval)
+        return samples
+
+    def turn(self, index):
+        return {"index": index, **self.conversation[index]}
+
+    def report(self):
+        samples = []
+        start = time.perf_counter()
+
+        def submit(body):
+            for attempt in range(SUBMIT_RETRIES + 1):
+                sample, resp = self.call("/analyze/jobs", "POST", "/analyze/jobs", json=body)
+                samples.append(sample)
+                if resp is None or resp.status_code not in (429, 503) or attempt == SUBMIT_RETRIES:
+                    return resp
+                time.sleep(min(30, int(resp.headers.get("Retry-After", "5"))))
+
+        session_body = {"bot_id": self.bot_id, "session_id": self.session_id, "turn_count": len(self.conversation)}
+        resp = submit(session_body)
+        if resp is not None and resp.status_code == 409:
+            resp = submit(dict(session_body, turns=[self.turn(i) for i in resp.json().get("missing", [])]))
+        if resp is not None and resp.status_code in (404, 409, 413):
+            resp = submit({"bot_id": self.bot_id, "conversation": self.conversation})
+
+        status = resp.status_code if resp is not None else None
+        if status == 202:
+            status = self.wait_for_job(resp.json(), samples, start)
+        samples.append(("report", status, (time.perf_counter() - start) * 1000))
+        return samples
+
+    def wait_for_job(self, job, samples, start):
+        """Poll the job and download its result; the report's status (None when the job did not finish)."""
+        while job["state"] in ("queued", "running"):
+            if time.perf_counter() - start > self.args.report_timeout:
+                return None
+            time.sleep(self.args.poll_interval)
+            sample, resp = self.call("/analyze/jobs/<id>", "GET", job["status_url"])
+            samples.append(sample)
+            if resp is None or resp.status_code != 200:
+                return sample[1]
+            job = resp.json()
+        if job["state"] != "done":
+            return None
+        sample, resp = self.call("/analyze/jobs/<id>/result", "GET", f"{job['result_url']}?format=json")
+        samples.append(sample)
+        if resp is not None and resp.status_code == 200:
+            self.analysis_available = resp.json().get("analysis_available")
+        return sample[1]
+
+    def run_wave(self, wave, delay):
+        time.sleep(delay)
+        return getattr(self, wave)()
+
+
+def summarize_route(samples, elapsed):
+    ok = sorted(ms for status, ms in samples if status is not None and status < 400)
+    errors = len(samples) - len(ok)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "statuses": {}
+    }
+    for status, _ in samples:
+        key = str(status) if status is not None else "failed"
+        summary["statuses"][key] = summary["statuses"].get(key, 0) + 1
+    if ok:
+        summary.update({
+            "p50_ms": round(statistics.median(ok), 1),
+            "p95_ms": round(percentile(ok, 0.95), 1),
+            "p99_ms": round(percentile(ok, 0.99), 1)
+        })
+    return summary
+
+
+def run_class(base_url, students, args, seed):
+    """Run the waves for `students` learners; {route: summary}."""
+    learners = [Student(base_url, number, seed, args) for number in range(students)]
+    rng = random.Random(seed)
+    routes = {}
+    with ThreadPoolExecutor(students) as pool:
+        for wave in WAVES:
+            delays = [rng.uniform(0, args.ramp) for _ in learners]
+            start = time.perf_counter()
+            results = list(pool.map(lambda pair: pair[0].run_wave(wave, pair[1]), zip(learners, delays)))
+            elapsed = time.perf_counter() - start
+            samples = {}
+            for route, status, ms in itertools.chain.from_iterable(results):
+                samples.setdefault(route, []).append((status, ms))
+            routes.update({route: summarize_route(route_samples, elapsed)
+                           for route, route_samples in samples.items()})
+    for learner in learners:
+        learner.http.close()
+    if any(learner.analysis_available is False for learner in learners):
+        raise SystemExit("NLP analysis unavailable: reports came back without it (analysis_available false)")
+    return routes
+
+
+def level_passes(routes, slo, max_error_rate):
+    """Reasons the level failed; empty when it passed."""
+    reasons = []
+    for route, summary in routes.items():
+        if summary["error_rate"] > max_error_rate:
+            reasons.append(f"{route} errors {summary['error_rate']:.1%}")
+        limit = slo.get(route)
+        if limit is not None and summary.get("p95_ms", float("inf")) > limit:
+            reasons.append(f"{route} p95 {summary.get('p95_ms', '-')} ms > {limit:g}")
+    return reasons
+
+
+def run_configuration(config, args, upstream_url, slo):
+    workers, worker_class, threads = config
+    state_dir = tempfile.mkdtemp(prefix="msu-task-chat-loadtest-")
+    env = {
+        "OPENAI_API_BASE": upstream_url,
+        "OPENAI_API_KEY": "sk-loadtest",
+        "GUNICORN_WORKER_CLASS": worker_class,
+        "GUNICORN_THREADS": str(threads),
+        "NLP_WARMUP": "eager",
+        "RT_SESSION_POOL_SIZE": "0",
+        "ANALYSIS_CACHE_PATH": os.path.join(state_dir, "cache.sqlite3"),
+        "ANALYSIS_SESSIONS_PATH": os.path.join(state_dir, "sessions.sqlite3"),
+        "ANALYSIS_JOBS_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        "METRICS_PATH": os.path.join(state_dir, "metrics.sqlite3"),
+        "ADMISSION_PATH": os.path.join(state_dir, "admission.sqlite3"),
+        "TRUSTED_PROXY_HOPS": "0",
+        **NO_RATE_LIMITS
+    }
+
+    levels, capacity = [], 0
+    with running_gunicorn(env, workers=workers, args=["--timeout", "300"]) as (_, base_url):
+        for level, students in enumerate(args.students):
+            routes = run_class(base_url, students, args, seed=args.seed * 1000 + level)
+            reasons = level_passes(routes, slo, args.max_error_rate)
+            levels.append({"students": students, "passed": not reasons, "reasons": reasons, "routes": routes})
+            print_level(config, students, routes, reasons)
+            if reasons and not args.keep_going:
+                break
+            if not reasons:
+                capacity = students
+    return {"workers": workers, "worker_class": worker_class, "threads": threads,
+            "capacity_students": capacity, "levels": levels}
+
+
+def config_label(config):
+    workers, worker_class, threads = config
+    return f"{workers}x{worker_class}" + (f"/{threads}t" if worker_class == "gthread" else "")
+
+
+def print_level(config, students, routes, reasons):
+    for route, summary in routes.items():
+        print(f"{config_label(config):<16}{students:>9}  {route:<26}{summary['throughput_rps']:>9}"
+              f"{summary.get('p50_ms', '-'):>10}{summary.get('p95_ms', '-'):>10}{summary.get('p99_ms', '-'):>10}"
+              f"{summary['errors']:>8}")
+    print(f"{'':<25}{'PASS' if not reasons else 'FAIL: ' + '; '.join(reasons)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a simulated classroom across gunicorn settings.")
+    parser.add_argument("--students", default="10,20,40,80", help="comma-separated class sizes, ascending")
+    parser.add_argument("--workers", default="1,2", help="comma-separated gunicorn worker counts")
+    parser.add_argument("--worker-classes", default="gthread,sync")
+    parser.add_argument("--threads", default="4,8", help="comma-separated GUNICORN_THREADS for gthread")
+    parser.add_argument("--turns", default="20,120", help="MIN,MAX turns per transcript")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which each wave starts")
+    parser.add_argument("--turn-interval", type=float, default=0.5, help="seconds between posted turns")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between job polls, as the page")
+    parser.add_argument("--report-timeout", type=float, default=300.0, help="seconds to wait for one report")
+    parser.add_argument("--upstream-latency", type=float, default=0.5, help="fake OpenAI session latency, s")
+    parser.add_argument("--upstream-jitter", type=float, default=0.2)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--slo", default=DEFAULT_SLO, help="p95 limits as ROUTE=MS,...")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--keep-going", action="store_true", help="run larger classes after a failed one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="loadtest-results.json")
+    args = parser.parse_args()
+    args.students = sorted(int(n) for n in args.students.split(","))
+    args.turns = tuple(int(n) for n in args.turns.split(","))
+    slo = parse_slo(args.slo)
+    configs = configurations([int(n) for n in args.workers.split(",")], args.worker_classes.split(","),
+                             [int(n) for n in args.threads.split(",")])
+
+    upstream, upstream_url, _ = start_fake(args.upstream_latency, args.upstream_jitter, args.upstream_error_rate,
+                                           seed=args.seed)
+    print(f"{'config':<16}{'students':>9}  {'route':<26}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'errors':>8}")
+    results = []
+    try:
+        for config in configs:
+            results.append(run_configuration(config, args, upstream_url, slo))
+    finally:
+        upstream.shutdown()
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "settings": {"students": args.students, "turns": args.turns, "ramp_s": args.ramp,
+                         "turn_interval_s": args.turn_interval, "poll_interval_s": args.poll_interval,
+                         "upstream_latency_s": args.upstream_latency, "slo_p95_ms": slo,
+                         "max_error_rate": args.max_error_rate},
+            "configurations": results
+        }, f, indent=2)
+
+    print()
+    for result in sorted(results, key=lambda r: -r["capacity_students"]):
+        config = (result["workers"], result["worker_class"], result["threads"])
+        note = " (every class size passed; try larger --students)" \
+            if all(level["passed"] for level in result["levels"]) else ""
+        print(f"{config_label(config):<16} carries {result['capacity_students']} students{note}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/memory_report.py — per-worker memory with and without --preload
+# --------------------------------------------------------------
+# Run from the repository root (Linux only, reads /proc):
+#   python -m benchmarks.memory_report [--workers 4]
+#
+# Boots gunicorn twice with NLP_WARMUP=eager, once with GUNICORN_PRELOAD=0
+# (every worker loads its own models) and once with GUNICORN_PRELOAD=1
+# (the master loads them and workers share the pages), then prints RSS,
+# PSS and private memory for each worker and its analysis processes. RSS
+# counts shared pages in every process; PSS splits them between the
+# processes sharing them, so the PSS total is what the instance actually uses.
+
+import argparse
+import time
+
+from benchmarks.gunicorn_runner import children, running_gunicorn
+
+
+def memory_kb(pid):
+    """Rss, Pss and Private_* totals from /proc/<pid>/smaps_rollup, in kB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def measure(preload, workers, settle):
+    env = {"GUNICORN_PRELOAD": "1" if preload else "0", "NLP_WARMUP": "eager"}
+    with running_gunicorn(env, workers) as (proc, _):
+        time.sleep(settle)  # let every worker finish importing and warming
+        rows = [("master", memory_kb(proc.pid))]
+        for i, worker in enumerate(children(proc.pid), 1):
+            rows.append((f"worker {i}", memory_kb(worker)))
+            rows += [(" analysis", memory_kb(pid)) for pid in children(worker)]
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare worker memory with and without preload.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds to wait after boot")
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}{'process':<11}{'RSS MB':>10}{'PSS MB':>10}{'private MB':>12}")
+    for preload in (False, True):
+        mode = "preload" if preload else "per-worker"
+        rows = measure(preload, args.workers, args.settle)
+        for name, mem in rows:
+            print(f"{mode:<12}{name:<11}{mem['rss'] / 1024:>10.1f}{mem['pss'] / 1024:>10.1f}"
+                  f"{mem['private'] / 1024:>12.1f}")
+        total_pss = sum(mem["pss"] for _, mem in rows) / 1024
+        print(f"{mode:<12}{'total':<11}{'':>10}{total_pss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
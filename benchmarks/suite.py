@@ -0,0 +1,233 @@
+# benchmarks/suite.py — analysis and endpoint benchmarks with regression checks
+# --------------------------------------------------------------
+# Run from the repository root (needs the NLTK data, see nltk_bundle.py):
+#   python -m benchmarks.suite [--output results.json] [--only analyze]
+#   python -m benchmarks.suite --baseline before.json [--tolerance 0.25]
+#
+# Micro-benchmarks time the analysis steps on synthetic conversations
+# (benchmarks/synthetic.py): per-turn counting, the metric functions on a
+# long session's aggregate, report rendering and cache keys. End-to-end
+# benchmarks drive the Flask routes through the test client, with /session
+# pointed at the local stub upstream and the cache and session stores in a
+# temporary directory.
+#
+# Each benchmark records per-call latencies (p50, p99, mean, min, max in
+# ms). The results, with the Python version, CPU count and git commit, are
+# written as JSON to --output. With --baseline, p50 and p99 are compared
+# with an earlier results file and the run exits with status 1 when either
+# grew by more than --tolerance (p99: --p99-tolerance) and by more than
+# --min-delta-ms, so timer noise on sub-millisecond steps does not fail it.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_upstream import start_fake
+from benchmarks.gunicorn_runner import NO_RATE_LIMITS
+from benchmarks.synthetic import make_conversation
+
+SHORT_TURNS = 20   # a quick practice run
+LONG_TURNS = 400   # a full 30-minute session
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(pct * len(sorted_values)) - 1))]
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "iterations": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 4),
+        "p99_ms": round(percentile(ordered, 0.99), 4),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+        "min_ms": round(ordered[0], 4),
+        "max_ms": round(ordered[-1], 4)
+    }
+
+
+def measure(run, iterations, setup=None):
+    """Per-call latencies of run() in ms, after untimed warm-up calls; setup() runs untimed before each."""
+    for _ in range(max(1, iterations // 10)):
+        if setup:
+            setup()
+        run()
+    latencies = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def load_server(stub_url, state_dir):
+    """Import server.py configured for benchmarking (stub upstream, throwaway stores)."""
+    os.environ.update({
+        "OPENAI_API_BASE": stub_url,
+        "OPENAI_API_KEY": "sk-bench",
+        "ANALYSIS_CACHE_PATH": os.path.join(state_dir, "cache.sqlite3"),
+        "ANALYSIS_SESSIONS_PATH": os.path.join(state_dir, "sessions.sqlite3"),
+        "ANALYSIS_JOBS_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        "ADMISSION_PATH": os.path.join(state_dir, "admission.sqlite3"),
+        **NO_RATE_LIMITS
+    })
+    os.environ.setdefault("NLP_WARMUP", "eager")
+    os.environ.setdefault("RT_SESSION_POOL_SIZE", "0")
+    import server
+    return server
+
+
+def micro_benchmarks(server):
+    """(name, run, iterations, setup) for the analysis steps."""
+    short = make_conversation(SHORT_TURNS, seed=1)
+    long = make_conversation(LONG_TURNS, seed=2)
+    learner_text = long[1]['text']
+    language = server.bot_language("apt-en")
+    total = server.empty_turn_aggregate()
+    for msg in long:
+        server.merge_turn_counts(total, server.turn_counts(msg['role'], msg['text'], language))
+    analysis = server.analysis_from_aggregate(total)
+
+    return [
+        ("turn_counts[learner turn]", lambda: server.turn_counts("user", learner_text, language), 500, None),
+        ("analyze_basic_stats[long]", lambda: server.analyze_basic_stats(total), 2000, None),
+        ("analyze_complexity[long]", lambda: server.analyze_complexity(total), 2000, None),
+        ("analyze_fluency[long]", lambda: server.fluency_metrics_from_counts(total['disfluency']), 2000, None),
+        ("analyze_vocabulary[long]", lambda: server.analyze_vocabulary(total), 2000, None),
+        ("analysis_from_aggregate[long]", lambda: server.analysis_from_aggregate(total), 1000, None),
+        ("compute_analysis[short]", lambda: server.compute_analysis(short, "apt-en"), 50, None),
+        ("compute_analysis[long]", lambda: server.compute_analysis(long, "apt-en"), 10, None),
+        ("format_analysis_report[long]", lambda: server.format_analysis_report(analysis, long), 200, None),
+        ("conversation_key[long]", lambda: server.analysis_cache.conversation_key(long, "apt-en"), 200, None)
+    ]
+
+
+def endpoint_benchmarks(server):
+    """(name, run, iterations, setup) for the Flask routes via the test client."""
+    client = server.app.test_client()
+    short = {"conversation": make_conversation(SHORT_TURNS, seed=3), "bot_id": "apt-en"}
+    long = {"conversation": make_conversation(LONG_TURNS, seed=4), "bot_id": "apt-en"}
+    turns = iter(range(10 ** 9))
+
+    def call(method, path, expect=200, **kwargs):
+        def run():
+            resp = client.open(path, method=method, **kwargs)
+            resp.get_data()  # drain streamed bodies
+            if resp.status_code != expect:
+                raise RuntimeError(f"{method} {path}: {resp.status_code} {resp.get_data(as_text=True)[:200]}")
+        return run
+
+    def post_turn():
+        index = next(turns)
+        call("POST", "/analyze/turns", json={
+            "session_id": "bench-turns", "bot_id": "apt-en",
+            "turns": [dict(long["conversation"][index % LONG_TURNS], index=index)]})()
+
+    # A session holding the long conversation, for the incremental final report
+    client.post("/analyze/turns", json={
+        "session_id": "bench-final", "bot_id": "apt-en",
+        "turns": [dict(msg, index=i) for i, msg in enumerate(long["conversation"])]})
+    clear_cache = server.ANALYSIS_CACHE.clear
+
+    return [
+        ("GET /realtime", call("GET", "/realtime"), 500, None),
+        ("GET /bots.json", call("GET", "/bots.json"), 500, None),
+        ("POST /session", call("POST", "/session", json={"bot_id": "apt-en"}), 200, None),
+        ("POST /analyze[short, miss]", call("POST", "/analyze", json=short), 30, clear_cache),
+        ("POST /analyze[long, miss]", call("POST", "/analyze", json=long), 10, clear_cache),
+        ("POST /analyze[long, hit]", call("POST", "/analyze", json=long), 100, None),
+        ("POST /analyze[long, hit, json]", call("POST", "/analyze?format=json", json=long), 100, None),
+        ("POST /analyze/turns[1 turn]", post_turn, 200, None),
+        ("POST /analyze[long, incremental]", call("POST", "/analyze", json={
+            "session_id": "bench-final", "bot_id": "apt-en", "turn_count": LONG_TURNS}), 50, None)
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results, baseline, tolerance, p99_tolerance, min_delta_ms):
+    """Descriptions of every p50/p99 that regressed against the baseline results."""
+    found = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric, allowed in (("p50_ms", tolerance), ("p99_ms", p99_tolerance)):
+            old, new = before[metric], current[metric]
+            if new > old * (1 + allowed) and new - old > min_delta_ms:
+                found.append(f"{name}: {metric} {old:.3f} -> {new:.3f} ms (+{(new / old - 1) * 100:.0f}%)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis steps and the Flask routes.")
+    parser.add_argument("--output", default="benchmark-results.json", help="where to write the JSON results")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every iteration count")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p50 growth")
+    parser.add_argument("--p99-tolerance", type=float, default=0.5, help="allowed relative p99 growth")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore smaller absolute changes")
+    args = parser.parse_args()
+
+    stub, stub_url, _ = start_fake()
+    state_dir = tempfile.mkdtemp(prefix="msu-task-chat-bench-")
+    server = load_server(stub_url, state_dir)
+    if not server.ANALYSIS_AVAILABLE:
+        raise SystemExit(f"NLP analysis unavailable: {server.NLP_ERROR_MESSAGE}")
+    server.ANALYSIS_POOL.start()
+
+    results = {}
+    print(f"{'benchmark':<36}{'n':>6}{'p50 ms':>11}{'p99 ms':>11}{'mean ms':>11}")
+    try:
+        for name, run, iterations, setup in micro_benchmarks(server) + endpoint_benchmarks(server):
+            if args.only and args.only not in name:
+                continue
+            stats = summarize(measure(run, max(1, int(iterations * args.scale)), setup))
+            results[name] = stats
+            print(f"{name:<36}{stats['iterations']:>6}{stats['p50_ms']:>11.3f}"
+                  f"{stats['p99_ms']:>11.3f}{stats['mean_ms']:>11.3f}")
+    finally:
+        stub.shutdown()
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "analysis_processes": server.ANALYSIS_POOL.processes,
+            "results": results
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        found = regressions(results, baseline, args.tolerance, args.p99_tolerance, args.min_delta_ms)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
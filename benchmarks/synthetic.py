@@ -0,0 +1,75 @@
+# benchmarks/synthetic.py — deterministic practice conversations for benchmarks
+# --------------------------------------------------------------
+# Builds transcripts that look like a learner talking to a scenario bot:
+# alternating turns, fillers and hesitations, repeated words and a spread
+# of sentence lengths. Turn count, sentences per learner turn, sentence
+# length and filler density are configurable. The same arguments and seed
+# always give the same conversation, so runs can be compared.
+
+import random
+
+FILLER_OPENERS = ["Well", "So", "Okay", "Actually", "I mean", "Um", "Uh", "Like", "Honestly", "Basically"]
+PLAIN_OPENERS = ["Yes", "No", "Then", "Today", "Also", "Next week", "After class", "Right now"]
+HESITATIONS = ["um", "uh", "like", "you know", "er", "I mean"]
+SUBJECTS = ["I", "we", "my roommate", "the landlord", "the bank", "my professor", "the apartment", "our group"]
+VERBS = ["want to", "need to", "would like to", "have to", "am trying to", "was hoping to", "plan to"]
+OBJECTS = [
+    "open a savings account", "find a bigger apartment near campus", "talk about the rent",
+    "schedule a meeting for next week", "ask about the assignment deadline", "get a haircut on Friday",
+    "understand the monthly maintenance fee", "split the utilities more fairly", "join the evening yoga class",
+    "discuss my research proposal", "book a room for two nights", "change the appointment to the afternoon"
+]
+TAILS = ["because it is cheaper", "if that is possible", "before the semester starts", "since my schedule changed",
+         "but I am not sure", "and maybe also the parking", "with a friend from my program",
+         "as soon as the office opens", "without paying the extra deposit"]
+BOT_LINES = [
+    "Sure, I can help you with that.", "Could you tell me a little more about what you need?",
+    "That makes sense. What time works best for you?", "Let me check that for you.",
+    "Is there anything else you would like to change?", "Great, I have noted that down."
+]
+BOT_IDS = ["apt-en", "bank-en", "roommate-en", "travel-en", "yoga class-en"]
+
+
+def learner_sentence(rng, words, filler_density):
+    parts = [rng.choice(SUBJECTS), rng.choice(VERBS), rng.choice(OBJECTS)]
+    while len(" ".join(parts).split()) < words:
+        parts.append(rng.choice(TAILS))
+    if rng.random() < filler_density:
+        parts.insert(0, rng.choice(FILLER_OPENERS) + ",")
+    elif rng.random() < 0.5:
+        parts.insert(0, rng.choice(PLAIN_OPENERS) + ",")
+    if rng.random() < filler_density:
+        parts.insert(rng.randint(1, len(parts)), rng.choice(HESITATIONS))
+    if rng.random() < filler_density / 2:
+        parts.insert(1, parts[0].rstrip(","))  # "I I want to..."
+    sentence = " ".join(parts)
+    return sentence[0].upper() + sentence[1:] + rng.choice([".", ".", "?", "!"])
+
+
+def learner_turn(rng, sentences=(1, 4), words=(6, 14), filler_density=0.3):
+    return " ".join(learner_sentence(rng, rng.randint(*words), filler_density)
+                    for _ in range(rng.randint(*sentences)))
+
+
+def make_conversation(turns=40, seed=0, sentences=(1, 4), words=(6, 14), filler_density=0.3):
+    """
+    A conversation of `turns` turns, alternating bot and learner. Learner
+    turns have a random number of sentences in the `sentences` range, each
+    of roughly `words` words; `filler_density` (0-1) is the chance of a
+    filler opener, a hesitation and (at half the rate) a repeated word.
+    """
+    rng = random.Random(seed)
+    return [
+        {"role": "assistant", "text": rng.choice(BOT_LINES)} if i % 2 == 0
+        else {"role": "user", "text": learner_turn(rng, sentences, words, filler_density)}
+        for i in range(turns)
+    ]
+
+
+def make_roster(students=30, turns=40, seed=0, **shape):
+    """Batch items for /analyze/batch, one conversation per student."""
+    return [
+        {"id": f"student-{i + 1:02d}", "bot_id": BOT_IDS[i % len(BOT_IDS)],
+         "conversation": make_conversation(turns, seed + i, **shape)}
+        for i in range(students)
+    ]
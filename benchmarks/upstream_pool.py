@@ -0,0 +1,69 @@
+# benchmarks/upstream_pool.py — connection reuse of the pooled upstream client
+# --------------------------------------------------------------
+# Run from the repository root:
+#   python -m benchmarks.upstream_pool [--requests 200] [--latency 0.0]
+#
+# Sends the same /realtime/sessions POST to a local stub twice: once with a
+# bare requests.post() per call (the old /session behaviour) and once through
+# upstream.post(). The stub counts accepted TCP connections; the pooled run
+# should need one, the bare run one per request. Against api.openai.com each
+# avoided connection also saves a TLS handshake.
+
+import argparse
+import statistics
+import time
+
+import requests
+
+import upstream
+from benchmarks.fake_upstream import start_fake
+
+PAYLOAD = b'{"model": "gpt-4o-realtime-preview-2024-12-17", "voice": "alloy"}'
+HEADERS = {"Authorization": "Bearer sk-bench", "Content-Type": "application/json"}
+
+
+def run(label, send, url, stats, count):
+    before = stats["connections"]
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        resp = send(url)
+        resp.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "client": label,
+        "requests": count,
+        "connections": stats["connections"] - before,
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        "total_ms": round(sum(latencies), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bare and pooled upstream POSTs against a local stub.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub delay per call, seconds")
+    args = parser.parse_args()
+
+    server, base_url, stats = start_fake(latency=args.latency)
+    url = f"{base_url}/realtime/sessions"
+    try:
+        results = [
+            run("requests.post", lambda u: requests.post(u, data=PAYLOAD, headers=HEADERS, timeout=10),
+                url, stats, args.requests),
+            run("upstream.post", lambda u: upstream.post(u, data=PAYLOAD, headers=HEADERS),
+                url, stats, args.requests)
+        ]
+    finally:
+        server.shutdown()
+
+    print(f"{'client':<16}{'requests':>10}{'connections':>13}{'p50 ms':>10}{'p99 ms':>10}{'total ms':>11}")
+    for r in results:
+        print(f"{r['client']:<16}{r['requests']:>10}{r['connections']:>13}"
+              f"{r['p50_ms']:>10}{r['p99_ms']:>10}{r['total_ms']:>11}")
+
+
+if __name__ == "__main__":
+    main()
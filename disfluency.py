@@ -0,0 +1,118 @@
+# disfluency.py — single-pass filler, hesitation and repetition matcher
+# --------------------------------------------------------------
+# Lexicons are compiled once at import into a word-level automaton: a table
+# from each filler's first word to the phrases that start with it, plus one
+# regex for hesitation sounds. scan() walks the words of a turn exactly once
+# and finds fillers ("you know", "like"), hesitation sounds ("um", "uhh")
+# and immediate repetitions ("I I think"). Matching is on whole words, so
+# "so" inside "also" is not a filler.
+#
+# Lexicons are keyed by the bot's language_hint; register_lexicon() adds or
+# replaces one. Unknown languages fall back to English.
+
+import re
+from collections import Counter
+
+FILLER_LEXICONS = {
+    "English": {
+        "fillers": [
+            "like", "you know", "i mean", "sort of", "kind of", "actually",
+            "basically", "literally", "well", "so", "okay", "right"
+        ],
+        # Matched with any letter stretched or not: "umm", "uhhh", "hm", "hmmm"
+        "hesitations": ["um", "uh", "er", "erm", "hmm", "ah"]
+    }
+}
+
+DEFAULT_LANGUAGE = "English"
+
+WORD_RE = re.compile(r"\w+(?:'\w+)*")
+
+
+def _collapse(word):
+    """'ummm' -> 'um', 'hmm' -> 'hm': the key hesitation variants share."""
+    return re.sub(r"(.)\1+", r"\1", word)
+
+
+class DisfluencyMatcher:
+    """Compiled lexicon for one language; build once, scan many turns."""
+
+    def __init__(self, fillers, hesitations):
+        # first word -> remaining words of each phrase, longest phrase first
+        self.phrases = {}
+        for filler in fillers:
+            first, *rest = filler.lower().split()
+            self.phrases.setdefault(first, []).append(tuple(rest))
+        for continuations in self.phrases.values():
+            continuations.sort(key=len, reverse=True)
+
+        # The pattern is built from the collapsed stem, so "hmm" also matches "hm"
+        self.hesitations = {_collapse(h.lower()): h.lower() for h in hesitations}
+        self.hesitation_re = re.compile(
+            "|".join("".join(re.escape(c) + "+" for c in stem) for stem in self.hesitations)
+        ) if hesitations else None
+
+    def scan(self, text):
+        """
+        Count disfluencies in one lowercased turn. Returns a dict of counts
+        that add up across turns (see merge_counts).
+        """
+        words = WORD_RE.findall(text)
+        fillers = Counter()
+        hesitation_sounds = 0
+        repetitions = 0
+
+        skip_until = 0  # words already consumed by a multi-word filler
+        for i, word in enumerate(words):
+            if i and word == words[i - 1]:
+                repetitions += 1
+
+            if self.hesitation_re is not None and self.hesitation_re.fullmatch(word):
+                fillers[self.hesitations.get(_collapse(word), word)] += 1
+                hesitation_sounds += 1
+                continue
+
+            if i < skip_until:
+                continue
+            for rest in self.phrases.get(word, ()):
+                if tuple(words[i + 1:i + 1 + len(rest)]) == rest:
+                    fillers[" ".join((word,) + rest)] += 1
+                    skip_until = i + 1 + len(rest)
+                    break
+
+        return {
+            "words": len(words),
+            "fillers": fillers,
+            "hesitation_sounds": hesitation_sounds,
+            "repetitions": repetitions
+        }
+
+
+def empty_counts():
+    return {"words": 0, "fillers": Counter(), "hesitation_sounds": 0, "repetitions": 0}
+
+
+def merge_counts(total, counts):
+    """Fold one turn's scan() result into a running total, in place."""
+    total["words"] += counts["words"]
+    total["fillers"].update(counts["fillers"])
+    total["hesitation_sounds"] += counts["hesitation_sounds"]
+    total["repetitions"] += counts["repetitions"]
+    return total
+
+
+_matchers = {}
+
+
+def register_lexicon(language, fillers, hesitations=()):
+    """Add or replace the lexicon used for bots with this language_hint."""
+    FILLER_LEXICONS[language] = {"fillers": list(fillers), "hesitations": list(hesitations)}
+    _matchers[language] = DisfluencyMatcher(fillers, hesitations)
+
+
+def matcher_for(language):
+    return _matchers.get(language) or _matchers[DEFAULT_LANGUAGE]
+
+
+for _language, _lexicon in FILLER_LEXICONS.items():
+    _matchers[_language] = DisfluencyMatcher(_lexicon["fillers"], _lexicon["hesitations"])
@@ -0,0 +1,45 @@
+# gunicorn.conf.py — worker settings for `gunicorn -c gunicorn.conf.py server:app`
+# --------------------------------------------------------------
+# GUNICORN_PRELOAD=1 (default) imports server.py once in the master with
+# NLP_WARMUP=eager, so the punkt tokenizer, POS tagger and stopwords are
+# loaded before forking and shared copy-on-write by every worker instead of
+# each worker loading its own copy. Set GUNICORN_PRELOAD=0 to go back to
+# importing the app separately in each worker.
+#
+# Workers are threaded (gthread) by default: /session spends nearly all of
+# its time waiting on OpenAI, and a sync worker would be blocked for the
+# whole wait. Each worker serves up to GUNICORN_THREADS requests at once,
+# while /analyze runs in the worker's analysis processes (see
+# analysis_pool.py) so it does not compete with those threads for the GIL.
+# GUNICORN_WORKER_CLASS=sync restores one request per worker.
+#
+# Worker count comes from WEB_CONCURRENCY or --workers as usual.
+
+import gc
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+# gunicorn quietly switches sync workers to gthread when threads > 1
+threads = int(os.getenv("GUNICORN_THREADS", "8")) if worker_class == "gthread" else 1
+
+if preload_app:
+    # A background warm-up thread would not survive fork(); load up front
+    os.environ.setdefault("NLP_WARMUP", "eager")
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything loaded so far out of the collector's reach, so GC
+        # passes in the workers do not write to (and un-share) those pages
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    # Fork the analysis processes before the worker starts its request
+    # threads, so they are not forked from a busy multi-threaded process
+    import server
+    server.ANALYSIS_POOL.start()
+    # Fill the session pool (RT_SESSION_POOL_SIZE > 0) before the first
+    # Connect, which would otherwise always miss
+    server.SESSION_POOL.start()
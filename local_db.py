@@ -0,0 +1,64 @@
+# local_db.py — SQLite files shared by every worker process on the machine
+# --------------------------------------------------------------
+# The analysis cache, incremental sessions and job queue each keep their
+# state in a local SQLite file so all gunicorn workers (and their analysis
+# processes) see the same data. sqlite3 connections must not cross threads
+# or fork(), so LocalDB hands every thread of every process its own
+# connection, in autocommit mode with WAL journaling; use transaction() to
+# group statements.
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+def pid_alive(pid):
+    """Whether a process with this pid exists on the machine."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class LocalDB:
+    """Per-thread connections to one SQLite file, creating schema on first use."""
+
+    def __init__(self, path, schema, timeout=10):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connection(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            local.db.execute("PRAGMA journal_mode=WAL")
+            local.db.execute("PRAGMA synchronous=NORMAL")
+            local.pid = os.getpid()
+            with self._init_lock:
+                if not self._initialized:
+                    local.db.executescript(self.schema)
+                    self._initialized = True
+        return local.db
+
+    @contextmanager
+    def transaction(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT: takes the write lock up front, so
+        read-modify-write sequences from different workers do not interleave.
+        """
+        db = self.connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
@@ -0,0 +1,246 @@
+# metrics.py — Prometheus-style metrics aggregated across gunicorn workers
+# --------------------------------------------------------------
+# Every worker keeps its counters, gauges and latency histograms in memory
+# and writes a snapshot of them to a local SQLite file every
+# METRICS_FLUSH_INTERVAL seconds. A scrape of /metrics can land on any
+# worker: it flushes its own snapshot, then merges everyone's, so the
+# numbers cover the whole machine. Counters and histograms are summed over
+# all workers, including ones that have exited (their last snapshot is
+# folded into a "retired" row, so totals never go backwards); gauges such
+# as requests in flight are summed over live workers only. A worker that
+# dies loses at most its last METRICS_FLUSH_INTERVAL seconds of counts.
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from local_db import LocalDB, pid_alive
+
+METRICS_PATH = os.getenv(
+    "METRICS_PATH", os.path.join(tempfile.gettempdir(), "msu-task-chat-metrics.sqlite3"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # seconds
+
+# Seconds; from a cached page to a slow OpenAI call or a long analysis
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+RETIRED_PID = 0  # row holding the counters of workers that have exited
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    pid INTEGER PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+COUNTER, GAUGE, HISTOGRAM = "counter", "gauge", "histogram"
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for k, v in pairs]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metrics:
+    """
+    Per-process metric registry. Declare every metric once with describe(),
+    then record with inc(), add(), set() and observe(); labels are keyword
+    arguments. collector() callbacks report values kept elsewhere (e.g. pool
+    counters) when a snapshot is taken.
+    """
+
+    def __init__(self, path=METRICS_PATH, flush_interval=METRICS_FLUSH_INTERVAL, buckets=LATENCY_BUCKETS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self.db = LocalDB(path, SCHEMA)
+        self._kinds = {}
+        self._help = {}
+        self._values = {}  # (name, labels) -> number, or histogram [bucket counts..., sum]
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def describe(self, name, kind, help_text):
+        self._kinds[name] = kind
+        self._help[name] = help_text
+
+    def collector(self, fn):
+        """Register fn() -> [(name, labels dict, value)], called for every snapshot."""
+        self._collectors.append(fn)
+        return fn
+
+    def inc(self, name, amount=1, **labels):
+        self.add(name, amount, **labels)
+
+    def add(self, name, amount, **labels):
+        self._ensure_started()
+        key = (name, _labels(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        self._ensure_started()
+        with self._lock:
+            self._values[(name, _labels(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        self._ensure_started()
+        key = (name, _labels(labels))
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+    def snapshot(self):
+        """This process's values as JSON-serializable [name, labels, value] rows."""
+        for fn in self._collectors:
+            try:
+                for name, labels, value in fn():
+                    self.set(name, value, **labels)
+            except Exception:
+                pass  # a broken collector must not break the scrape
+        with self._lock:
+            return [[name, list(labels), list(value) if isinstance(value, list) else value]
+                    for (name, labels), value in self._values.items()]
+
+    def flush(self):
+        self._ensure_started()
+        data = json.dumps(self.snapshot())
+        self.db.connection().execute(
+            "INSERT INTO snapshots (pid, updated_at, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(pid) DO UPDATE SET updated_at = excluded.updated_at, data = excluded.data",
+            (os.getpid(), time.time(), data))
+
+    def collect(self):
+        """
+        Merge the snapshots of every worker into {(name, labels): value} and
+        count the live workers. Snapshots of exited workers are folded into
+        the retired row on the way.
+        """
+        self.flush()
+        merged, retired, exited, live = {}, {}, [], 0
+        with self.db.transaction() as db:
+            for pid, data in db.execute("SELECT pid, data FROM snapshots").fetchall():
+                if pid == RETIRED_PID:
+                    self._merge_rows(retired, json.loads(data))
+                elif pid_alive(pid):
+                    live += 1
+                    self._merge_rows(merged, json.loads(data))
+                else:
+                    exited.append(pid)
+                    self._merge_rows(retired, json.loads(data), gauges=False)
+            if exited:
+                db.executemany("DELETE FROM snapshots WHERE pid = ?", [(pid,) for pid in exited])
+                self._write_retired(db, retired)
+        self._merge_rows(merged, [[name, labels, value] for (name, labels), value in retired.items()])
+        return merged, live
+
+    def render(self, extra=()):
+        """
+        Prometheus text exposition of the merged metrics. extra holds
+        (name, labels dict, value) samples that are already machine-wide,
+        such as the shared analysis cache counters; they are not summed.
+        """
+        merged, live = self.collect()
+        for name, labels, value in extra:
+            merged[(name, _labels(labels))] = value
+        merged[("metrics_live_workers", ())] = live
+
+        by_name = {}
+        for (name, labels), value in merged.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            kind = self._kinds.get(name, GAUGE)
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name]):
+                if kind == HISTOGRAM:
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float("inf"),), value[:-1]):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else _format_value(bound)
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _merge_rows(self, target, rows, gauges=True):
+        for name, labels, value in rows:
+            if not gauges and self._kinds.get(name) == GAUGE:
+                continue
+            key = (name, tuple(map(tuple, labels)))
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                target[key] = [a + b for a, b in zip(current, value)]
+            else:
+                target[key] = current + value
+
+    def _write_retired(self, db, retired):
+        db.execute("INSERT OR REPLACE INTO snapshots (pid, updated_at, data) VALUES (?, ?, ?)",
+                   (RETIRED_PID, time.time(),
+                    json.dumps([[name, list(labels), value] for (name, labels), value in retired.items()])))
+
+    def _retire_reused_pid(self, pid):
+        """
+        Fold a snapshot left under this pid by an exited process into the
+        retired row, before our first flush would overwrite it.
+        """
+        with self.db.transaction() as db:
+            row = db.execute("SELECT data FROM snapshots WHERE pid = ?", (pid,)).fetchone()
+            if row is None:
+                return
+            retired = {}
+            previous = db.execute("SELECT data FROM snapshots WHERE pid = ?", (RETIRED_PID,)).fetchone()
+            if previous is not None:
+                self._merge_rows(retired, json.loads(previous[0]))
+            self._merge_rows(retired, json.loads(row[0]), gauges=False)
+            db.execute("DELETE FROM snapshots WHERE pid = ?", (pid,))
+            self._write_retired(db, retired)
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so each worker starts its own flusher
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            try:
+                self._retire_reused_pid(pid)
+            except Exception:
+                pass  # database busy; better to lose the old counts than the request
+            self._pid = pid
+            self._values = {}  # values recorded by the parent are its own
+        threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass  # database busy; the next flush carries the same totals
@@ -0,0 +1,68 @@
+# nltk_bundle.py — vendor the NLTK data the analysis needs at build time
+# --------------------------------------------------------------
+# Run once during the build, after installing requirements:
+#   python nltk_bundle.py
+#
+# Downloads punkt, stopwords and the POS tagger into NLTK_DATA_DIR
+# (default: ./nltk_data next to server.py). server.py searches that
+# directory first, so workers boot without touching the network. Set
+# NLTK_OFFLINE=1 at runtime to turn missing data into an error instead of a
+# download.
+
+import os
+import sys
+
+BUNDLED_NLTK_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data")
+NLTK_DATA_DIR = os.getenv("NLTK_DATA_DIR", BUNDLED_NLTK_DATA_DIR)
+NLTK_OFFLINE = os.getenv("NLTK_OFFLINE", "0") == "1"
+
+NLTK_RESOURCES = [
+    # (path checked with nltk.data.find, packages to download; extras may not exist)
+    ("tokenizers/punkt", ["punkt", "punkt_tab"]),
+    ("corpora/stopwords", ["stopwords"]),
+    ("taggers/averaged_perceptron_tagger", ["averaged_perceptron_tagger", "averaged_perceptron_tagger_eng"])
+]
+
+
+def missing_resources(nltk):
+    """Resource paths nltk.data cannot find on its current search path."""
+    missing = []
+    for path, _ in NLTK_RESOURCES:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(path)
+    return missing
+
+
+def download_resources(nltk, download_dir, paths=None):
+    """Download the packages for paths (default: all) into download_dir."""
+    for path, (package, *extras) in NLTK_RESOURCES:
+        if paths is not None and path not in paths:
+            continue
+        print(f"Downloading NLTK {package}...")
+        nltk.download(package, quiet=True, download_dir=download_dir)
+        for extra in extras:
+            try:
+                nltk.download(extra, quiet=True, download_dir=download_dir)
+            except:
+                pass  # might not exist in older NLTK versions
+
+
+def main():
+    import nltk
+
+    os.makedirs(NLTK_DATA_DIR, exist_ok=True)
+    download_resources(nltk, NLTK_DATA_DIR)
+
+    # Verify against the bundle alone, not whatever happens to be in ~/nltk_data
+    nltk.data.path[:] = [NLTK_DATA_DIR]
+    missing = missing_resources(nltk)
+    if missing:
+        print(f"✗ NLTK data missing from {NLTK_DATA_DIR}: {', '.join(missing)}")
+        sys.exit(1)
+    print(f"✓ NLTK data bundled in {NLTK_DATA_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# profiling.py — opt-in per-request profiles of the analysis pipeline
+# --------------------------------------------------------------
+# A profile records wall and CPU time per pipeline stage (sentence
+# splitting, tagging, each metric, report rendering...) plus counts such as
+# tokens and cache hits. Code marks stages with `with profiling.stage(name):`
+# and counts with profiling.count(); both do nothing unless a profile is
+# active in the current context, so unprofiled requests pay one context
+# variable lookup per stage.
+#
+# A request is profiled when it sends `X-Profile: 1` with an `X-Admin-Token`
+# equal to PROFILE_ADMIN_TOKEN (unset: header opt-in is off), or at random
+# for a PROFILE_SAMPLE_RATE fraction (default 0) of requests. Finished
+# profiles go into a ring buffer of the last PROFILE_BUFFER_SIZE per worker.
+
+import contextvars
+import hmac
+import os
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests, 0-1
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "200"))  # per worker
+
+_current = contextvars.ContextVar("profile", default=None)
+
+
+class Profile:
+    """Stage timings and counts for one request."""
+
+    def __init__(self, label, reason):
+        self.id = secrets.token_hex(8)
+        self.label = label
+        self.reason = reason  # "header" or "sampled"
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.total_ms = None
+        self.stages = {}  # name -> [calls, wall seconds, cpu seconds]
+        self.counts = {}
+
+    def add(self, name, wall, cpu, calls=1):
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [calls, wall, cpu]
+        else:
+            entry[0] += calls
+            entry[1] += wall
+            entry[2] += cpu
+
+    def count(self, name, amount=1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def merge(self, data):
+        """Fold in the to_dict() of a profile taken elsewhere, e.g. in an analysis process."""
+        for name, stage in data['stages'].items():
+            self.add(name, stage['wall_ms'] / 1000, stage['cpu_ms'] / 1000, stage['calls'])
+        for name, amount in data['counts'].items():
+            self.count(name, amount)
+
+    def finish(self):
+        if self.total_ms is None:
+            self.total_ms = (time.perf_counter() - self._start) * 1000
+
+    def server_timing(self):
+        """Server-Timing entries for the stages recorded so far."""
+        return [f'prof-{name.replace("/", ".")};dur={wall * 1000:.1f};desc="cpu {cpu * 1000:.1f}ms x{calls}"'
+                for name, (calls, wall, cpu) in self.stages.items()]
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "label": self.label,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "total_ms": round(self.total_ms, 3) if self.total_ms is not None else None,
+            "stages": {
+                name: {"calls": calls, "wall_ms": round(wall * 1000, 3), "cpu_ms": round(cpu * 1000, 3)}
+                for name, (calls, wall, cpu) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+            },
+            "counts": dict(self.counts)
+        }
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "wall", "cpu")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def current():
+    """The profile active in this context, or None."""
+    return _current.get()
+
+
+def stage(name):
+    """Context manager timing a stage of the active profile (no-op without one)."""
+    profile = _current.get()
+    return _NULL_STAGE if profile is None else _Stage(profile, name)
+
+
+def count(name, amount=1):
+    profile = _current.get()
+    if profile is not None:
+        profile.count(name, amount)
+
+
+@contextmanager
+def activate(profile):
+    """Make profile (may be None) the active one inside the block."""
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+def is_admin(headers):
+    token = headers.get("X-Admin-Token", "")
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode())
+
+
+def profile_for_request(label, headers):
+    """A new Profile when this request opted in (as an admin) or was sampled, else None."""
+    if headers.get("X-Profile") == "1" and is_admin(headers):
+        return Profile(label, "header")
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return Profile(label, "sampled")
+    return None
+
+
+class ProfileBuffer:
+    """The last `size` finished profiles of this worker."""
+
+    def __init__(self, size=PROFILE_BUFFER_SIZE):
+        self._profiles = deque(maxlen=max(1, size))
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        profile.finish()
+        data = profile.to_dict()
+        with self._lock:
+            self._profiles.append(data)
+
+    def recent(self, limit=None):
+        with self._lock:
+            profiles = list(self._profiles)
+        profiles.reverse()
+        return profiles[:limit] if limit else profiles
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((p for p in self._profiles if p['id'] == profile_id), None)
@@ -0,0 +1,178 @@
+# readability.py — single-pass readability scores with a syllable cache
+# --------------------------------------------------------------
+# textstat computes every score from scratch: seven calls re-split the text
+# and re-syllabify every word seven times. Here one pass over the text
+# collects the counts every formula needs (words, sentences, syllables,
+# polysyllables, characters, letters, difficult words), and the scores are
+# derived from those counts. Syllables come from the same pyphen dictionary
+# textstat uses, memoized per word in a bounded LRU cache.
+#
+# Output matches textstat 0.7.3 (English, default rounding) for the scores
+# below. Counts from separate pieces of text can be merged, so a transcript
+# can be scored turn by turn.
+
+import math
+import os
+import re
+from functools import lru_cache
+from importlib import resources
+
+from pyphen import Pyphen
+
+READABILITY_SYLLABLE_CACHE_SIZE = int(os.getenv("READABILITY_SYLLABLE_CACHE_SIZE", "50000"))
+
+# Same tokenization rules as textstat
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+SENTENCE_RE = re.compile(r"\b[^.!?]+[.!?]*", re.UNICODE)
+DIFFICULT_WORD_RE = re.compile(r"[\w\='‘’]+")
+
+GUNNING_FOG_SYLLABLE_THRESHOLD = 3  # textstat's "syllable_threshold" for English
+DIFFICULT_WORD_SYLLABLE_THRESHOLD = 2
+
+_pyphen = Pyphen(lang="en_US")
+
+
+def _load_easy_words():
+    path = resources.files("textstat") / "resources" / "en" / "easy_words.txt"
+    with path.open("r", encoding="utf-8") as f:
+        return frozenset(line.strip() for line in f)
+
+
+EASY_WORDS = _load_easy_words()
+
+
+@lru_cache(maxsize=READABILITY_SYLLABLE_CACHE_SIZE)
+def word_syllables(word):
+    """Syllables in one lowercased, punctuation-free word."""
+    return len(_pyphen.positions(word)) + 1
+
+
+def _legacy_round(number, points=0):
+    # textstat rounds half away from zero, not to even
+    p = 10 ** points
+    return float(math.floor((number * p) + math.copysign(0.5, number))) / p
+
+
+def empty_counts():
+    return {
+        "words": 0,
+        "sentences": 0,
+        "syllables": 0,
+        "polysyllables": 0,
+        "chars": 0,
+        "letters": 0,
+        "long_words": 0,
+        "raw_words": 0,
+        "long_raw_words": 0,
+        # unique words outside the easy-word list -> syllables
+        "hard_words": {}
+    }
+
+
+def text_counts(text):
+    """Collect every count the scores need in one pass over text."""
+    counts = empty_counts()
+    if not text:
+        return counts
+
+    raw_words = text.split()
+    counts["raw_words"] = len(raw_words)
+    counts["long_raw_words"] = sum(1 for w in raw_words if len(w) > 6)
+    counts["chars"] = sum(len(w) for w in raw_words)
+
+    for word in PUNCTUATION_RE.sub("", text.lower()).split():
+        syllables = word_syllables(word)
+        counts["words"] += 1
+        counts["syllables"] += syllables
+        counts["letters"] += len(word)
+        if syllables >= 3:
+            counts["polysyllables"] += 1
+        if len(word) > 6:
+            counts["long_words"] += 1
+
+    # Fragments of two words or fewer ("Okay.", "Yes, sure!") are not sentences
+    counts["sentences"] = sum(
+        1 for sentence in SENTENCE_RE.findall(text)
+        if len(PUNCTUATION_RE.sub("", sentence).split()) > 2
+    )
+
+    hard_words = counts["hard_words"]
+    for word in set(DIFFICULT_WORD_RE.findall(text.lower())):
+        if word not in EASY_WORDS:
+            hard_words[word] = sum(word_syllables(w) for w in PUNCTUATION_RE.sub("", word).split())
+    return counts
+
+
+def merge_counts(total, counts):
+    """Fold counts from another piece of text into total, in place."""
+    for key, value in counts.items():
+        if key == "hard_words":
+            total[key].update(value)
+        else:
+            total[key] += value
+    return total
+
+
+def difficult_word_count(counts, syllable_threshold=DIFFICULT_WORD_SYLLABLE_THRESHOLD):
+    return sum(1 for syllables in counts["hard_words"].values() if syllables >= syllable_threshold)
+
+
+def scores_from_counts(counts):
+    """Derive the readability scores from counts, rounded like textstat."""
+    words = counts["words"]
+    sentences = max(1, counts["sentences"])
+
+    avg_sentence_length = _legacy_round(words / sentences, 1)
+    avg_syllables_per_word = _legacy_round(counts["syllables"] / words, 1) if words else 0.0
+
+    if words:
+        per_hard_words = difficult_word_count(counts, GUNNING_FOG_SYLLABLE_THRESHOLD) / words * 100
+        gunning_fog = _legacy_round(0.4 * (avg_sentence_length + per_hard_words), 2)
+        ari = _legacy_round(
+            4.71 * _legacy_round(counts["chars"] / words, 2)
+            + 0.5 * _legacy_round(words / sentences, 2)
+            - 21.43, 1)
+        letters_per_100 = _legacy_round(_legacy_round(counts["letters"] / words, 2) * 100, 2)
+        sentences_per_100 = _legacy_round(_legacy_round(sentences / words, 2) * 100, 2)
+        per_difficult_words = 100 - (words - difficult_word_count(counts, 0)) / words * 100
+        dale_chall = 0.1579 * per_difficult_words + 0.0496 * avg_sentence_length
+        if per_difficult_words > 5:
+            dale_chall += 3.6365
+        dale_chall = _legacy_round(dale_chall, 2)
+    else:
+        gunning_fog = ari = dale_chall = 0.0
+        letters_per_100 = sentences_per_100 = 0.0
+
+    smog = 0.0
+    if sentences >= 3:
+        smog = _legacy_round(1.043 * (30 * (counts["polysyllables"] / sentences)) ** .5 + 3.1291, 1)
+
+    lix = 0.0
+    if counts["raw_words"]:
+        lix = _legacy_round(avg_sentence_length + counts["long_raw_words"] * 100 / counts["raw_words"], 2)
+
+    return {
+        "flesch_reading_ease": _legacy_round(
+            206.835 - 1.015 * avg_sentence_length - 84.6 * avg_syllables_per_word, 2),
+        "flesch_kincaid_grade": _legacy_round(
+            0.39 * avg_sentence_length + 11.8 * avg_syllables_per_word - 15.59, 1),
+        "gunning_fog": gunning_fog,
+        "automated_readability_index": ari,
+        "coleman_liau_index": _legacy_round(0.058 * letters_per_100 - 0.296 * sentences_per_100 - 15.8, 2),
+        "smog_index": smog,
+        "dale_chall_readability_score": dale_chall,
+        "lix": lix,
+        "rix": _legacy_round(counts["long_words"] / sentences, 2),
+        "avg_sentence_length": avg_sentence_length,
+        "avg_syllables_per_word": avg_syllables_per_word,
+        "difficult_words": difficult_word_count(counts),
+        "polysyllable_count": counts["polysyllables"],
+        "syllable_count": counts["syllables"],
+        "lexicon_count": words,
+        "sentence_count": sentences
+    }
+
+
+def readability_scores(text):
+    """All scores for one piece of text."""
+    return scores_from_counts(text_counts(text))
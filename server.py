@@ -9,125 +9,56 @@
 
 import os
 import json
+import gzip
+import contextlib
+import functools
+import hashlib
 import textwrap
-import requests
-from flask import Flask, request, jsonify, Response, redirect
+import threading
+import time
+import upstream
+import session_pool
+import analysis_pool
+import analysis_cache
+import analysis_sessions
+import analysis_jobs
+import admission
+import disfluency
+import metrics
+import profiling
+import nltk_bundle
+from flask import Flask, request, jsonify, Response, redirect, g
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 from datetime import datetime
 import re
 from collections import Counter
 
-# NLP libraries for analysis
+# NLP libraries for analysis are imported lazily (see "NLP Initialization"
+# below), so importing this module and serving /realtime never wait on them.
 ANALYSIS_AVAILABLE = False
 NLP_ERROR_MESSAGE = None
-
-print("=" * 60)
-print("Initializing NLP packages for conversation analysis...")
-print("=" * 60)
-
-try:
-    print("Step 1: Importing textstat...")
-    import textstat
-    print(f"✓ textstat imported successfully (version: {getattr(textstat, '__version__', 'unknown')})")
-    
-    print("\nStep 2: Importing nltk...")
-    import nltk
-    print(f"✓ nltk imported successfully (version: {nltk.__version__})")
-    
-    print("\nStep 3: Setting NLTK data directory...")
-    import os
-    # Ensure NLTK data directory exists and is writable
-    nltk_data_dir = os.path.expanduser('~/nltk_data')
-    if not os.path.exists(nltk_data_dir):
-        os.makedirs(nltk_data_dir, exist_ok=True)
-        print(f"✓ Created NLTK data directory: {nltk_data_dir}")
-    else:
-        print(f"✓ NLTK data directory exists: {nltk_data_dir}")
-    
-    # Add to NLTK data path if not already there
-    if nltk_data_dir not in nltk.data.path:
-        nltk.data.path.insert(0, nltk_data_dir)
-    print(f"NLTK data paths: {nltk.data.path[:3]}")  # Show first 3 paths
-    
-    print("\nStep 4: Downloading NLTK data files...")
-    
-    # Download punkt tokenizer
-    try:
-        nltk.data.find('tokenizers/punkt')
-        print("✓ punkt tokenizer already downloaded")
-    except LookupError:
-        print("Downloading punkt tokenizer...")
-        nltk.download('punkt', quiet=False, download_dir=nltk_data_dir)
-        try:
-            nltk.download('punkt_tab', quiet=False, download_dir=nltk_data_dir)
-        except:
-            pass  # punkt_tab might not exist in older NLTK versions
-    
-    # Download stopwords
-    try:
-        nltk.data.find('corpora/stopwords')
-        print("✓ stopwords already downloaded")
-    except LookupError:
-        print("Downloading stopwords...")
-        nltk.download('stopwords', quiet=False, download_dir=nltk_data_dir)
-    
-    # Download POS tagger
-    try:
-        nltk.data.find('taggers/averaged_perceptron_tagger')
-        print("✓ POS tagger already downloaded")
-    except LookupError:
-        print("Downloading POS tagger...")
-        nltk.download('averaged_perceptron_tagger', quiet=False, download_dir=nltk_data_dir)
-        try:
-            nltk.download('averaged_perceptron_tagger_eng', quiet=False, download_dir=nltk_data_dir)
-        except:
-            pass  # Might not exist in older versions
-    
-    print("\nStep 5: Importing NLTK modules...")
-    from nltk.tokenize import word_tokenize, sent_tokenize
-    from nltk.corpus import stopwords
-    print("✓ NLTK modules imported successfully")
-    
-    ANALYSIS_AVAILABLE = True
-    print("\n" + "=" * 60)
-    print("✓✓✓ NLP ANALYSIS FEATURES FULLY ENABLED ✓✓✓")
-    print("=" * 60)
-    
-except ImportError as e:
-    NLP_ERROR_MESSAGE = f"Import error: {str(e)}"
-    print("\n" + "=" * 60)
-    print("✗ IMPORT ERROR - NLP packages not installed")
-    print("=" * 60)
-    print(f"Error details: {NLP_ERROR_MESSAGE}")
-    print("\nTo fix this issue:")
-    print("1. Ensure requirements.txt contains:")
-    print("   textstat==0.7.3")
-    print("   nltk==3.8.1")
-    print("2. Check Render build logs to confirm packages were installed")
-    print("=" * 60)
-    
-except Exception as e:
-    NLP_ERROR_MESSAGE = f"Initialization error: {str(e)}"
-    print("\n" + "=" * 60)
-    print("✗ INITIALIZATION ERROR")
-    print("=" * 60)
-    print(f"Error details: {NLP_ERROR_MESSAGE}")
-    print(f"Error type: {type(e).__name__}")
-    import traceback
-    print("\nFull traceback:")
-    traceback.print_exc()
-    print("=" * 60)
+textstat = nltk = readability = None
+word_tokenize = sent_tokenize = stopwords = None
 
 
 load_dotenv()
 
 # --------------------------- Config ---------------------------
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip("/")
+REALTIME_SESSIONS_URL = f"{OPENAI_API_BASE}/realtime/sessions"
+# Where the browser sends its SDP offer
+OPENAI_REALTIME_URL = os.getenv("OPENAI_REALTIME_URL", f"{OPENAI_API_BASE}/realtime")
+# Offline testing: Connect plays this recorded event stream (NDJSON) instead
+# of opening a call; see benchmarks/fake_upstream.py
+RT_REPLAY_URL = os.getenv("RT_REPLAY_URL", "")
 OPENAI_REALTIME_MODEL = os.getenv("OPENAI_REALTIME_MODEL", "gpt-4o-realtime-preview-2024-12-17")
 OPENAI_REALTIME_VOICE_DEFAULT = os.getenv("OPENAI_REALTIME_VOICE", "alloy")
 RT_SILENCE_MS = int(os.getenv("RT_SILENCE_MS", "1200"))  # pause after user stops
 VAD_THRESHOLD = float(os.getenv("RT_VAD_THRESHOLD", "0.5"))
+RT_PAGE_MAX_AGE = int(os.getenv("RT_PAGE_MAX_AGE", "0"))  # seconds browsers may skip revalidating /realtime
 
 # 7 preset "bots". Edit freely.
 BOTS = [
@@ -641,10 +572,330 @@ BOTS = [
 }
 ]
 
+def build_bot_manifest(bots):
+    """
+    Browser-facing view of BOTS. The page only needs enough to draw the
+    scenario buttons; role/task/constraints stay on the server, where
+    create_session() builds the instructions.
+    """
+    return [
+        {
+            "id": b["id"],
+            "title": b["title"],
+            "voice": b.get("voice", OPENAI_REALTIME_VOICE_DEFAULT),
+            "language": b.get("language_hint", "English")
+        }
+        for b in bots
+    ]
+
+BOT_MANIFEST = build_bot_manifest(BOTS)
+
+# Ids travel in URLs, filenames and JSON, so keep them to a safe character set
+BOT_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9 ._-]{0,63}$")
+
+def build_session_instructions(bot):
+    instructions = f"""
+You are: {bot['role']}
+Your task: {bot['task']}
+Constraints: {bot['constraints']}
+Language hint: {bot.get('language_hint', 'English')}
+"""
+    return instructions.strip()
+
+def build_bot_registry(bots):
+    """
+    Index BOTS by id and precompile each bot's upstream /session payload.
+    Raises ValueError on malformed or duplicate ids so a bad edit to BOTS
+    fails at startup instead of on a learner's Connect click.
+    """
+    registry = {}
+    for bot in bots:
+        bot_id = bot.get("id")
+        if not isinstance(bot_id, str) or not BOT_ID_PATTERN.match(bot_id):
+            raise ValueError(f"Malformed bot id: {bot_id!r}")
+        if bot_id in registry:
+            raise ValueError(f"Duplicate bot id: {bot_id!r}")
+
+        session_payload = {
+            "model": OPENAI_REALTIME_MODEL,
+            "voice": bot.get("voice", OPENAI_REALTIME_VOICE_DEFAULT),
+            "instructions": build_session_instructions(bot),
+            "modalities": ["text", "audio"],
+            "turn_detection": {
+                "type": "server_vad",
+                "threshold": VAD_THRESHOLD,
+                "silence_duration_ms": RT_SILENCE_MS,
+                "prefix_padding_ms": 300
+            },
+            "input_audio_transcription": {
+                "model": "whisper-1"
+            }
+        }
+        registry[bot_id] = {
+            "bot": bot,
+            "session_payload": json.dumps(session_payload).encode("utf-8")
+        }
+    return registry
+
+BOT_REGISTRY = build_bot_registry(BOTS)
+DEFAULT_BOT_ID = BOTS[0]["id"]
+
+def bot_language(bot_id):
+    """language_hint of a bot; English for unknown ids."""
+    entry = BOT_REGISTRY.get(bot_id)
+    return entry["bot"].get("language_hint", "English") if entry else "English"
+
+
+# --------------------------- NLP Initialization ---------------------------
+# Importing nltk, fetching missing NLTK data and loading the models takes
+# seconds and may hit the network, so none of it happens at import time.
+# NLP_WARMUP picks when it runs:
+#   background (default) — in a daemon thread right after import
+#   eager — during import, before the worker serves anything
+#   lazy — on the first /analyze request
+# /analyze waits up to NLP_INIT_TIMEOUT seconds for it and falls back to the
+# basic report after that. NLP_READY is set once initialization has finished,
+# whether or not analysis ended up available.
+#
+# nltk.pos_tag() builds a new PerceptronTagger, and looks its model up on
+# disk, on every call. The tagger, the punkt sentence tokenizer and the
+# stopword set are instead loaded once per worker and warmed, so no model
+# loading happens while a learner waits for /analyze.
+
+NLP_WARMUP = os.getenv("NLP_WARMUP", "background").lower()
+NLP_INIT_TIMEOUT = float(os.getenv("NLP_INIT_TIMEOUT", "30"))
+
+NLP_STATE = "not_started"  # -> loading -> ready | failed
+NLP_READY = threading.Event()
+NLP_INIT_STATS = {"init_ms": None, "finished_at": None}
+_nlp_init_lock = threading.Lock()
+_nlp_init_pid = None
+
+NLP_MODELS = {}
+NLP_MODEL_STATS = {
+    "load_ms": {},
+    "errors": {},
+    "loaded_at": None,
+    "loads_on_request_path": 0
+}
+
+def _short_error(e):
+    return f"{type(e).__name__}: {' '.join(str(e).split())[:200]}"
+
+def init_nlp():
+    """Import textstat and nltk, fetch missing NLTK data and warm the models."""
+    global ANALYSIS_AVAILABLE, NLP_ERROR_MESSAGE, NLP_STATE
+    global textstat, nltk, readability, word_tokenize, sent_tokenize, stopwords
+    
+    start = time.perf_counter()
+    try:
+        import textstat
+        import nltk
+        import readability  # single-pass scores built on textstat's syllable rules
+        
+        # Search the build-time bundle first, then the per-user directory that
+        # runtime downloads go to
+        nltk_data_dir = os.path.expanduser('~/nltk_data')
+        for path in (nltk_data_dir, nltk_bundle.NLTK_DATA_DIR):
+            if path not in nltk.data.path:
+                nltk.data.path.insert(0, path)
+        
+        missing = nltk_bundle.missing_resources(nltk)
+        if missing and nltk_bundle.NLTK_OFFLINE:
+            raise LookupError(f"NLTK data missing and NLTK_OFFLINE=1: {', '.join(missing)}. "
+                              "Run `python nltk_bundle.py` during the build.")
+        if missing:
+            os.makedirs(nltk_data_dir, exist_ok=True)
+            nltk_bundle.download_resources(nltk, nltk_data_dir, missing)
+        
+        from nltk.tokenize import word_tokenize, sent_tokenize
+        from nltk.corpus import stopwords
+        
+        ANALYSIS_AVAILABLE = True
+        warm_nlp_models()
+        NLP_STATE = "ready"
+        print(f"✓ NLP analysis enabled (textstat {getattr(textstat, '__version__', 'unknown')}, "
+              f"nltk {nltk.__version__}) in {time.perf_counter() - start:.2f}s")
+    
+    except ImportError as e:
+        NLP_ERROR_MESSAGE = f"Import error: {str(e)}"
+        NLP_STATE = "failed"
+        print(f"✗ NLP packages not installed ({NLP_ERROR_MESSAGE}). "
+              "Ensure requirements.txt contains textstat==0.7.3 and nltk==3.8.1.")
+    
+    except Exception as e:
+        NLP_ERROR_MESSAGE = f"Initialization error: {str(e)}"
+        NLP_STATE = "failed"
+        print(f"✗ NLP initialization error ({type(e).__name__}): {NLP_ERROR_MESSAGE}")
+        import traceback
+        traceback.print_exc()
+    
+    finally:
+        NLP_INIT_STATS["init_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        NLP_INIT_STATS["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        NLP_READY.set()
+
+def start_nlp_init(background=True):
+    """
+    Start initialization unless this process already did. Returns False if
+    it was already started. A process forked while the parent was still
+    loading starts over, since the loading thread did not survive the fork.
+    """
+    global NLP_STATE, _nlp_init_pid
+    with _nlp_init_lock:
+        if NLP_STATE != "not_started" and (NLP_READY.is_set() or _nlp_init_pid == os.getpid()):
+            return False
+        NLP_STATE = "loading"
+        _nlp_init_pid = os.getpid()
+    
+    if background:
+        threading.Thread(target=init_nlp, name="nlp-init", daemon=True).start()
+    else:
+        init_nlp()
+    return True
+
+def ensure_nlp(timeout=NLP_INIT_TIMEOUT):
+    """
+    Make sure initialization has run, waiting up to timeout seconds for a
+    background load. Returns the milliseconds this call spent on it.
+    """
+    if NLP_READY.is_set():
+        return 0.0
+    start = time.perf_counter()
+    if start_nlp_init(background=False):
+        NLP_MODEL_STATS["loads_on_request_path"] += 1
+    else:
+        NLP_READY.wait(timeout)
+    return (time.perf_counter() - start) * 1000
+
+def load_nlp_models():
+    """Load the tagger, punkt and stopwords; returns milliseconds spent."""
+    from nltk.tag.perceptron import PerceptronTagger
+    
+    loaders = {
+        "sentence_tokenizer": lambda: nltk.data.load("tokenizers/punkt/english.pickle"),
+        "pos_tagger": PerceptronTagger,
+        "stopwords": lambda: frozenset(stopwords.words("english"))
+    }
+    start = time.perf_counter()
+    for name, loader in loaders.items():
+        t0 = time.perf_counter()
+        try:
+            NLP_MODELS[name] = loader()
+        except Exception as e:
+            NLP_MODEL_STATS["errors"][name] = _short_error(e)
+            continue
+        NLP_MODEL_STATS["load_ms"][name] = round((time.perf_counter() - t0) * 1000, 2)
+    
+    NLP_MODEL_STATS["loaded_at"] = datetime.now().isoformat(timespec="seconds")
+    return (time.perf_counter() - start) * 1000
+
+def warm_nlp_models():
+    """Load the models and push a sample through them before serving analyses."""
+    load_nlp_models()
+    try:
+        sentences = split_sentences("Warm up the tokenizer. And the tagger too.")
+        tag_words(word_tokenize(sentences[0].lower(), preserve_line=True))
+    except Exception as e:
+        NLP_MODEL_STATS["errors"]["warmup"] = _short_error(e)
+
+def split_sentences(text):
+    """sent_tokenize() with the preloaded punkt model."""
+    tokenizer = NLP_MODELS.get("sentence_tokenizer")
+    return tokenizer.tokenize(text) if tokenizer is not None else sent_tokenize(text)
+
+def tag_words(words):
+    """nltk.pos_tag() with the preloaded tagger."""
+    tagger = NLP_MODELS.get("pos_tagger")
+    return tagger.tag(words) if tagger is not None else nltk.pos_tag(words)
+
+# Under gunicorn --preload (see gunicorn.conf.py) "eager" runs this once in
+# the master, and the loaded models are shared copy-on-write with workers.
+if NLP_WARMUP == "eager":
+    start_nlp_init(background=False)
+elif NLP_WARMUP == "background":
+    start_nlp_init(background=True)
+
 
 # --------------------------- Helper Functions ---------------------------
 
-def analyze_conversation_metrics(conversation):
+# A transcript is analyzed turn by turn: turn_counts() collects everything
+# the report needs from one turn, merge_turn_counts() folds those into a
+# running aggregate, and analysis_from_aggregate() derives the metrics. The
+# whole-transcript /analyze and the incremental per-turn API (see
+# analysis_sessions.py) share this path, so both produce the same report.
+
+def empty_turn_aggregate():
+    return {
+        'total_turns': 0,
+        'user_turns': 0,
+        'assistant_turns': 0,
+        'words': 0,         # alphanumeric word tokens
+        'sentences': 0,
+        'turn_words': 0,    # whitespace-split words, for words per turn
+        'readability': readability.empty_counts(),
+        'disfluency': disfluency.empty_counts(),
+        'word_counts': Counter(),
+        'pos_counts': Counter()
+    }
+
+def turn_counts(role, text, language='English'):
+    """Counts for one turn, in the shape of empty_turn_aggregate()."""
+    counts = empty_turn_aggregate()
+    counts['total_turns'] = 1
+    if role == 'assistant':
+        counts['assistant_turns'] = 1
+    if role != 'user':
+        return counts
+    
+    counts['user_turns'] = 1
+    lower_text = text.lower()
+    with profiling.stage("turns/split-sentences"):
+        sentences = split_sentences(text)
+    with profiling.stage("turns/tokenize"):
+        tokens = [tok for sentence in sentences
+                  for tok in word_tokenize(sentence.lower(), preserve_line=True)]
+        words = [w for w in tokens if w.isalnum()]
+    profiling.count("tokens", len(tokens))
+    
+    counts['words'] = len(words)
+    counts['sentences'] = len(sentences)
+    counts['turn_words'] = len(lower_text.split())
+    with profiling.stage("turns/readability"):
+        counts['readability'] = readability.text_counts(text)
+    with profiling.stage("turns/disfluency"):
+        counts['disfluency'] = disfluency.matcher_for(language).scan(lower_text)
+    counts['word_counts'] = Counter(words)
+    if words:
+        try:
+            with profiling.stage("turns/pos-tag"):
+                counts['pos_counts'] = Counter(tag for word, tag in tag_words(words))
+        except:
+            pass
+    return counts
+
+def merge_turn_counts(total, counts):
+    """Fold one turn's counts (or another aggregate) into total, in place."""
+    for key in ('total_turns', 'user_turns', 'assistant_turns', 'words', 'sentences', 'turn_words'):
+        total[key] += counts[key]
+    readability.merge_counts(total['readability'], counts['readability'])
+    disfluency.merge_counts(total['disfluency'], counts['disfluency'])
+    total['word_counts'].update(counts['word_counts'])
+    total['pos_counts'].update(counts['pos_counts'])
+    return total
+
+def fold_turn_counts(total, counts):
+    """merge_turn_counts() that starts a new aggregate when total is None."""
+    return merge_turn_counts(total if total is not None else empty_turn_aggregate(), counts)
+
+def aggregate_from_json(data):
+    """Restore the Counters of an aggregate that went through json.dumps()."""
+    data['disfluency']['fillers'] = Counter(data['disfluency']['fillers'])
+    data['word_counts'] = Counter(data['word_counts'])
+    data['pos_counts'] = Counter(data['pos_counts'])
+    return data
+
+def analyze_conversation_metrics(conversation, bot_id=None):
     """
     Analyze conversation using Python NLP packages to generate linguistic metrics.
     Returns a formatted analysis report as a string.
@@ -652,133 +903,115 @@ def analyze_conversation_metrics(conversation):
     if not ANALYSIS_AVAILABLE:
         return generate_basic_analysis(conversation)
     
-    # Separate user and assistant turns
-    user_turns = [msg['text'] for msg in conversation if msg['role'] == 'user']
-    assistant_turns = [msg['text'] for msg in conversation if msg['role'] == 'assistant']
-    
-    # Combine all user text
-    user_text = ' '.join(user_turns)
-    
-    # Basic counts
-    total_turns = len(conversation)
-    user_turn_count = len(user_turns)
-    assistant_turn_count = len(assistant_turns)
-    
-    # Analyze user language
-    analysis = {
+    return format_analysis_report(compute_analysis(conversation, bot_id), conversation)
+
+def compute_analysis(conversation, bot_id=None, progress=None):
+    """
+    The metrics behind the report as a JSON-serializable dict, so it can be
+    cached and rendered again later. Requires ANALYSIS_AVAILABLE.
+    progress(done, total), if given, is called every few turns.
+    """
+    language = bot_language(bot_id)
+    total = empty_turn_aggregate()
+    profiling.count("turns", len(conversation))
+    for i, msg in enumerate(conversation, 1):
+        counts = turn_counts(msg['role'], msg['text'], language)
+        with profiling.stage("turns/merge"):
+            merge_turn_counts(total, counts)
+        if progress is not None and (i % 10 == 0 or i == len(conversation)):
+            progress(i, len(conversation))
+    return analysis_from_aggregate(total)
+
+def analysis_from_aggregate(total):
+    """Derive every metric in the report from a turn aggregate."""
+    with profiling.stage("metrics/basic_stats"):
+        basic_stats = analyze_basic_stats(total)
+    with profiling.stage("metrics/complexity"):
+        complexity_metrics = analyze_complexity(total)
+    with profiling.stage("metrics/fluency"):
+        fluency_metrics = fluency_metrics_from_counts(total['disfluency'])
+    with profiling.stage("metrics/vocabulary"):
+        vocabulary_metrics = analyze_vocabulary(total)
+    return {
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'basic_stats': analyze_basic_stats(user_text, user_turns),
-        'complexity_metrics': analyze_complexity(user_text),
-        'fluency_metrics': analyze_fluency(user_turns),
-        'vocabulary_metrics': analyze_vocabulary(user_text),
+        'basic_stats': basic_stats,
+        'complexity_metrics': complexity_metrics,
+        'fluency_metrics': fluency_metrics,
+        'vocabulary_metrics': vocabulary_metrics,
         'turn_taking': {
-            'total_turns': total_turns,
-            'user_turns': user_turn_count,
-            'assistant_turns': assistant_turn_count,
-            'avg_words_per_user_turn': sum(len(turn.split()) for turn in user_turns) / max(user_turn_count, 1)
+            'total_turns': total['total_turns'],
+            'user_turns': total['user_turns'],
+            'assistant_turns': total['assistant_turns'],
+            'avg_words_per_user_turn': total['turn_words'] / max(total['user_turns'], 1)
         }
     }
-    
-    return format_analysis_report(analysis, conversation)
 
-def analyze_basic_stats(text, turns):
+def analyze_basic_stats(total):
     """Calculate basic text statistics."""
-    words = word_tokenize(text.lower())
-    sentences = sent_tokenize(text)
-    
-    # Remove punctuation from words
-    words_only = [w for w in words if w.isalnum()]
-    
     return {
-        'total_words': len(words_only),
-        'total_sentences': len(sentences),
-        'total_turns': len(turns),
-        'avg_words_per_sentence': len(words_only) / max(len(sentences), 1),
-        'avg_words_per_turn': len(words_only) / max(len(turns), 1)
+        'total_words': total['words'],
+        'total_sentences': total['sentences'],
+        'total_turns': total['user_turns'],
+        'avg_words_per_sentence': total['words'] / max(total['sentences'], 1),
+        'avg_words_per_turn': total['words'] / max(total['user_turns'], 1)
     }
 
-def analyze_complexity(text):
+def analyze_complexity(total):
     """Analyze text complexity using various readability metrics."""
-    if not text.strip():
+    if not total['readability']['raw_words']:
         return {}
     
     try:
-        return {
-            'flesch_reading_ease': round(textstat.flesch_reading_ease(text), 2),
-            'flesch_kincaid_grade': round(textstat.flesch_kincaid_grade(text), 2),
-            'gunning_fog': round(textstat.gunning_fog(text), 2),
-            'automated_readability_index': round(textstat.automated_readability_index(text), 2),
-            'coleman_liau_index': round(textstat.coleman_liau_index(text), 2),
-            'avg_syllables_per_word': round(textstat.avg_syllables_per_word(text), 2),
-            'difficult_words': textstat.difficult_words(text)
-        }
+        return complexity_metrics_from_counts(total['readability'])
     except:
         return {}
 
-def analyze_fluency(turns):
-    """Analyze fluency metrics including false starts, fillers, etc."""
-    filler_words = ['um', 'uh', 'like', 'you know', 'i mean', 'sort of', 'kind of', 
-                    'actually', 'basically', 'literally', 'well', 'so', 'okay', 'right']
-    
-    total_fillers = 0
-    total_words = 0
-    hesitations = 0
-    
-    for turn in turns:
-        words = turn.lower().split()
-        total_words += len(words)
-        
-        # Count fillers
-        for filler in filler_words:
-            if ' ' in filler:
-                total_fillers += turn.lower().count(filler)
-            else:
-                total_fillers += words.count(filler)
-        
-        # Count hesitations (repeated words)
-        for i in range(len(words) - 1):
-            if words[i] == words[i + 1] and words[i].isalnum():
-                hesitations += 1
-    
+def complexity_metrics_from_counts(counts):
+    scores = readability.scores_from_counts(counts)
+    return {
+        'flesch_reading_ease': scores['flesch_reading_ease'],
+        'flesch_kincaid_grade': scores['flesch_kincaid_grade'],
+        'gunning_fog': scores['gunning_fog'],
+        'automated_readability_index': scores['automated_readability_index'],
+        'coleman_liau_index': scores['coleman_liau_index'],
+        'smog_index': scores['smog_index'],
+        'dale_chall_readability_score': scores['dale_chall_readability_score'],
+        'avg_syllables_per_word': scores['avg_syllables_per_word'],
+        'difficult_words': scores['difficult_words']
+    }
+
+def fluency_metrics_from_counts(counts):
+    total_fillers = sum(counts['fillers'].values())
     return {
         'total_filler_words': total_fillers,
-        'filler_word_rate': round(total_fillers / max(total_words, 1) * 100, 2),
-        'hesitations_repetitions': hesitations
+        'filler_word_rate': round(total_fillers / max(counts['words'], 1) * 100, 2),
+        'hesitation_sounds': counts['hesitation_sounds'],
+        'hesitations_repetitions': counts['repetitions'],
+        'filler_counts': counts['fillers'].most_common()
     }
 
-def analyze_vocabulary(text):
+def analyze_vocabulary(total):
     """Analyze vocabulary diversity and sophistication."""
-    words = word_tokenize(text.lower())
-    words_only = [w for w in words if w.isalnum()]
+    word_freq = total['word_counts']
     
-    if not words_only:
+    if not total['words']:
         return {}
     
-    # Unique words
-    unique_words = set(words_only)
-    
     # Type-Token Ratio (vocabulary diversity)
-    ttr = len(unique_words) / len(words_only)
+    ttr = len(word_freq) / total['words']
     
     # POS tagging
-    try:
-        pos_tags = nltk.pos_tag(words_only)
-        pos_counts = Counter([tag for word, tag in pos_tags])
-        
-        # Count different word types
-        verbs = sum(count for tag, count in pos_counts.items() if tag.startswith('VB'))
-        nouns = sum(count for tag, count in pos_counts.items() if tag.startswith('NN'))
-        adjectives = sum(count for tag, count in pos_counts.items() if tag.startswith('JJ'))
-        adverbs = sum(count for tag, count in pos_counts.items() if tag.startswith('RB'))
-    except:
-        verbs = nouns = adjectives = adverbs = 0
+    pos_counts = total['pos_counts']
+    verbs = sum(count for tag, count in pos_counts.items() if tag.startswith('VB'))
+    nouns = sum(count for tag, count in pos_counts.items() if tag.startswith('NN'))
+    adjectives = sum(count for tag, count in pos_counts.items() if tag.startswith('JJ'))
+    adverbs = sum(count for tag, count in pos_counts.items() if tag.startswith('RB'))
     
     # Most common words
-    word_freq = Counter(words_only)
     most_common = word_freq.most_common(10)
     
     return {
-        'total_unique_words': len(unique_words),
+        'total_unique_words': len(word_freq),
         'type_token_ratio': round(ttr, 3),
         'lexical_density': round(ttr * 100, 2),
         'verbs': verbs,
@@ -788,8 +1021,17 @@ def analyze_vocabulary(text):
         'most_common_words': most_common
     }
 
+REPORT_CHUNK_SIZE = 16 * 1024  # characters of transcript per streamed chunk
+
 def format_analysis_report(analysis, conversation):
     """Format the analysis into a readable text report."""
+    return ''.join(iter_analysis_report(analysis, conversation))
+
+def iter_analysis_report(analysis, conversation):
+    """
+    The text report in chunks: the metrics first, then the transcript a
+    few turns at a time, so it can be streamed without building it whole.
+    """
     report = []
     
     # Header
@@ -806,6 +1048,7 @@ def format_analysis_report(analysis, conversation):
     bs = analysis['basic_stats']
     report.append(f"Total Words (Student): {bs['total_words']}")
     report.append(f"Total Sentences: {bs['total_sentences']}")
+    report.append("  (counted turn by turn: a turn without punctuation is one sentence)")
     report.append(f"Total Turns: {bs['total_turns']}")
     report.append(f"Average Words per Sentence: {bs['avg_words_per_sentence']:.2f}")
     report.append(f"Average Words per Turn: {bs['avg_words_per_turn']:.2f}")
@@ -828,6 +1071,8 @@ def format_analysis_report(analysis, conversation):
         report.append("COMPLEXITY METRICS")
         report.append("-" * 80)
         cm = analysis['complexity_metrics']
+        report.append("Sentence-based scores use the per-turn sentence count, so unpunctuated")
+        report.append("speech scores as easier than the whole transcript run through one tool.")
         if 'flesch_reading_ease' in cm:
             report.append(f"Flesch Reading Ease: {cm['flesch_reading_ease']}")
             report.append("  (0-30: Very Difficult, 60-70: Standard, 90-100: Very Easy)")
@@ -839,6 +1084,10 @@ def format_analysis_report(analysis, conversation):
             report.append(f"Automated Readability Index: {cm['automated_readability_index']}")
         if 'coleman_liau_index' in cm:
             report.append(f"Coleman-Liau Index: {cm['coleman_liau_index']}")
+        if 'smog_index' in cm:
+            report.append(f"SMOG Index: {cm['smog_index']}")
+        if 'dale_chall_readability_score' in cm:
+            report.append(f"Dale-Chall Readability Score: {cm['dale_chall_readability_score']}")
         if 'avg_syllables_per_word' in cm:
             report.append(f"Average Syllables per Word: {cm['avg_syllables_per_word']}")
         if 'difficult_words' in cm:
@@ -852,7 +1101,12 @@ def format_analysis_report(analysis, conversation):
     fm = analysis['fluency_metrics']
     report.append(f"Total Filler Words: {fm['total_filler_words']}")
     report.append(f"Filler Word Rate: {fm['filler_word_rate']}%")
+    report.append(f"Hesitation Sounds (um, uh...): {fm['hesitation_sounds']}")
     report.append(f"Hesitations/Repetitions: {fm['hesitations_repetitions']}")
+    if fm['filler_counts']:
+        report.append(f"\nFillers Used:")
+        for filler, count in fm['filler_counts']:
+            report.append(f"  {filler}: {count}")
     report.append("")
     
     # Vocabulary Metrics
@@ -878,31 +1132,44 @@ def format_analysis_report(analysis, conversation):
                 report.append(f"  {word}: {count}")
         report.append("")
     
-    # Transcript
-    report.append("=" * 80)
-    report.append("FULL CONVERSATION TRANSCRIPT")
-    report.append("=" * 80)
-    report.append("")
-    
+    yield '\n'.join(report) + '\n'
+    yield from iter_transcript(conversation, footer=True)
+
+def iter_transcript(conversation, footer=False):
+    """The transcript section of a report, in chunks of about REPORT_CHUNK_SIZE."""
+    chunk = ["=" * 80 + "\nFULL CONVERSATION TRANSCRIPT\n" + "=" * 80 + "\n\n"]
+    size = 0
     for i, msg in enumerate(conversation, 1):
+        if size >= REPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
         role = "STUDENT" if msg['role'] == 'user' else "BOT"
-        report.append(f"[Turn {i}] {role}:")
-        report.append(f"{msg['text']}")
-        report.append("")
-    
-    report.append("=" * 80)
-    report.append("END OF REPORT")
-    report.append("=" * 80)
+        chunk.append(f"[Turn {i}] {role}:\n{msg['text']}\n\n")
+        size += len(msg['text'])
     
-    return '\n'.join(report)
+    if footer:
+        chunk.append("=" * 80 + "\nEND OF REPORT\n" + "=" * 80)
+        yield ''.join(chunk)
+    else:
+        yield ''.join(chunk)[:-1]
 
-def generate_basic_analysis(conversation):
-    """Generate a basic analysis when NLP packages are not available."""
+def basic_stats_without_nlp(conversation):
+    """Word, sentence and turn counts that need no NLP packages."""
     user_turns = [msg['text'] for msg in conversation if msg['role'] == 'user']
     user_text = ' '.join(user_turns)
-    
-    word_count = len(user_text.split())
-    sentence_count = user_text.count('.') + user_text.count('!') + user_text.count('?')
+    return {
+        'total_words': len(user_text.split()),
+        'estimated_sentences': user_text.count('.') + user_text.count('!') + user_text.count('?'),
+        'user_turns': len(user_turns)
+    }
+
+def generate_basic_analysis(conversation):
+    """Generate a basic analysis when NLP packages are not available."""
+    return ''.join(iter_basic_analysis(conversation))
+
+def iter_basic_analysis(conversation):
+    """The basic report in chunks, like iter_analysis_report()."""
+    stats = basic_stats_without_nlp(conversation)
     
     report = []
     report.append("=" * 80)
@@ -911,6 +1178,8 @@ def generate_basic_analysis(conversation):
     report.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     report.append("")
     report.append("⚠️  NOTE: Advanced analysis unavailable.")
+    if NLP_STATE == "loading":
+        report.append("The NLP models are still loading; try again in a minute.")
     if NLP_ERROR_MESSAGE:
         report.append(f"Error: {NLP_ERROR_MESSAGE}")
     report.append("To enable full analysis, ensure textstat and nltk are installed:")
@@ -921,39 +1190,336 @@ def generate_basic_analysis(conversation):
     report.append("-" * 80)
     report.append("BASIC STATISTICS")
     report.append("-" * 80)
-    report.append(f"Total Words (Student): {word_count}")
-    report.append(f"Estimated Sentences: {sentence_count}")
-    report.append(f"Student Turns: {len(user_turns)}")
-    report.append("")
-    
-    # Transcript
-    report.append("=" * 80)
-    report.append("FULL CONVERSATION TRANSCRIPT")
-    report.append("=" * 80)
+    report.append(f"Total Words (Student): {stats['total_words']}")
+    report.append(f"Estimated Sentences: {stats['estimated_sentences']}")
+    report.append(f"Student Turns: {stats['user_turns']}")
     report.append("")
     
-    for i, msg in enumerate(conversation, 1):
-        role = "STUDENT" if msg['role'] == 'user' else "BOT"
-        report.append(f"[Turn {i}] {role}:")
-        report.append(f"{msg['text']}")
-        report.append("")
-    
-    return '\n'.join(report)
+    yield '\n'.join(report) + '\n'
+    yield from iter_transcript(conversation)
 
 # --------------------------- Flask App ---------------------------
 
 app = Flask(__name__)
 CORS(app)
 
+# --------------------------- Profiling ---------------------------
+# Opt-in per-request profiles (see profiling.py) of the analysis routes:
+# stage timings are added to Server-Timing with an X-Profile-Id header, and
+# the full profile (including rendering a streamed report, which finishes
+# after the headers are sent) is kept for /debug/profiles.
+
+PROFILES = profiling.ProfileBuffer()
+
+def profiled(label):
+    """Decorator profiling a view when profiling.profile_for_request() says so."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            profile = profiling.profile_for_request(label, request.headers)
+            if profile is None:
+                return view(*args, **kwargs)
+            with profiling.activate(profile):
+                response = app.make_response(view(*args, **kwargs))
+            response.headers['X-Profile-Id'] = profile.id
+            response.headers['Server-Timing'] = ', '.join(
+                filter(None, [response.headers.get('Server-Timing')] + profile.server_timing()))
+            if response.is_streamed:
+                response.response = profile_streamed_body(response.response, profile)
+            else:
+                PROFILES.add(profile)
+            return response
+        return wrapper
+    return decorator
+
+def profile_streamed_body(chunks, profile):
+    """Pass a streamed body through, timing its rendering as format_report."""
+    wall = cpu = 0.0
+    calls = 0
+    iterator = iter(chunks)
+    try:
+        while True:
+            start_wall, start_cpu = time.perf_counter(), time.thread_time()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                wall += time.perf_counter() - start_wall
+                cpu += time.thread_time() - start_cpu
+            calls += 1
+            yield chunk
+    finally:
+        profile.add("format_report", wall, cpu, calls)
+        PROFILES.add(profile)
+
+def require_admin():
+    """A 403 response unless the request carries PROFILE_ADMIN_TOKEN; always 403 when none is set."""
+    if not profiling.PROFILE_ADMIN_TOKEN:
+        return jsonify({"error": "Profiles are disabled: PROFILE_ADMIN_TOKEN is not set"}), 403
+    if not profiling.is_admin(request.headers):
+        return jsonify({"error": "X-Admin-Token required"}), 403
+    return None
+
+@app.route("/debug/profiles")
+def debug_profiles():
+    """The most recent profiles kept by this worker (?limit=N)"""
+    denied = require_admin()
+    if denied:
+        return denied
+    limit = request.args.get('limit', type=int)
+    return jsonify({"pid": os.getpid(), "profiles": PROFILES.recent(limit)})
+
+@app.route("/debug/profiles/<profile_id>")
+def debug_profile(profile_id):
+    denied = require_admin()
+    if denied:
+        return denied
+    profile = PROFILES.get(profile_id)
+    if profile is None:
+        return jsonify({"error": "Unknown profile, or kept by another worker"}), 404
+    return jsonify(profile)
+
+# --------------------------- Metrics ---------------------------
+# GET /metrics in Prometheus text format, merged over every worker on the
+# machine (see metrics.py). Request latency is measured until the response
+# starts, so streamed report downloads count their time to first byte.
+
+METRICS = metrics.Metrics()
+for name, kind, help_text in [
+    ("http_requests_total", metrics.COUNTER, "Requests by route, method and status code"),
+    ("http_request_duration_seconds", metrics.HISTOGRAM, "Time until the response starts, by route and method"),
+    ("http_requests_in_flight", metrics.GAUGE, "Requests being handled, by route"),
+    ("upstream_session_duration_seconds", metrics.HISTOGRAM,
+     "Time to create a Realtime session at OpenAI, retries included"),
+    ("upstream_session_requests_total", metrics.COUNTER,
+     "Realtime session creations by final outcome (status code or error)"),
+    ("upstream_attempts_total", metrics.COUNTER, "Individual calls to OpenAI by outcome, retries included"),
+    ("upstream_circuit_open", metrics.GAUGE, "Workers whose OpenAI circuit breaker is open or half-open"),
+    ("upstream_circuit_opened_total", metrics.COUNTER, "Times an OpenAI circuit breaker opened"),
+    ("upstream_circuit_rejected_total", metrics.COUNTER, "Calls to OpenAI failed fast by an open circuit breaker"),
+    ("upstream_hedged_total", metrics.COUNTER, "Attempts to OpenAI sent a second time after the hedge delay"),
+    ("upstream_hedge_won_total", metrics.COUNTER, "Hedged attempts answered first by the second request"),
+    ("analysis_stage_duration_seconds", metrics.HISTOGRAM, "Time spent in each analysis stage"),
+    ("analysis_requests_total", metrics.COUNTER, "Analyses by how they were served (hit, miss, incremental)"),
+    ("analysis_pool_pending", metrics.GAUGE, "Analyses queued or running in a worker's analysis processes"),
+    ("analysis_pool_completed_total", metrics.COUNTER, "Analyses finished by the analysis processes"),
+    ("analysis_pool_failed_total", metrics.COUNTER, "Analyses that raised in the analysis processes"),
+    ("analysis_pool_rejected_total", metrics.COUNTER, "Analyses refused because every slot stayed busy"),
+    ("analysis_pool_restarts_total", metrics.COUNTER, "Analysis process pools replaced after a crash"),
+    ("session_pool_hits_total", metrics.COUNTER, "Connects served from pre-minted sessions"),
+    ("session_pool_misses_total", metrics.COUNTER, "Connects that had to create a session upstream"),
+    ("session_pool_refill_errors_total", metrics.COUNTER, "Failed session pool refills"),
+    ("session_pool_refills_not_admitted_total", metrics.COUNTER,
+     "Session pool refills held back by the all-clients /session rate limit"),
+    ("analysis_cache_hits_total", metrics.COUNTER, "Analysis cache hits (machine-wide)"),
+    ("analysis_cache_misses_total", metrics.COUNTER, "Analysis cache misses (machine-wide)"),
+    ("analysis_cache_evictions_total", metrics.COUNTER, "Analysis cache entries evicted (machine-wide)"),
+    ("analysis_cache_entries", metrics.GAUGE, "Analyses currently cached (machine-wide)"),
+    ("analysis_jobs", metrics.GAUGE, "Analysis jobs by state (machine-wide)"),
+    ("analysis_admission_in_flight", metrics.GAUGE, "Analyses holding a slot of the machine-wide cap"),
+    ("metrics_live_workers", metrics.GAUGE, "Worker processes whose metrics are included")
+]:
+    METRICS.describe(name, kind, help_text)
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.metrics_route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    METRICS.add("http_requests_in_flight", 1, route=g.metrics_route)
+
+@app.after_request
+def record_request_metrics(response):
+    if 'metrics_start' in g:
+        labels = {"route": g.metrics_route, "method": request.method}
+        METRICS.observe("http_request_duration_seconds", time.perf_counter() - g.metrics_start, **labels)
+        METRICS.inc("http_requests_total", status=response.status_code, **labels)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'metrics_route' in g:
+        METRICS.add("http_requests_in_flight", -1, route=g.metrics_route)
+
+def record_analysis_timings(timings):
+    """Feed a {stage: milliseconds} dict into the analysis stage histogram."""
+    for stage, ms in timings.items():
+        if ms is not None:
+            METRICS.observe("analysis_stage_duration_seconds", ms / 1000, stage=stage)
+
+@METRICS.collector
+def worker_metrics():
+    """Counters this worker keeps in its pools and upstream client."""
+    samples = [("upstream_attempts_total", {"outcome": outcome}, count)
+               for outcome, count in upstream.stats().items()]
+    breaker, hedging = upstream.BREAKER.stats(), upstream.HEDGER.stats()
+    samples += [
+        ("upstream_circuit_open", {}, int(breaker['state'] != upstream.CLOSED)),
+        ("upstream_circuit_opened_total", {}, breaker['opened']),
+        ("upstream_circuit_rejected_total", {}, breaker['rejected']),
+        ("upstream_hedged_total", {}, hedging['hedged']),
+        ("upstream_hedge_won_total", {}, hedging['hedge_won'])
+    ]
+    for pool_name, pool in (("interactive", ANALYSIS_POOL), ("batch", BATCH_POOL)):
+        stats = pool.stats()
+        labels = {"pool": pool_name}
+        samples += [
+            ("analysis_pool_pending", labels, stats['pending']),
+            ("analysis_pool_completed_total", labels, stats['completed']),
+            ("analysis_pool_failed_total", labels, stats['failed']),
+            ("analysis_pool_rejected_total", labels, stats['rejected_busy']),
+            ("analysis_pool_restarts_total", labels, stats['pool_restarts'])
+        ]
+    stats = SESSION_POOL.stats()
+    samples += [
+        ("session_pool_hits_total", {}, stats['hits']),
+        ("session_pool_misses_total", {}, stats['misses']),
+        ("session_pool_refill_errors_total", {}, stats['refill_errors']),
+        ("session_pool_refills_not_admitted_total", {}, stats['refills_not_admitted'])
+    ]
+    return samples
+
+def machine_metrics():
+    """Samples read from the stores all workers share; not summed per worker."""
+    samples = []
+    cache = ANALYSIS_CACHE.stats()
+    if cache.get('enabled') and 'hits' in cache:
+        samples += [
+            ("analysis_cache_hits_total", {}, cache['hits']),
+            ("analysis_cache_misses_total", {}, cache['misses']),
+            ("analysis_cache_evictions_total", {}, cache['evictions']),
+            ("analysis_cache_entries", {}, cache['entries'])
+        ]
+    jobs = ANALYSIS_JOBS.stats()
+    samples += [("analysis_jobs", {"state": state}, jobs[state])
+                for state in (analysis_jobs.QUEUED, analysis_jobs.RUNNING) + analysis_jobs.FINISHED_STATES]
+    in_flight = ANALYSIS_ADMISSION.stats()['in_flight']
+    if in_flight is not None:
+        samples.append(("analysis_admission_in_flight", {}, in_flight))
+    return samples
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text format metrics for every worker on this machine"""
+    try:
+        extra = machine_metrics()
+    except Exception:
+        extra = []  # shared stores unavailable; still report the per-worker metrics
+    return Response(METRICS.render(extra), mimetype="text/plain; version=0.0.4")
+
+# --------------------------- Admission Control ---------------------------
+# Token-bucket limits (see admission.py) per client and for all clients
+# together on the routes that cost OpenAI quota or analysis CPU, plus a
+# machine-wide cap on analyses in flight. A per-client limit answers 429, an
+# exhausted shared limit or a full analysis cap 503, both with Retry-After
+# and before any work is done. Limits are "N/SECONDS"; 0 turns one off.
+#
+# Every request is charged to its IP address, with limits sized for a
+# class behind one school NAT address. The X-Client-Id header the page
+# sends (one random id per tab) adds a tighter per-tab limit on top; as
+# the client picks it freely, it never replaces the per-address bucket.
+# Render and Heroku put the client address in X-Forwarded-For;
+# TRUSTED_PROXY_HOPS says how many proxies to trust. It is off by default:
+# without a proxy in front, any client could pick its own address (and so
+# a fresh per-address bucket) with that header. The deploy config turns it on.
+
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+RATE_LIMITS = {  # group -> (per tab, per address, all clients)
+    "session": (admission.parse_limit(os.getenv("RATE_LIMIT_SESSION", "10/60")),
+                admission.parse_limit(os.getenv("RATE_LIMIT_SESSION_ADDRESS", "120/60")),
+                admission.parse_limit(os.getenv("RATE_LIMIT_SESSION_GLOBAL", "300/60"))),
+    "analyze": (admission.parse_limit(os.getenv("RATE_LIMIT_ANALYZE", "20/60")),
+                admission.parse_limit(os.getenv("RATE_LIMIT_ANALYZE_ADDRESS", "120/60")),
+                admission.parse_limit(os.getenv("RATE_LIMIT_ANALYZE_GLOBAL", "300/60"))),
+    "turns": (admission.parse_limit(os.getenv("RATE_LIMIT_TURNS", "240/60")),
+              admission.parse_limit(os.getenv("RATE_LIMIT_TURNS_ADDRESS", "2400/60")),
+              admission.parse_limit(os.getenv("RATE_LIMIT_TURNS_GLOBAL", "0")))
+}
+RATE_LIMITED_ROUTES = {
+    ("/session", "POST"): "session",
+    ("/analyze", "POST"): "analyze",
+    ("/analyze/jobs", "POST"): "analyze",
+    ("/analyze/batch", "POST"): "analyze",
+    ("/analyze/turns", "POST"): "turns"
+}
+CLIENT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+RATE_LIMITER = admission.RateLimiter()
+ANALYSIS_ADMISSION = admission.ConcurrencyLimit()
+
+METRICS.describe("rate_limited_total", metrics.COUNTER, "Requests refused by a rate limit, by route group and scope")
+METRICS.describe("analysis_admission_rejected_total", metrics.COUNTER,
+                 "Analyses refused because the machine-wide cap was reached")
+
+def client_keys():
+    """(address, tab): the tab is None without a well-formed X-Client-Id."""
+    address = request.remote_addr or "unknown"
+    client_id = request.headers.get('X-Client-Id', '')
+    return address, (f"{address}/{client_id}" if CLIENT_ID_PATTERN.match(client_id) else None)
+
+@app.before_request
+def enforce_rate_limits():
+    rule = request.url_rule.rule if request.url_rule is not None else None
+    group = RATE_LIMITED_ROUTES.get((rule, request.method))
+    if group is None:
+        return None
+    per_tab, per_address, overall = RATE_LIMITS[group]
+    address, tab = client_keys()
+    buckets = []
+    if per_tab and tab is not None:
+        buckets.append((f"{group}:tab:{tab}", "per tab", *per_tab))
+    if per_address:
+        buckets.append((f"{group}:address:{address}", "per address", *per_address))
+    if overall:
+        buckets.append((f"{group}:all", "all clients", *overall))
+    try:
+        RATE_LIMITER.acquire(buckets)
+    except admission.RateLimited as e:
+        METRICS.inc("rate_limited_total", group=group, scope=e.scope)
+        status = 503 if e.scope == "all clients" else 429
+        return jsonify({"error": str(e), "retry_after": e.retry_after}), status, {"Retry-After": str(e.retry_after)}
+    return None
+
+def overloaded_response(e):
+    METRICS.inc("analysis_admission_rejected_total")
+    return jsonify({"error": str(e), "retry_after": e.retry_after}), 503, {"Retry-After": str(e.retry_after)}
+
+@app.route("/debug/admission")
+def debug_admission():
+    """Rate limiter and analysis cap counters (per worker) and slots in use"""
+    return jsonify({
+        "rate_limits": {group: {"per_tab": per_tab, "per_address": per_address, "all_clients": overall}
+                        for group, (per_tab, per_address, overall) in RATE_LIMITS.items()},
+        "rate_limiter": RATE_LIMITER.stats(),
+        "analysis_admission": ANALYSIS_ADMISSION.stats()
+    })
+
 @app.route("/")
 def index():
     return redirect("/realtime")
 
+@app.route("/health")
+def health():
+    """Liveness plus NLP readiness; pages and /session work before NLP is ready"""
+    return jsonify({
+        "status": "ok",
+        "nlp_ready": NLP_READY.is_set(),
+        "nlp_state": NLP_STATE,
+        "analysis_available": ANALYSIS_AVAILABLE
+    })
+
 @app.route("/debug/nlp")
 def debug_nlp():
     """Debug endpoint to check NLP package status"""
     status = {
         "analysis_available": ANALYSIS_AVAILABLE,
+        "nlp_ready": NLP_READY.is_set(),
+        "nlp_state": NLP_STATE,
+        "nlp_warmup": NLP_WARMUP,
+        **NLP_INIT_STATS,
         "error_message": NLP_ERROR_MESSAGE,
         "packages": {}
     }
@@ -964,10 +1530,17 @@ def debug_nlp():
     except ImportError:
         status["packages"]["textstat"] = "NOT INSTALLED"
     
+    status["models"] = {
+        "loaded": sorted(NLP_MODELS),
+        **NLP_MODEL_STATS
+    }
+    
     try:
         import nltk
         status["packages"]["nltk"] = nltk.__version__
         status["nltk_data_path"] = nltk.data.path
+        status["nltk_bundle_dir"] = nltk_bundle.NLTK_DATA_DIR
+        status["nltk_offline"] = nltk_bundle.NLTK_OFFLINE
         
         # Check NLTK data
         status["nltk_data"] = {}
@@ -995,80 +1568,708 @@ def debug_nlp():
     return jsonify(status)
 
 
-@app.route("/session", methods=["POST"])
-def create_session():
-    data = request.json or {}
-    bot_id = data.get("bot_id", BOTS[0]["id"])
-    bot = next((b for b in BOTS if b["id"] == bot_id), BOTS[0])
-
-    instructions = f"""
-You are: {bot['role']}
-Your task: {bot['task']}
-Constraints: {bot['constraints']}
-Language hint: {bot.get('language_hint', 'English')}
-"""
-    session_payload = {
-        "model": OPENAI_REALTIME_MODEL,
-        "voice": bot.get("voice", OPENAI_REALTIME_VOICE_DEFAULT),
-        "instructions": instructions.strip(),
-        "modalities": ["text", "audio"],
-        "turn_detection": {
-            "type": "server_vad",
-            "threshold": VAD_THRESHOLD,
-            "silence_duration_ms": RT_SILENCE_MS,
-            "prefix_padding_ms": 300
-        },
-        "input_audio_transcription": {
-            "model": "whisper-1"
-        }
-    }
+def mint_session(bot_id):
+    """Create a new ephemeral Realtime session upstream; returns the raw JSON body."""
+    start = time.perf_counter()
+    outcome = None
     try:
-        resp = requests.post(
-            "https://api.openai.com/v1/realtime/sessions",
+        resp = upstream.post(
+            REALTIME_SESSIONS_URL,
+            data=BOT_REGISTRY[bot_id]["session_payload"],
             headers={
                 "Authorization": f"Bearer {OPENAI_API_KEY}",
                 "Content-Type": "application/json"
-            },
-            json=session_payload,
-            timeout=10
+            }
         )
+        outcome = str(resp.status_code)
         resp.raise_for_status()
-        return jsonify(resp.json()), resp.status_code
+        return resp.content
+    except Exception as e:
+        outcome = outcome or type(e).__name__
+        raise
+    finally:
+        METRICS.observe("upstream_session_duration_seconds", time.perf_counter() - start)
+        METRICS.inc("upstream_session_requests_total", outcome=outcome)
+
+def admit_pool_refill():
+    """Charge a pool refill to the all-clients /session bucket, like the Connect it stands in for."""
+    overall = RATE_LIMITS["session"][2]
+    if overall:
+        RATE_LIMITER.acquire([("session:all", "all clients", *overall)])
+
+SESSION_POOL = session_pool.SessionPool(mint_session, BOT_REGISTRY, admit=admit_pool_refill)
+
+@app.route("/debug/session-pool")
+def debug_session_pool():
+    """Hit/miss and refill counters for the pre-minted session pool"""
+    return jsonify(SESSION_POOL.stats())
+
+@app.route("/debug/upstream")
+def debug_upstream():
+    """Attempts by outcome, circuit breaker state and hedging counters for OpenAI calls"""
+    return jsonify({
+        "attempts": upstream.stats(),
+        "breaker": upstream.BREAKER.stats(),
+        "hedging": upstream.HEDGER.stats()
+    })
+
+@app.route("/session", methods=["POST"])
+def create_session():
+    data = request.json or {}
+    bot_id = data.get("bot_id", DEFAULT_BOT_ID)
+    if not isinstance(bot_id, str) or bot_id not in BOT_REGISTRY:
+        return jsonify({"error": f"Unknown bot_id: {bot_id}"}), 404
+
+    if SESSION_POOL.enabled:
+        body = SESSION_POOL.take(bot_id)
+        if body is not None:
+            return Response(body, status=200, mimetype="application/json")
+
+    try:
+        body = mint_session(bot_id)
+        return Response(body, status=200, mimetype="application/json")
+    except upstream.CircuitOpen as e:
+        return jsonify({"error": str(e), "retry_after": e.retry_after}), 503, {"Retry-After": str(e.retry_after)}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def run_analysis(conversation, bot_id, job_id=None):
+    """
+    Analysis job for ANALYSIS_POOL; returns the analysis dict (None when the
+    NLP packages are unavailable) and the milliseconds spent. With a job_id,
+    progress is reported to (and cancellation checked in) ANALYSIS_JOBS.
+    """
+    ensure_nlp()
+    start = time.perf_counter()
+    progress = None
+    if job_id is not None:
+        progress = lambda done, total: ANALYSIS_JOBS.progress(job_id, "analyzing turns", done, total)
+    analysis = compute_analysis(conversation, bot_id, progress) if ANALYSIS_AVAILABLE else None
+    return analysis, (time.perf_counter() - start) * 1000
+
+def run_profiled_analysis(conversation, bot_id):
+    """run_analysis() under a profile, whose to_dict() is returned as well."""
+    profile = profiling.Profile("analysis", "analysis process")
+    with profiling.activate(profile), profiling.stage("analysis"):
+        analysis, ms = run_analysis(conversation, bot_id)
+    return analysis, ms, profile.to_dict()
+
+ANALYSIS_POOL = analysis_pool.AnalysisPool()
+ANALYSIS_CACHE = analysis_cache.AnalysisCache()
+
+@app.route("/debug/analysis-cache")
+def debug_analysis_cache():
+    """Hit/miss and eviction counters for the shared analysis cache"""
+    return jsonify(ANALYSIS_CACHE.stats())
+
+@app.route("/debug/analysis-pool")
+def debug_analysis_pool():
+    """Queue and failure counters for the analysis worker processes"""
+    return jsonify(ANALYSIS_POOL.stats())
+
+ANALYSIS_SESSIONS = analysis_sessions.AnalysisSessionStore(fold_turn_counts, aggregate_from_json)
+
+# Generated by the browser; one per transcript
+ANALYSIS_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+@app.route("/debug/analysis-sessions")
+def debug_analysis_sessions():
+    """Sessions and turns held for incremental analysis"""
+    return jsonify(ANALYSIS_SESSIONS.stats())
+
+def parse_turns(raw_turns):
+    """Validate [{index, role, text}, ...] from a request; raises ValueError."""
+    if not isinstance(raw_turns, list):
+        raise ValueError("turns must be a list")
+    turns = []
+    for turn in raw_turns:
+        if not isinstance(turn, dict):
+            raise ValueError("each turn must be an object")
+        index, role, text = turn.get('index'), turn.get('role'), turn.get('text')
+        if not isinstance(index, int) or isinstance(index, bool) or index < 0:
+            raise ValueError("turn index must be a non-negative integer")
+        if role not in ('user', 'assistant') or not isinstance(text, str):
+            raise ValueError("turn role must be user or assistant and text a string")
+        turns.append((index, role, text))
+    return turns
+
+def count_turns(turns, language):
+    """ANALYSIS_POOL job: turn_counts() for every (role, text) in turns."""
+    ensure_nlp()
+    return [turn_counts(role, text, language) for role, text in turns]
+
+def run_profiled_count_turns(turns, language):
+    """count_turns() under a profile, whose to_dict() is returned as well."""
+    profile = profiling.Profile("turns", "analysis process")
+    with profiling.activate(profile), profiling.stage("turns"):
+        counts = count_turns(turns, language)
+    return counts, profile.to_dict()
+
+def store_turns(session_id, bot_id, turns):
+    """
+    Store turns in the session, folding their counts in right away when the
+    NLP models are ready. Turns stored unfolded make the final report fall
+    back to analyzing the stored transcript as a whole. The counting runs in
+    ANALYSIS_POOL; raises AnalysisBusy, TurnTooLong or TooManySessions.
+    """
+    ANALYSIS_SESSIONS.check(session_id, [text for _, _, text in turns])
+    if not NLP_READY.is_set():
+        start_nlp_init(background=True)  # the final report will need the models
+        folding = False
+    else:
+        folding = ANALYSIS_AVAILABLE
+    
+    counts = [None] * len(turns)
+    if folding and turns:
+        pairs = [(role, text) for _, role, text in turns]
+        profile = profiling.current()
+        if profile is None:
+            counts = ANALYSIS_POOL.run(count_turns, pairs, bot_language(bot_id))
+        else:
+            counts, child = ANALYSIS_POOL.run(run_profiled_count_turns, pairs, bot_language(bot_id))
+            profile.merge(child)
+    return ANALYSIS_SESSIONS.add_turns(session_id, bot_id, [
+        (index, role, text, turn) for (index, role, text), turn in zip(turns, counts)
+    ])
+
+@app.route("/analyze/turns", methods=["POST"])
+@profiled("analyze/turns")
+def analyze_turns():
+    """
+    Incremental analysis: fold turns into the running analysis of a
+    conversation as they happen, so the final report is ready at once.
+    Body: {session_id, bot_id, turns: [{index, role, text}]}
+    """
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id')
+    bot_id = data.get('bot_id', 'unknown')
+    if not isinstance(session_id, str) or not ANALYSIS_SESSION_ID_PATTERN.match(session_id):
+        return jsonify({"error": "Invalid session_id"}), 400
+    try:
+        turns = parse_turns(data.get('turns'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        stored = store_turns(session_id, bot_id, turns)
+    except (analysis_sessions.TooManyTurns, analysis_sessions.TurnTooLong) as e:
+        return jsonify({"error": str(e)}), 413
+    except analysis_sessions.TooManySessions as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except analysis_pool.AnalysisBusy:
+        return jsonify({"error": "Too many analyses in progress, please try again shortly"}), \
+            503, {"Retry-After": "5"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    return jsonify({"session_id": session_id, "turns_stored": stored})
+
+def analyze_with_cache(conversation, bot_id, timings):
+    """
+    The analysis dict for a whole conversation (None when NLP is
+    unavailable), from the cache or the analysis pool. Fills in timings and
+    returns the cache status as well. Raises AnalysisBusy or Overloaded.
+    """
+    # Repeat analyses of the same transcript are served from the cache
+    start = time.perf_counter()
+    with profiling.stage("cache-lookup"):
+        cache_key = analysis_cache.conversation_key(conversation, bot_id)
+        analysis = ANALYSIS_CACHE.get(cache_key)
+    timings['cache'] = (time.perf_counter() - start) * 1000
+    profiling.count("cache_hits" if analysis is not None else "cache_misses")
+    if analysis is not None:
+        return analysis, "hit"
+    
+    # Load the models here first so the analysis processes forked from this
+    # worker inherit them
+    with profiling.stage("model-load"):
+        timings['model-load'] = ensure_nlp()
+    start = time.perf_counter()
+    profile = profiling.current()
+    with ANALYSIS_ADMISSION.slot():
+        if profile is None:
+            analysis, timings['analysis'] = ANALYSIS_POOL.run(run_analysis, conversation, bot_id)
+        else:
+            analysis, timings['analysis'], child = ANALYSIS_POOL.run(run_profiled_analysis, conversation, bot_id)
+            profile.merge(child)
+    timings['analysis-queue'] = (time.perf_counter() - start) * 1000 - timings['analysis']
+    if profile is not None:
+        profile.add("analysis-queue", timings['analysis-queue'] / 1000, 0.0)
+    if analysis is not None:
+        ANALYSIS_CACHE.put(cache_key, analysis)
+    return analysis, "miss"
+
+class AnalysisRequestError(Exception):
+    """A problem with the request found while analyzing; becomes a JSON error."""
+    def __init__(self, status, payload, headers=None):
+        super().__init__(payload["error"])
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+def resolve_session(session_id, bot_id, turn_count):
+    """
+    The first turn_count turns (default: all) of an incremental session as a
+    conversation, plus the session's aggregate when it holds exactly those
+    turns, counted with this bot's filler lexicon (otherwise None).
+    """
+    session = ANALYSIS_SESSIONS.load(session_id)
+    if session is None:
+        raise AnalysisRequestError(404, {"error": "Unknown or expired session_id"})
+    
+    stored = [turn for turn in session['turns'] if turn_count is None or turn[0] < turn_count]
+    expected = set(range(turn_count if turn_count is not None else len(session['turns'])))
+    missing = sorted(expected - {index for index, _, _ in stored})
+    if missing:
+        raise AnalysisRequestError(409, {"error": "Turns missing from session", "missing": missing})
+    if not stored:
+        raise AnalysisRequestError(400, {"error": "No conversation data provided"})
+    conversation = [{'role': role, 'text': text} for _, role, text in stored]
+    
+    if (session['aggregate'] is not None and session['folded'] == expected
+            and bot_language(session['bot_id']) == bot_language(bot_id)):
+        return conversation, session['aggregate']
+    return conversation, None
+
+def resolve_analysis_request(data):
+    """
+    The conversation and bot id an /analyze or /analyze/jobs body asks for,
+    plus the session aggregate when it can be used as is. The body carries
+    either the whole {conversation}, or the {session_id} of turns already
+    posted to /analyze/turns with the transcript length as turn_count and
+    any turns not posted yet as turns.
+    """
+    conversation = data.get('conversation', [])
+    bot_id = data.get('bot_id', 'unknown')
+    session_id = data.get('session_id')
+    if conversation:
+        return conversation, bot_id, None
+    if session_id is None:
+        raise AnalysisRequestError(400, {"error": "No conversation data provided"})
+    
+    if not isinstance(session_id, str) or not ANALYSIS_SESSION_ID_PATTERN.match(session_id):
+        raise AnalysisRequestError(400, {"error": "Invalid session_id"})
+    turn_count = data.get('turn_count')
+    if turn_count is not None and (type(turn_count) is not int or turn_count < 0):
+        raise AnalysisRequestError(400, {"error": "turn_count must be a non-negative integer"})
+    if data.get('turns'):
+        try:
+            store_turns(session_id, bot_id, parse_turns(data['turns']))
+        except ValueError as e:
+            raise AnalysisRequestError(400, {"error": str(e)})
+        except (analysis_sessions.TooManyTurns, analysis_sessions.TurnTooLong) as e:
+            raise AnalysisRequestError(413, {"error": str(e)})
+        except analysis_sessions.TooManySessions as e:
+            raise AnalysisRequestError(503, {"error": str(e)}, {"Retry-After": str(e.retry_after)})
+        except analysis_pool.AnalysisBusy:
+            raise AnalysisRequestError(503, {"error": "Too many analyses in progress, please try again shortly"},
+                                       {"Retry-After": "5"})
+    conversation, aggregate = resolve_session(session_id, bot_id, turn_count)
+    return conversation, bot_id, aggregate
+
+def wants_json():
+    """
+    True when the client asked for the metrics as JSON, with ?format=json or
+    an Accept header preferring application/json over text/plain. Browsers
+    (Accept: */*) keep getting the text download.
+    """
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt.lower() == 'json'
+    return request.accept_mimetypes.best_match(['text/plain', 'application/json']) == 'application/json'
+
+def report_response(analysis, conversation, bot_id, headers=None):
+    """
+    The text report as a download, or the analysis dict as compact JSON
+    when wants_json(); analysis=None gives the basic report.
+    """
+    headers = {'Vary': 'Accept', **(headers or {})}
+    if wants_json():
+        body = {"bot_id": bot_id, "analysis_available": analysis is not None, "analysis": analysis}
+        if analysis is None:
+            body['basic_stats'] = basic_stats_without_nlp(conversation)
+        with profiling.stage("format_json"):
+            return jsonify(body), 200, headers
+    
+    # Streamed: the metrics go out first and the transcript follows in chunks
+    if analysis is None:
+        report = iter_basic_analysis(conversation)
+    else:
+        analysis['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        report = iter_analysis_report(analysis, conversation)
+    
+    filename = f"conversation-analysis-{bot_id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
+    return Response(
+        report,
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename={filename}', **headers}
+    )
 
 @app.route("/analyze", methods=["POST"])
+@profiled("analyze")
 def analyze_conversation():
     """
     Analyze conversation using Python NLP packages.
-    Returns a downloadable text file with transcript and metrics.
+    Returns a downloadable text file with transcript and metrics, or the
+    metrics as JSON (see wants_json()).
+    See resolve_analysis_request() for the accepted bodies.
     """
     try:
         data = request.json
-        conversation = data.get('conversation', [])
-        bot_id = data.get('bot_id', 'unknown')
-        
-        if not conversation:
-            return jsonify({"error": "No conversation data provided"}), 400
+        timings = {}
         
-        # Generate analysis report
-        report = analyze_conversation_metrics(conversation)
-        
-        # Create response with text file
-        filename = f"conversation-analysis-{bot_id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
+        try:
+            conversation, bot_id, aggregate = resolve_analysis_request(data)
+            if aggregate is not None:
+                start = time.perf_counter()
+                analysis, cache_status = analysis_from_aggregate(aggregate), "incremental"
+                timings['analysis'] = (time.perf_counter() - start) * 1000
+            else:
+                analysis, cache_status = analyze_with_cache(conversation, bot_id, timings)
+        except AnalysisRequestError as e:
+            return jsonify(e.payload), e.status, e.headers
+        except analysis_pool.AnalysisBusy:
+            return jsonify({"error": "Too many analyses in progress, please try again shortly"}), \
+                503, {"Retry-After": "5"}
+        except admission.Overloaded as e:
+            return overloaded_response(e)
         
-        return Response(
-            report,
-            mimetype='text/plain',
-            headers={
-                'Content-Disposition': f'attachment; filename={filename}'
-            }
-        )
+        record_analysis_timings(timings)
+        METRICS.inc("analysis_requests_total", source=cache_status)
+        server_timing = ', '.join(
+            [f'cache;desc={cache_status}'] + [f'{name};dur={ms:.1f}' for name, ms in timings.items()])
+        return report_response(analysis, conversation, bot_id, {
+            'X-Analysis-Cache': cache_status,
+            'Server-Timing': server_timing
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# --------------------------- Analysis Jobs ---------------------------
+# Submit/poll version of /analyze for long transcripts: POST /analyze/jobs
+# returns at once with a job id, the page polls GET /analyze/jobs/<id> for
+# progress and downloads /analyze/jobs/<id>/result when it is done. The
+# runner threads wait on the analysis pool, so request threads never do.
+
+def run_analysis_job(job_id, payload):
+    """ANALYSIS_JOBS callback: analyze one submitted conversation."""
+    conversation, bot_id = payload['conversation'], payload['bot_id']
+    ANALYSIS_JOBS.progress(job_id, "loading models")
+    ensure_nlp()
+    while True:
+        ANALYSIS_JOBS.progress(job_id, "waiting for an analysis process")
+        try:
+            with ANALYSIS_ADMISSION.slot():
+                analysis, ms = ANALYSIS_POOL.run(run_analysis, conversation, bot_id, job_id)
+            break
+        except analysis_pool.AnalysisBusy:
+            continue  # synchronous /analyze requests hold every slot; keep waiting
+        except admission.Overloaded as e:
+            time.sleep(e.retry_after)  # the machine-wide cap is reached; keep waiting too
+    record_analysis_timings({'job-analysis': ms})
+    if analysis is not None:
+        ANALYSIS_CACHE.put(analysis_cache.conversation_key(conversation, bot_id), analysis)
+    return {"analysis": analysis}
+
+ANALYSIS_JOBS = analysis_jobs.JobQueue(run_analysis_job)
+
+def job_status_response(status, code=200):
+    job_url = f"/analyze/jobs/{status['job_id']}"
+    status = dict(status, status_url=job_url)
+    if status['state'] == analysis_jobs.DONE:
+        status['result_url'] = f"{job_url}/result"
+    return jsonify(status), code
+
+@app.route("/analyze/jobs", methods=["POST"])
+def submit_analysis_job():
+    """Queue an analysis; same bodies as /analyze. Answers 202 with the job status."""
+    data = request.get_json(silent=True) or {}
+    try:
+        conversation, bot_id, aggregate = resolve_analysis_request(data)
+        payload = {"conversation": conversation, "bot_id": bot_id}
+        # Results available right away are recorded as finished jobs
+        if aggregate is not None:
+            result = {"analysis": analysis_from_aggregate(aggregate)}
+        else:
+            cached = ANALYSIS_CACHE.get(analysis_cache.conversation_key(conversation, bot_id))
+            result = {"analysis": cached} if cached is not None else None
+        job_id = ANALYSIS_JOBS.submit(payload, result)
+    except AnalysisRequestError as e:
+        return jsonify(e.payload), e.status, e.headers
+    except analysis_jobs.QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    response, code = job_status_response(ANALYSIS_JOBS.status(job_id), 202)
+    response.headers['Location'] = f"/analyze/jobs/{job_id}"
+    return response, code
+
+@app.route("/analyze/jobs/<job_id>", methods=["GET"])
+def analysis_job_status(job_id):
+    status = ANALYSIS_JOBS.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return job_status_response(status)
+
+@app.route("/analyze/jobs/<job_id>", methods=["DELETE"])
+def cancel_analysis_job(job_id):
+    status = ANALYSIS_JOBS.cancel(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return job_status_response(status)
+
+@app.route("/analyze/jobs/<job_id>/result")
+def analysis_job_result(job_id):
+    finished = ANALYSIS_JOBS.result(job_id)
+    if finished is None:
+        status = ANALYSIS_JOBS.status(job_id)
+        if status is None:
+            return jsonify({"error": "Unknown or expired job"}), 404
+        return job_status_response(status, 409)
+    payload, result = finished
+    return report_response(result['analysis'], payload['conversation'], payload['bot_id'])
+
+@app.route("/debug/analysis-jobs")
+def debug_analysis_jobs():
+    """Job counts by state and recent run times"""
+    return jsonify(ANALYSIS_JOBS.stats())
+
+# --------------------------- Batch Analysis ---------------------------
+# Instructors analyze a whole class at once: POST /analyze/batch with one
+# JSON object per line (NDJSON), {"id", "bot_id", "conversation"}, or a JSON
+# body {"conversations": [...]} of the same objects. The conversations are
+# fanned out over BATCH_POOL, one process per core by default, and the
+# response streams one NDJSON line per conversation as it finishes (in
+# completion order, with its position in the request), then a class summary
+# line. A malformed or failing conversation gets an error line and does not
+# affect the others.
+
+ANALYSIS_BATCH_MAX_ITEMS = int(os.getenv("ANALYSIS_BATCH_MAX_ITEMS", "500"))
+
+# Started on the first batch; two calls per process may be queued or
+# running, across all batches in this worker
+BATCH_POOL = analysis_pool.AnalysisPool(processes=analysis_pool.ANALYSIS_BATCH_PROCESSES,
+                                        max_pending=2 * analysis_pool.ANALYSIS_BATCH_PROCESSES)
+
+def validate_conversation(conversation):
+    """Raise ValueError unless conversation is a non-empty list of {role, text} turns."""
+    if not isinstance(conversation, list) or not conversation:
+        raise ValueError("conversation must be a non-empty list")
+    for msg in conversation:
+        if not isinstance(msg, dict) or not isinstance(msg.get('role'), str) \
+                or not isinstance(msg.get('text'), str):
+            raise ValueError("every turn needs a role and a text string")
+
+def parse_batch_items(body, is_json):
+    """(position, item, error) for every conversation in a batch request body."""
+    if is_json:
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise AnalysisRequestError(400, {"error": f"Invalid JSON: {e}"})
+        raw_items = data.get('conversations') if isinstance(data, dict) else data
+        if not isinstance(raw_items, list):
+            raise AnalysisRequestError(400, {"error": "Expected a list of conversations"})
+    else:
+        raw_items = [line for line in body.decode('utf-8', errors='replace').splitlines() if line.strip()]
+    if len(raw_items) > ANALYSIS_BATCH_MAX_ITEMS:
+        raise AnalysisRequestError(413, {"error": f"Batches are limited to {ANALYSIS_BATCH_MAX_ITEMS} conversations"})
+    
+    items = []
+    for position, raw in enumerate(raw_items):
+        try:
+            item = json.loads(raw) if isinstance(raw, str) else raw
+            if not isinstance(item, dict):
+                raise ValueError("each line must be a JSON object")
+            validate_conversation(item.get('conversation'))
+            bot_id = item.get('bot_id', 'unknown')
+            if not isinstance(bot_id, str):
+                raise ValueError("bot_id must be a string")
+            items.append((position, {
+                'id': item.get('id', position),
+                'bot_id': bot_id,
+                'conversation': item['conversation']
+            }, None))
+        except ValueError as e:
+            items.append((position, None, str(e)))
+    return items
+
+def summarize_batch(results, failed, elapsed):
+    """Class-level summary of the batch items analyzed successfully."""
+    analyses = [r['analysis'] for r in results if r['analysis'] is not None]
+    
+    def average(section, key):
+        values = [a[section][key] for a in analyses if key in a.get(section, {})]
+        return round(sum(values) / len(values), 2) if values else None
+    
+    fillers = Counter()
+    for a in analyses:
+        fillers.update(dict(a['fluency_metrics']['filler_counts']))
+    
+    return {
+        "conversations": len(results) + failed,
+        "analyzed": len(analyses),
+        "basic_only": len(results) - len(analyses),
+        "failed": failed,
+        "by_bot": dict(Counter(r['bot_id'] for r in results)),
+        "averages": {
+            "total_words": average('basic_stats', 'total_words'),
+            "avg_words_per_sentence": average('basic_stats', 'avg_words_per_sentence'),
+            "flesch_reading_ease": average('complexity_metrics', 'flesch_reading_ease'),
+            "flesch_kincaid_grade": average('complexity_metrics', 'flesch_kincaid_grade'),
+            "filler_word_rate": average('fluency_metrics', 'filler_word_rate'),
+            "hesitation_sounds": average('fluency_metrics', 'hesitation_sounds'),
+            "type_token_ratio": average('vocabulary_metrics', 'type_token_ratio')
+        },
+        "top_fillers": fillers.most_common(10),
+        "elapsed_seconds": round(elapsed, 3),
+        "conversations_per_second": round((len(results) + failed) / elapsed, 2) if elapsed else None
+    }
+
+@app.route("/analyze/batch", methods=["POST"])
+def analyze_batch():
+    """Analyze many conversations; streams NDJSON results and a summary."""
+    try:
+        items = parse_batch_items(request.get_data(), request.is_json)
+    except AnalysisRequestError as e:
+        return jsonify(e.payload), e.status, e.headers
+    # Load the models before BATCH_POOL forks its processes from this worker
+    ensure_nlp()
+    # A slot of the machine-wide analysis cap for every process the batch
+    # can keep busy, held until the response is closed (even if the client
+    # never reads it)
+    busy = min(max(BATCH_POOL.processes, 1), sum(1 for _, item, _ in items if item is not None))
+    slot = contextlib.ExitStack()
+    try:
+        slot.enter_context(ANALYSIS_ADMISSION.slot(busy))
+    except admission.Overloaded as e:
+        return overloaded_response(e)
+    
+    def generate():
+        start = time.perf_counter()
+        results, failed, todo = [], 0, []
+        
+        def result_line(position, item, analysis, cache_status):
+            results.append({'bot_id': item['bot_id'], 'analysis': analysis})
+            return json.dumps({"position": position, "id": item['id'], "bot_id": item['bot_id'],
+                               "status": "ok", "cache": cache_status, "analysis": analysis}) + "\n"
+        
+        for position, item, error in items:
+            if error is not None:
+                failed += 1
+                yield json.dumps({"position": position, "status": "error", "error": error}) + "\n"
+                continue
+            cache_key = analysis_cache.conversation_key(item['conversation'], item['bot_id'])
+            analysis = ANALYSIS_CACHE.get(cache_key)
+            if analysis is not None:
+                yield result_line(position, item, analysis, "hit")
+            else:
+                todo.append((position, item, cache_key))
+        
+        for i, outcome, error in BATCH_POOL.imap_unordered(
+                run_analysis, [(item['conversation'], item['bot_id']) for _, item, _ in todo]):
+            position, item, cache_key = todo[i]
+            if error is not None:
+                failed += 1
+                yield json.dumps({"position": position, "id": item['id'], "bot_id": item['bot_id'],
+                                  "status": "error", "error": f"{type(error).__name__}: {error}"}) + "\n"
+                continue
+            analysis, ms = outcome
+            record_analysis_timings({'batch-analysis': ms})
+            if analysis is not None:
+                ANALYSIS_CACHE.put(cache_key, analysis)
+            yield result_line(position, item, analysis, "miss")
+        
+        summary = summarize_batch(results, failed, time.perf_counter() - start)
+        yield json.dumps({"summary": summary}) + "\n"
+    
+    response = Response(generate(), mimetype="application/x-ndjson")
+    response.call_on_close(slot.close)
+    return response
+
+@app.route("/debug/batch-pool")
+def debug_batch_pool():
+    """Counters for the batch analysis processes"""
+    return jsonify(BATCH_POOL.stats())
+
+# --------------------------- Cached Static Assets ---------------------------
+# The /realtime page and the bot manifest only depend on BOTS, so each is
+# rendered once per process and kept in memory as raw, gzip and (when
+# installed) brotli bytes. Requests just pick an encoding and answer 304 when
+# the ETag matches.
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_asset_cache = {}
+
+def build_cached_asset(body):
+    """Precompute the encoded variants and strong ETags for a static body."""
+    version = hashlib.sha256(body).hexdigest()[:32]
+
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=11)
+
+    # Strong ETags must differ per content-encoding of the same resource
+    etags = {
+        encoding: version if encoding == "identity" else f"{version}-{encoding}"
+        for encoding in bodies
+    }
+    return {"version": version, "bodies": bodies, "etags": etags}
+
+def get_cached_asset(name, render):
+    """Return the cached asset called name, rendering it on first use."""
+    asset = _asset_cache.get(name)
+    if asset is None:
+        asset = _asset_cache[name] = build_cached_asset(render())
+    return asset
+
+def invalidate_cached_assets():
+    """
+    Drop every cached asset of this process, so the next request renders it
+    again. This does not pick up edits to BOTS: BOT_MANIFEST, BOT_REGISTRY,
+    the session pool and the analysis processes all read BOTS once at
+    startup, so restart the server after changing it.
+    """
+    _asset_cache.clear()
+
+def serve_cached_asset(asset, mimetype):
+    encoding = next(
+        (enc for enc in ("br", "gzip")
+         if enc in asset["bodies"] and request.accept_encodings.quality(enc) > 0),
+        "identity"
+    )
+    etag = asset["etags"][encoding]
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": f"public, max-age={RT_PAGE_MAX_AGE}, must-revalidate",
+        "Vary": "Accept-Encoding"
+    }
+
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(asset["bodies"][encoding], mimetype=mimetype, headers=headers)
+
+@app.route("/bots.json")
+def bot_manifest():
+    asset = get_cached_asset("bots.json", lambda: json.dumps(BOT_MANIFEST).encode("utf-8"))
+    return serve_cached_asset(asset, "application/json")
+
 @app.route("/realtime")
 def realtime_page():
+    asset = get_cached_asset("realtime", lambda: render_realtime_page().encode("utf-8"))
+    return serve_cached_asset(asset, "text/html")
+
+def render_realtime_page():
+    # "</" must not appear raw inside the inline <script>
+    bots_json = json.dumps(BOT_MANIFEST).replace("</", "<\\/")
+    realtime_config = json.dumps({"realtimeUrl": OPENAI_REALTIME_URL, "replayUrl": RT_REPLAY_URL or None}).replace("</", "<\\/")
     return f"""
 <!DOCTYPE html>
 <html lang="en">
@@ -1214,10 +2415,12 @@ body {{
 <audio id="remoteAudio" autoplay></audio>
 
 <script>
-const bots = {json.dumps(BOTS)};
+const bots = {bots_json};
+const realtimeConfig = {realtime_config};
 let selectedBotId = bots[0].id;
-let pc, dc, micStream;
+let pc, dc, micStream, replayAbort;
 let conversationHistory = [];
+let analysisSessionId = newAnalysisSessionId();
 
 const connectBtn = document.getElementById('connectBtn');
 const disconnectBtn = document.getElementById('disconnectBtn');
@@ -1246,6 +2449,75 @@ function append(role, txt) {{
   
   // Store in conversation history
   conversationHistory.push({{ role, text: txt, timestamp: new Date().toISOString() }});
+  postTurn(conversationHistory.length - 1);
+}}
+
+// One id per tab, so rate limits tell apart learners behind the same address
+const clientId = sessionStorage.getItem('clientId') || newAnalysisSessionId();
+sessionStorage.setItem('clientId', clientId);
+
+function newAnalysisSessionId() {{
+  if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+}}
+
+function turnPayload(index) {{
+  const msg = conversationHistory[index];
+  return {{ index, role: msg.role, text: msg.text }};
+}}
+
+// Send each turn for analysis as it happens, so "Analyze My Chat" only has
+// to send the session id. Turns lost on the way go with the final request.
+function postTurn(index) {{
+  fetch('/analyze/turns', {{
+    method: 'POST',
+    headers: {{ 'Content-Type': 'application/json', 'X-Client-Id': clientId }},
+    body: JSON.stringify({{ session_id: analysisSessionId, bot_id: selectedBotId, turns: [turnPayload(index)] }})
+  }}).catch(() => {{}});
+}}
+
+// Submit the analysis as a job and poll it, showing progress on the button.
+// A full queue or a rate limit answers 503/429 with Retry-After; wait and
+// try again a few times.
+async function requestAnalysis() {{
+  const post = async (body) => {{
+    for (let attempt = 0; ; attempt++) {{
+      const response = await fetch('/analyze/jobs', {{
+        method: 'POST',
+        headers: {{'Content-Type': 'application/json', 'X-Client-Id': clientId}},
+        body: JSON.stringify(body)
+      }});
+      if ((response.status !== 503 && response.status !== 429) || attempt >= 3) return response;
+      const wait = Math.min(30, parseInt(response.headers.get('Retry-After') || '5', 10));
+      analyzeBtn.textContent = `Server busy, retrying in ${{wait}}s...`;
+      await new Promise(r => setTimeout(r, wait * 1000));
+    }}
+  }};
+  const sessionBody = {{ bot_id: selectedBotId, session_id: analysisSessionId, turn_count: conversationHistory.length }};
+  let response = await post(sessionBody);
+  if (response.status === 409) {{
+    // Some turns never arrived; send just those
+    const {{ missing }} = await response.json();
+    response = await post({{ ...sessionBody, turns: missing.map(turnPayload) }});
+  }}
+  if (response.status === 404 || response.status === 409 || response.status === 413) {{
+    // Session expired, still incomplete or refused a turn: send the whole transcript
+    response = await post({{ bot_id: selectedBotId, conversation: conversationHistory }});
+  }}
+  if (!response.ok) throw new Error('Analysis failed');
+
+  let job = await response.json();
+  while (job.state === 'queued' || job.state === 'running') {{
+    const percent = job.progress && job.progress.percent;
+    analyzeBtn.textContent = job.state === 'queued' ? 'Queued...'
+      : (percent != null ? `Analyzing... ${{percent}}%` : 'Analyzing...');
+    await new Promise(r => setTimeout(r, 1000));
+    const poll = await fetch(job.status_url);
+    if (!poll.ok) throw new Error('Analysis failed');
+    job = await poll.json();
+  }}
+  if (job.state !== 'done') throw new Error(job.error || `Analysis ${{job.state}}`);
+  return fetch(job.result_url);
 }}
 
 function buildScenarioButtons() {{
@@ -1273,47 +2545,71 @@ function wireDataChannel(channel) {{
   channel.onerror = (e) => {{ console.error('Data channel error:', e); }};
   channel.onmessage = (e) => {{
     try {{
-      const msg = JSON.parse(e.data);
-      console.log('Received event:', msg.type);
-      
-      // Handle user audio transcription
-      if (msg.type === 'conversation.item.input_audio_transcription.completed') {{
-        if (msg.transcript) {{
-          console.log('User transcript:', msg.transcript);
-          append('user', msg.transcript);
-        }}
-      }}
-      // Handle assistant text responses
-      else if (msg.type === 'response.done') {{
-        const resp = msg.response;
-        if (resp && resp.output) {{
-          for (const item of resp.output) {{
-            if (item.type === 'message' && item.role === 'assistant') {{
-              for (const c of (item.content || [])) {{
-                if (c.type === 'text' && c.text) {{
-                  console.log('Assistant text:', c.text);
-                  append('assistant', c.text);
-                }}
-              }}
+      handleRealtimeEvent(JSON.parse(e.data));
+    }} catch (err) {{
+      console.error('Message parse error:', err);
+    }}
+  }};
+}}
+
+function handleRealtimeEvent(msg) {{
+  console.log('Received event:', msg.type);
+  
+  // Handle user audio transcription
+  if (msg.type === 'conversation.item.input_audio_transcription.completed') {{
+    if (msg.transcript) {{
+      console.log('User transcript:', msg.transcript);
+      append('user', msg.transcript);
+    }}
+  }}
+  // Handle assistant text responses
+  else if (msg.type === 'response.done') {{
+    const resp = msg.response;
+    if (resp && resp.output) {{
+      for (const item of resp.output) {{
+        if (item.type === 'message' && item.role === 'assistant') {{
+          for (const c of (item.content || [])) {{
+            if (c.type === 'text' && c.text) {{
+              console.log('Assistant text:', c.text);
+              append('assistant', c.text);
             }}
           }}
         }}
       }}
-      // Handle assistant audio transcript
-      else if (msg.type === 'response.audio_transcript.done') {{
-        if (msg.transcript) {{
-          console.log('Assistant audio transcript:', msg.transcript);
-          append('assistant', msg.transcript);
-        }}
-      }}
-      // Log other events for debugging
-      else {{
-        console.log('Other event data:', JSON.stringify(msg).substring(0, 200));
-      }}
-    }} catch (err) {{
-      console.error('Message parse error:', err);
     }}
-  }};
+  }}
+  // Handle assistant audio transcript
+  else if (msg.type === 'response.audio_transcript.done') {{
+    if (msg.transcript) {{
+      console.log('Assistant audio transcript:', msg.transcript);
+      append('assistant', msg.transcript);
+    }}
+  }}
+  // Log other events for debugging
+  else {{
+    console.log('Other event data:', JSON.stringify(msg).substring(0, 200));
+  }}
+}}
+
+// RT_REPLAY_URL: feed a recorded event stream (one JSON event per line)
+// through the same handler as the data channel
+async function replayEvents() {{
+  replayAbort = new AbortController();
+  const resp = await fetch(realtimeConfig.replayUrl, {{ signal: replayAbort.signal }});
+  if (!resp.ok) throw new Error('Replay failed: ' + resp.status);
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {{
+    const {{ done, value }} = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, {{ stream: true }});
+    const lines = buffered.split('\\n');
+    buffered = lines.pop();
+    for (const line of lines) {{
+      if (line.trim()) handleRealtimeEvent(JSON.parse(line));
+    }}
+  }}
 }}
 
 function waitForIceGatheringComplete(peerConnection) {{
@@ -1341,13 +2637,30 @@ async function connect() {{
     console.log('Requesting session...');
     const sessionResp = await fetch('/session', {{
       method: 'POST',
-      headers: {{ 'Content-Type': 'application/json' }},
+      headers: {{ 'Content-Type': 'application/json', 'X-Client-Id': clientId }},
       body: JSON.stringify({{ bot_id: selectedBotId }})
     }});
+    if (sessionResp.status === 429 || sessionResp.status === 503) {{
+      const wait = sessionResp.headers.get('Retry-After') || 'a few';
+      const reason = sessionResp.status === 503
+        ? 'The voice service is not responding right now'
+        : 'Too many connection attempts';
+      throw new Error(`${{reason}}. Please wait ${{wait}} seconds and click Connect again.`);
+    }}
     if (!sessionResp.ok) throw new Error('Session creation failed');
     const session = await sessionResp.json();
     console.log('Session created');
 
+    if (realtimeConfig.replayUrl) {{
+      disconnectBtn.disabled = false;
+      setStatus('ready');
+      append('assistant', 'Replaying a recorded conversation');
+      replayEvents().catch(e => {{
+        if (e.name !== 'AbortError') append('assistant', 'Replay error: ' + e.message);
+      }});
+      return;
+    }}
+
     // 2) Mic
     console.log('Requesting microphone access...');
     micStream = await navigator.mediaDevices.getUserMedia({{ audio: true }});
@@ -1406,7 +2719,7 @@ async function connect() {{
     console.log('ICE gathering complete');
 
     // 6) Handshake with Realtime
-    const url = `https://api.openai.com/v1/realtime?model=${{encodeURIComponent(session.model || 'gpt-4o-realtime-preview-2024-12-17')}}`;
+    const url = `${{realtimeConfig.realtimeUrl}}?model=${{encodeURIComponent(session.model || 'gpt-4o-realtime-preview-2024-12-17')}}`;
     console.log('Connecting to OpenAI Realtime API...');
     const ans = await fetch(url, {{
       method: 'POST',
@@ -1442,6 +2755,7 @@ async function disconnect(){{
   disconnectBtn.disabled = true; 
   connectBtn.disabled = false;
   
+  if (replayAbort) replayAbort.abort();
   if (dc) try{{ dc.close(); }}catch(e){{}}
   if (pc) try{{ pc.close(); }}catch(e){{}}
   if (micStream) for (const t of micStream.getTracks()) t.stop();
@@ -1467,14 +2781,7 @@ analyzeBtn.addEventListener('click', async ()=>{{
   analyzeBtn.textContent = 'Analyzing...';
   
   try {{
-    const response = await fetch('/analyze', {{
-      method: 'POST',
-      headers: {{'Content-Type': 'application/json'}},
-      body: JSON.stringify({{
-        bot_id: selectedBotId,
-        conversation: conversationHistory
-      }})
-    }});
+    const response = await requestAnalysis();
     
     if (!response.ok) throw new Error('Analysis failed');
     
@@ -1501,6 +2808,7 @@ analyzeBtn.addEventListener('click', async ()=>{{
 clearBtn.addEventListener('click', ()=>{{ 
   logEl.innerHTML=''; 
   conversationHistory = [];
+  analysisSessionId = newAnalysisSessionId();
 }});
 
 toggleTranscriptBtn.addEventListener('click', ()=>{{
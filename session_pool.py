@@ -0,0 +1,158 @@
+# session_pool.py — pre-minted ephemeral Realtime sessions per bot
+# --------------------------------------------------------------
+# Keeps a few fresh sessions minted ahead of time for every bot so /session
+# can answer without waiting on OpenAI. A background thread tops the pool up,
+# and sessions whose client secret is about to expire are thrown away rather
+# than handed to a learner. When the pool for a bot is empty, /session falls
+# back to minting on demand.
+#
+# Disabled unless RT_SESSION_POOL_SIZE > 0. The pool lives in each worker
+# process, so upstream sessions minted = size x bots x workers. Ephemeral
+# keys only live about a minute, so every slot is re-minted roughly every
+# (60 - RT_SESSION_POOL_MIN_TTL) seconds; keep the size small. Every refill
+# mint is admitted first (server.py charges it to the machine-wide /session
+# rate limit), so a pool cannot mint past the budget set for Connect.
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+RT_SESSION_POOL_SIZE = int(os.getenv("RT_SESSION_POOL_SIZE", "0"))  # per bot, per worker
+RT_SESSION_POOL_MIN_TTL = float(os.getenv("RT_SESSION_POOL_MIN_TTL", "20"))  # seconds left to be usable
+RT_SESSION_POOL_REFILL_INTERVAL = float(os.getenv("RT_SESSION_POOL_REFILL_INTERVAL", "2"))
+
+DEFAULT_SESSION_LIFETIME = 60  # used when the upstream body has no expires_at
+
+
+def session_expires_at(body):
+    """Read client_secret.expires_at (epoch seconds) from a session body."""
+    try:
+        return float(json.loads(body)["client_secret"]["expires_at"])
+    except (ValueError, KeyError, TypeError):
+        return time.time() + DEFAULT_SESSION_LIFETIME
+
+
+class SessionPool:
+    """
+    Per-process pool of ready-to-serve session bodies keyed by bot id.
+    mint(bot_id) must return the raw JSON body of a new upstream session
+    and raise on failure. admit(), when given, is called before every refill
+    mint and raises to hold refills back until the next pass.
+    """
+
+    def __init__(self, mint, bot_ids, size=RT_SESSION_POOL_SIZE, min_ttl=RT_SESSION_POOL_MIN_TTL,
+                 refill_interval=RT_SESSION_POOL_REFILL_INTERVAL, admit=None):
+        self.mint = mint
+        self.admit = admit
+        self.bot_ids = list(bot_ids)
+        self.size = size
+        self.min_ttl = min_ttl
+        self.refill_interval = refill_interval
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "minted": 0,
+            "discarded_expiring": 0,
+            "refill_errors": 0,
+            "refills_not_admitted": 0,
+            "refill_latency_ms_total": 0.0,
+            "refill_latency_ms_max": 0.0,
+            "refill_latency_ms_last": 0.0
+        }
+        self._entries = {bot_id: deque() for bot_id in self.bot_ids}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def start(self):
+        """Start refilling now rather than on the first take(); a no-op when disabled."""
+        self._ensure_started()
+
+    def take(self, bot_id):
+        """Pop a still-fresh session body for bot_id, or None on a miss."""
+        self._ensure_started()
+        now = time.time()
+        with self._lock:
+            entries = self._entries.get(bot_id)
+            while entries:
+                expires_at, body = entries.popleft()
+                if expires_at - now >= self.min_ttl:
+                    self.counters["hits"] += 1
+                    self._wake.set()
+                    return body
+                self.counters["discarded_expiring"] += 1
+            self.counters["misses"] += 1
+        self._wake.set()
+        return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["ready"] = {bot_id: len(entries) for bot_id, entries in self._entries.items()}
+        stats["enabled"] = self.enabled
+        stats["size_per_bot"] = self.size
+        stats["refills"] = stats["minted"] + stats["refill_errors"]
+        return stats
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so each worker starts its own refiller
+        pid = os.getpid()
+        if not self.enabled or self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            for entries in self._entries.values():
+                entries.clear()  # bodies minted by the parent are shared with siblings
+        threading.Thread(target=self._refill_forever, name="session-pool", daemon=True).start()
+
+    def _refill_forever(self):
+        while True:
+            try:
+                self.refill_once()
+            except Exception:
+                pass  # counted per mint; keep the thread alive no matter what
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+
+    def refill_once(self):
+        """Drop sessions close to expiry and mint until every bot is full."""
+        for bot_id in self.bot_ids:
+            now = time.time()
+            with self._lock:
+                entries = self._entries[bot_id]
+                while entries and entries[0][0] - now < self.min_ttl:
+                    entries.popleft()
+                    self.counters["discarded_expiring"] += 1
+                missing = self.size - len(entries)
+
+            for _ in range(missing):
+                if self.admit is not None:
+                    try:
+                        self.admit()
+                    except Exception:
+                        with self._lock:
+                            self.counters["refills_not_admitted"] += 1
+                        return  # the budget is spent for every bot; wait for the next pass
+                start = time.perf_counter()
+                try:
+                    body = self.mint(bot_id)
+                except Exception:
+                    with self._lock:
+                        self.counters["refill_errors"] += 1
+                    break  # try this bot again on the next pass
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    self._entries[bot_id].append((session_expires_at(body), body))
+                    self.counters["minted"] += 1
+                    self.counters["refill_latency_ms_total"] += elapsed_ms
+                    self.counters["refill_latency_ms_last"] = elapsed_ms
+                    self.counters["refill_latency_ms_max"] = max(
+                        self.counters["refill_latency_ms_max"], elapsed_ms)
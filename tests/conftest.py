@@ -0,0 +1,11 @@
+# tests/conftest.py — make the top-level modules importable from tests/
+# --------------------------------------------------------------
+# Run from the repository root:
+#   python -m pytest -q
+
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
@@ -0,0 +1,165 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import admission
+from admission import ConcurrencyLimit, Overloaded, RateLimited, RateLimiter
+
+
+class Clock:
+    """Stands in for the time module in admission.py."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def limiter(tmp_path, clock):
+    return RateLimiter(str(tmp_path / "admission.sqlite3"))
+
+
+def tokens(limiter, key):
+    return limiter.db.connection().execute("SELECT tokens FROM buckets WHERE key = ?", (key,)).fetchone()[0]
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_bucket_runs_dry_and_refills(limiter, clock):
+    bucket = [("session:address:10.0.0.1", "per address", 2, 10)]
+    limiter.acquire(bucket)
+    limiter.acquire(bucket)
+    with pytest.raises(RateLimited) as e:
+        limiter.acquire(bucket)
+    assert e.value.retry_after == 5  # one token every 10/2 seconds
+    assert e.value.scope == "per address"
+
+    clock.now += 5
+    limiter.acquire(bucket)
+    with pytest.raises(RateLimited):
+        limiter.acquire(bucket)
+    clock.now += 60
+    assert tokens(limiter, "session:address:10.0.0.1") == 0  # stored level, before this refill
+    limiter.acquire(bucket)
+    assert tokens(limiter, "session:address:10.0.0.1") == 1  # refilled to capacity, then one taken
+    assert limiter.stats() == {"allowed": 4, "limited": 2, "errors": 0}
+
+
+def test_short_bucket_takes_no_token_from_the_others(limiter):
+    tab = ("analyze:tab:abcdefgh", "per tab", 1, 60)
+    address = ("analyze:address:10.0.0.1", "per address", 5, 60)
+    everyone = ("analyze:all", "all clients", 5, 60)
+    limiter.acquire([tab, address, everyone])
+    assert tokens(limiter, address[0]) == 4
+
+    with pytest.raises(RateLimited) as e:
+        limiter.acquire([tab, address, everyone])
+    assert e.value.scope == "per tab"
+    assert tokens(limiter, address[0]) == 4
+    assert tokens(limiter, everyone[0]) == 4
+
+
+@pytest.mark.parametrize("capacity, period, elapsed, retry_after", [
+    (60, 60, 0.5, 1),    # half a second to the next token: never less than 1
+    (60, 60, 0.0, 1),
+    (1, 90, 0.2, 90),    # 89.8 seconds rounds up
+    (2, 3, 0.0, 2),      # 1.5 seconds rounds up
+])
+def test_retry_after_rounds_up_to_whole_seconds(limiter, clock, capacity, period, elapsed, retry_after):
+    bucket = [("turns:all", "all clients", capacity, period)]
+    for _ in range(capacity):
+        limiter.acquire(bucket)
+    clock.now += elapsed
+    with pytest.raises(RateLimited) as e:
+        limiter.acquire(bucket)
+    assert e.value.retry_after == retry_after
+
+
+def test_retry_after_names_the_longest_wait(limiter):
+    fast = ("session:tab:abcdefgh", "per tab", 10, 10)
+    slow = ("session:all", "all clients", 1, 60)
+    limiter.acquire([fast, slow])
+    for _ in range(9):
+        limiter.acquire([fast])
+    with pytest.raises(RateLimited) as e:
+        limiter.acquire([fast, slow])
+    assert (e.value.scope, e.value.retry_after) == ("all clients", 60)
+
+
+def test_rate_limiter_fails_open(tmp_path):
+    limiter = RateLimiter(str(tmp_path / "missing" / "admission.sqlite3"))
+    for _ in range(3):
+        limiter.acquire([("session:all", "all clients", 1, 60)])
+    assert limiter.stats() == {"allowed": 0, "limited": 0, "errors": 3}
+
+
+@pytest.fixture
+def slots(tmp_path, clock):
+    return ConcurrencyLimit(limit=2, path=str(tmp_path / "admission.sqlite3"), timeout=600)
+
+
+def add_slot(limit, slot_id, pid, started_at):
+    limit.db.connection().execute("INSERT INTO slots (id, pid, started_at) VALUES (?, ?, ?)",
+                                  (slot_id, pid, started_at))
+
+
+def test_slots_are_capped_and_released(slots):
+    with slots.slot():
+        with slots.slot():
+            assert slots.stats()["in_flight"] == 2
+            with pytest.raises(Overloaded):
+                with slots.slot():
+                    pass
+    assert slots.stats()["in_flight"] == 0
+
+
+def test_multi_slot_is_all_or_nothing(slots):
+    with slots.slot():
+        with pytest.raises(Overloaded):
+            with slots.slot(2):
+                pass
+        assert slots.stats()["in_flight"] == 1
+    with slots.slot(5):  # clamped to the limit
+        assert slots.stats()["in_flight"] == 2
+
+
+def test_slots_of_dead_processes_are_reclaimed(slots, clock):
+    add_slot(slots, "dead-1", dead_pid(), clock.now)
+    add_slot(slots, "dead-2", dead_pid(), clock.now)
+    with slots.slot():
+        assert slots.stats()["in_flight"] == 1
+    assert slots.counters["reclaimed"] == 2
+
+
+def test_stale_slots_are_reclaimed_after_the_timeout(slots, clock):
+    add_slot(slots, "hung", os.getpid(), clock.now - 601)
+    add_slot(slots, "busy", os.getpid(), clock.now - 10)
+    with slots.slot():
+        pass
+    assert slots.counters["reclaimed"] == 1
+    with pytest.raises(Overloaded):  # "busy" and a new one fill the limit
+        with slots.slot(), slots.slot():
+            pass
+
+
+def test_concurrency_limit_fails_open(tmp_path):
+    limit = ConcurrencyLimit(limit=1, path=str(tmp_path / "missing" / "admission.sqlite3"))
+    with limit.slot(), limit.slot():
+        pass
+    assert limit.stats()["errors"] == 2
+    assert limit.stats()["in_flight"] is None
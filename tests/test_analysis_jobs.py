@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from analysis_jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobQueue, QueueFull
+
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+    yield gate
+    gate.set()  # let blocked runner threads finish
+
+
+@pytest.fixture
+def queue(tmp_path, gate):
+    def run(job_id, payload):
+        # Holds the runner until the test opens the gate, reporting progress
+        # (and so noticing cancellation) while it waits
+        if payload.get("fail"):
+            raise ValueError("bad transcript")
+        queue.progress(job_id, "waiting")
+        while not gate.wait(0.01):
+            queue.progress(job_id, "waiting")
+        return {"echo": payload}
+
+    queue = JobQueue(run, path=str(tmp_path / "jobs.sqlite3"), runners=1, queue_max=2)
+    return queue
+
+
+def wait_for(queue, job_id, state, timeout=5):
+    deadline = time.monotonic() + timeout
+    while queue.status(job_id)["state"] != state:
+        assert time.monotonic() < deadline, queue.status(job_id)
+        time.sleep(0.01)
+    return queue.status(job_id)
+
+
+def test_job_runs_to_a_downloadable_result(queue, gate):
+    job_id = queue.submit({"transcript": "hi"})
+    assert wait_for(queue, job_id, RUNNING)["progress"] == {"stage": "waiting"}
+    assert queue.result(job_id) is None
+    gate.set()
+    wait_for(queue, job_id, DONE)
+    assert queue.result(job_id) == ({"transcript": "hi"}, {"echo": {"transcript": "hi"}})
+
+
+def test_failed_job_records_the_error(queue):
+    job_id = queue.submit({"fail": True})
+    assert wait_for(queue, job_id, FAILED)["error"] == "ValueError: bad transcript"
+    assert queue.result(job_id) is None
+
+
+def test_cancel_queued_job(queue, gate):
+    first = queue.submit({"n": 1})
+    wait_for(queue, first, RUNNING)
+    second = queue.submit({"n": 2})
+    assert queue.status(second)["queue_position"] == 0
+    assert queue.cancel(second)["state"] == CANCELLED
+    gate.set()
+    wait_for(queue, first, DONE)
+    assert queue.status(second)["state"] == CANCELLED  # never claimed
+    assert queue.result(second) is None
+
+
+def test_cancel_running_job_stops_at_its_next_progress(queue):
+    job_id = queue.submit({"n": 1})
+    wait_for(queue, job_id, RUNNING)
+    status = queue.cancel(job_id)
+    assert status["cancel_requested"]
+    wait_for(queue, job_id, CANCELLED)
+    assert queue.stats()["running_here"] == 0
+
+
+def test_full_queue_refuses_new_jobs(queue, gate):
+    first = queue.submit({"n": 1})
+    second = queue.submit({"n": 2})
+    with pytest.raises(QueueFull) as e:
+        queue.submit({"n": 3})
+    assert e.value.retry_after == 2  # no finished jobs yet: the 2 s default for one slot
+    assert queue.status(queue.submit({"n": 3}, result={"cached": True}))["state"] == DONE  # cache hits skip the queue
+
+    queue.cancel(second)
+    third = queue.submit({"n": 3})
+    assert queue.status(third)["state"] in (QUEUED, RUNNING)
+    gate.set()
+    wait_for(queue, first, DONE)
+    wait_for(queue, third, DONE)
+
+
+def test_stale_running_jobs_fail_and_old_jobs_are_purged(tmp_path):
+    queue = JobQueue(lambda job_id, payload: None, path=str(tmp_path / "jobs.sqlite3"), ttl=3600, stale=60)
+    now = time.time()
+    rows = [("stale", RUNNING, now - 300, now - 61, None),
+            ("alive", RUNNING, now - 300, now - 5, None),
+            ("old", DONE, now - 7300, now - 7300, now - 7200),
+            ("recent", DONE, now - 300, now - 300, now - 200)]
+    queue.db.connection().executemany(
+        "INSERT INTO jobs (id, state, payload, started_at, heartbeat_at, finished_at, created_at) "
+        "VALUES (?, ?, '{}', ?, ?, ?, 0)", rows)
+
+    queue._maintain()
+    states = dict(queue.db.connection().execute("SELECT id, state FROM jobs").fetchall())
+    assert states == {"stale": FAILED, "alive": RUNNING, "recent": DONE}
+    error = queue.db.connection().execute("SELECT error FROM jobs WHERE id = 'stale'").fetchone()[0]
+    assert error == "Worker stopped while running the job"
@@ -0,0 +1,113 @@
+import pytest
+
+import analysis_sessions
+from analysis_sessions import AnalysisSessionStore, TooManySessions, TooManyTurns, TurnTooLong
+
+
+class Clock:
+    """Stands in for the time module in analysis_sessions.py."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(analysis_sessions, "time", clock)
+    return clock
+
+
+def fold(aggregate, counts):
+    aggregate = dict(aggregate or {})
+    for key, value in counts.items():
+        aggregate[key] = aggregate.get(key, 0) + value
+    return aggregate
+
+
+def store(tmp_path, **limits):
+    return AnalysisSessionStore(fold, dict, path=str(tmp_path / "sessions.sqlite3"), **limits)
+
+
+def turn(index, words=1, role="user"):
+    return (index, role, f"turn {index}", {"turns": 1, "words": words})
+
+
+def test_retried_post_is_not_folded_twice(tmp_path, clock):
+    s = store(tmp_path)
+    assert s.add_turns("abc", "bot", [turn(0, 3), turn(1, 4)]) == 2
+    assert s.add_turns("abc", "bot", [turn(0, 3), turn(1, 4)]) == 2
+    assert s.load("abc")["aggregate"] == {"turns": 2, "words": 7}
+
+    assert s.add_turns("abc", "bot", [turn(1, 4), turn(2, 5)]) == 3  # a retry that carries a new turn
+    session = s.load("abc")
+    assert session["aggregate"] == {"turns": 3, "words": 12}
+    assert session["folded"] == {0, 1, 2}
+
+
+def test_turns_may_arrive_in_any_order(tmp_path, clock):
+    s = store(tmp_path)
+    s.add_turns("in-order", "bot", [turn(0, 3), turn(1, 4), turn(2, 5)])
+    s.add_turns("shuffled", "bot", [turn(2, 5)])
+    s.add_turns("shuffled", "bot", [turn(0, 3)])
+    s.add_turns("shuffled", "bot", [turn(1, 4), turn(2, 5)])
+    in_order, shuffled = s.load("in-order"), s.load("shuffled")
+    assert shuffled["aggregate"] == in_order["aggregate"] == {"turns": 3, "words": 12}
+    assert shuffled["turns"] == in_order["turns"]
+    assert [index for index, _, _ in shuffled["turns"]] == [0, 1, 2]
+
+
+def test_turns_without_counts_are_stored_but_not_folded(tmp_path, clock):
+    s = store(tmp_path)
+    s.add_turns("abc", "bot", [(0, "user", "hello", None), turn(1, 4)])
+    session = s.load("abc")
+    assert len(session["turns"]) == 2
+    assert session["folded"] == {1}
+    assert session["aggregate"] == {"turns": 1, "words": 4}
+
+
+def test_turn_limit_refuses_the_whole_post(tmp_path, clock):
+    s = store(tmp_path, max_turns=3)
+    s.add_turns("abc", "bot", [turn(0), turn(1)])
+    with pytest.raises(TooManyTurns):
+        s.add_turns("abc", "bot", [turn(2), turn(3)])
+    assert len(s.load("abc")["turns"]) == 2
+    assert s.load("abc")["aggregate"] == {"turns": 2, "words": 2}
+
+    assert s.add_turns("abc", "bot", [turn(2)]) == 3
+    assert s.add_turns("abc", "bot", [turn(1), turn(2)]) == 3  # a retry at the limit is still ignored
+    with pytest.raises(TooManyTurns):
+        s.add_turns("abc", "bot", [turn(3)])
+
+
+def test_long_turns_are_refused_before_anything_is_stored(tmp_path, clock):
+    s = store(tmp_path, max_turn_chars=10)
+    with pytest.raises(TurnTooLong):
+        s.check("abc", ["short", "x" * 11])
+    with pytest.raises(TurnTooLong):
+        s.add_turns("abc", "bot", [turn(0), (1, "user", "x" * 11, {"turns": 1})])
+    assert s.load("abc") is None
+    s.check("abc", ["x" * 10])
+
+
+def test_live_session_limit(tmp_path, clock):
+    s = store(tmp_path, max_live=2, ttl=600)
+    s.add_turns("one", "bot", [turn(0)])
+    s.add_turns("two", "bot", [turn(0)])
+    with pytest.raises(TooManySessions) as e:
+        s.add_turns("three", "bot", [turn(0)])
+    assert e.value.retry_after == analysis_sessions.PURGE_INTERVAL
+    with pytest.raises(TooManySessions):
+        s.check("three", ["hello"])
+    assert s.load("three") is None
+
+    s.check("one", ["hello"])
+    assert s.add_turns("one", "bot", [turn(1)]) == 2  # sessions already live are not affected
+
+    clock.now += 601
+    assert s.load("two") is None  # expired, so it no longer counts
+    s.add_turns("three", "bot", [turn(0)])
+    assert s.stats()["sessions"] == 1  # the expired ones were purged on the way
@@ -0,0 +1,95 @@
+import pytest
+
+import disfluency
+from disfluency import DisfluencyMatcher, empty_counts, matcher_for, merge_counts
+
+
+@pytest.fixture
+def english():
+    return matcher_for("English")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("you know it was kind of fine", {"you know": 1, "kind of": 1}),
+    ("i mean the report is sort of done", {"i mean": 1, "sort of": 1}),
+    ("i think you should know that", {}),
+    ("well it was like kind of like that", {"well": 1, "like": 2, "kind of": 1}),
+])
+def test_multi_word_fillers(english, text, expected):
+    assert english.scan(text)["fillers"] == expected
+
+
+def test_longest_phrase_wins():
+    matcher = DisfluencyMatcher(["you", "you know"], [])
+    assert matcher.scan("you know you")["fillers"] == {"you know": 1, "you": 1}
+
+
+@pytest.mark.parametrize("text", [
+    "i also think so",
+    "it is soft and also sound",
+    "alright, that is likely",
+])
+def test_fillers_match_whole_words_only(english, text):
+    fillers = english.scan(text)["fillers"]
+    assert fillers.get("so", 0) == text.split().count("so")
+    assert "like" not in fillers
+    assert "right" not in fillers
+
+
+@pytest.mark.parametrize("text, canonical", [
+    ("um", "um"),
+    ("ummmm", "um"),
+    ("uhhh", "uh"),
+    ("errr", "er"),
+    ("erm", "erm"),
+    ("hm", "hmm"),
+    ("hmm", "hmm"),
+    ("hmmmmm", "hmm"),
+    ("ahh", "ah"),
+])
+def test_stretched_hesitations(english, text, canonical):
+    counts = english.scan(f"{text}, i think so")
+    assert counts["hesitation_sounds"] == 1
+    assert counts["fillers"][canonical] == 1
+
+
+@pytest.mark.parametrize("text", ["umbrella", "hum", "mum", "her", "huh", "aha"])
+def test_words_containing_hesitations_are_not_hesitations(english, text):
+    assert english.scan(text)["hesitation_sounds"] == 0
+
+
+@pytest.mark.parametrize("text, repetitions", [
+    ("i i think the the plan works", 2),
+    ("no no no", 2),
+    ("i think i think", 0),
+    ("um um well", 1),
+])
+def test_repetitions(english, text, repetitions):
+    assert english.scan(text)["repetitions"] == repetitions
+
+
+def test_word_count_keeps_contractions(english):
+    assert english.scan("i don't know, it's fine")["words"] == 5
+
+
+def test_merge_counts_adds_turns(english):
+    total = empty_counts()
+    merge_counts(total, english.scan("um, you know, i i think so"))
+    merge_counts(total, english.scan("uhh well you know"))
+    assert total["words"] == 11
+    assert total["fillers"] == {"um": 1, "uh": 1, "you know": 2, "so": 1, "well": 1}
+    assert total["hesitation_sounds"] == 2
+    assert total["repetitions"] == 1
+
+
+def test_unknown_language_falls_back_to_english():
+    assert matcher_for("Klingon") is matcher_for("English")
+
+
+def test_register_lexicon(monkeypatch):
+    monkeypatch.setattr(disfluency, "FILLER_LEXICONS", dict(disfluency.FILLER_LEXICONS))
+    monkeypatch.setattr(disfluency, "_matchers", dict(disfluency._matchers))
+    disfluency.register_lexicon("Spanish", ["o sea", "pues", "este"], ["eh", "mmm"])
+    counts = matcher_for("Spanish").scan("pues o sea ehhh mm no sé")
+    assert counts["fillers"] == {"pues": 1, "o sea": 1, "eh": 1, "mmm": 1}
+    assert counts["hesitation_sounds"] == 2
@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_server_import_stays_within_budget(tmp_path):
+    env = dict(os.environ)
+    for name in ("ADMISSION", "METRICS", "ANALYSIS_CACHE", "ANALYSIS_JOBS", "ANALYSIS_SESSIONS"):
+        env[f"{name}_PATH"] = str(tmp_path / f"{name.lower()}.sqlite3")
+    result = subprocess.run([sys.executable, "-m", "benchmarks.import_time", "--runs", "3"],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert "imported at module load" not in result.stdout, result.stdout  # nltk/textstat stay lazy
+    assert result.returncode == 0, result.stdout + result.stderr
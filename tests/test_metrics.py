@@ -0,0 +1,108 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from metrics import COUNTER, GAUGE, HISTOGRAM, RETIRED_PID, Metrics
+
+BUCKETS = (0.1, 1.0)
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+@pytest.fixture
+def registry(tmp_path):
+    m = Metrics(str(tmp_path / "metrics.sqlite3"), flush_interval=3600, buckets=BUCKETS)
+    m.describe("requests_total", COUNTER, "Requests")
+    m.describe("in_flight", GAUGE, "Requests in flight")
+    m.describe("latency_seconds", HISTOGRAM, "Latency")
+    return m
+
+
+def write_snapshot(m, pid, requests, in_flight, histogram):
+    """What another worker's flush() leaves behind."""
+    rows = [["requests_total", [["route", "/session"]], requests],
+            ["in_flight", [], in_flight],
+            ["latency_seconds", [], histogram]]
+    m.db.connection().execute("INSERT OR REPLACE INTO snapshots (pid, updated_at, data) VALUES (?, ?, ?)",
+                              (pid, time.time(), json.dumps(rows)))
+
+
+def pids(m):
+    return {pid for pid, in m.db.connection().execute("SELECT pid FROM snapshots")}
+
+
+def test_collect_sums_live_and_retired_workers(registry):
+    registry.inc("requests_total", 3, route="/session")
+    registry.set("in_flight", 2)
+    registry.observe("latency_seconds", 0.05)
+    registry.observe("latency_seconds", 5.0)
+    first_dead = dead_pid()
+    write_snapshot(registry, first_dead, 10, 7, [1, 2, 0, 0.9])
+
+    merged, live = registry.collect()
+    assert live == 1
+    assert merged[("requests_total", (("route", "/session"),))] == 13
+    assert merged[("latency_seconds", ())] == pytest.approx([2, 2, 1, 5.95])
+    assert merged[("in_flight", ())] == 2  # the dead worker's gauge is dropped
+    assert pids(registry) == {os.getpid(), RETIRED_PID}
+
+    # A second worker exits: the retired row keeps the first one's totals too
+    write_snapshot(registry, dead_pid(), 5, 4, [0, 1, 1, 3.0])
+    registry.inc("requests_total", route="/session")
+    merged, live = registry.collect()
+    assert live == 1
+    assert merged[("requests_total", (("route", "/session"),))] == 19
+    assert merged[("latency_seconds", ())] == pytest.approx([2, 3, 2, 8.95])
+    assert merged[("in_flight", ())] == 2
+    assert pids(registry) == {os.getpid(), RETIRED_PID}
+
+    retired = dict(((name, tuple(map(tuple, labels))), value) for name, labels, value in json.loads(
+        registry.db.connection().execute("SELECT data FROM snapshots WHERE pid = ?", (RETIRED_PID,)).fetchone()[0]))
+    assert retired[("requests_total", (("route", "/session"),))] == 15
+    assert ("in_flight", ()) not in retired
+
+
+def test_totals_never_go_backwards_across_collections(registry):
+    registry.inc("requests_total", route="/session")
+    totals = []
+    for requests in (4, 6, 9):
+        write_snapshot(registry, dead_pid(), requests, 1, [0, 0, 0, 0.0])
+        merged, _ = registry.collect()
+        totals.append(merged[("requests_total", (("route", "/session"),))])
+    assert totals == [5, 11, 20]
+
+
+def test_reused_pid_is_retired_before_the_first_flush(tmp_path):
+    path = str(tmp_path / "metrics.sqlite3")
+    old = Metrics(path, flush_interval=3600, buckets=BUCKETS)
+    old.describe("in_flight", GAUGE, "Requests in flight")
+    write_snapshot(old, os.getpid(), 7, 3, [1, 0, 0, 0.05])  # an exited process had our pid
+
+    new = Metrics(path, flush_interval=3600, buckets=BUCKETS)
+    new.describe("in_flight", GAUGE, "Requests in flight")
+    new.inc("requests_total", 2, route="/session")
+    merged, live = new.collect()
+    assert live == 1
+    assert merged[("requests_total", (("route", "/session"),))] == 9
+    assert merged[("latency_seconds", ())] == [1, 0, 0, 0.05]
+    assert ("in_flight", ()) not in merged
+
+
+def test_render_reports_histograms_cumulatively(registry):
+    registry.observe("latency_seconds", 0.05)
+    registry.observe("latency_seconds", 0.5)
+    registry.observe("latency_seconds", 5.0)
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+    assert "metrics_live_workers 1" in text
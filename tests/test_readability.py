@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+import readability
+
+textstat = pytest.importorskip("textstat")
+
+# readability.py name -> textstat function
+TEXTSTAT_SCORES = {
+    "flesch_reading_ease": "flesch_reading_ease",
+    "flesch_kincaid_grade": "flesch_kincaid_grade",
+    "gunning_fog": "gunning_fog",
+    "automated_readability_index": "automated_readability_index",
+    "coleman_liau_index": "coleman_liau_index",
+    "smog_index": "smog_index",
+    "dale_chall_readability_score": "dale_chall_readability_score",
+    "lix": "lix",
+    "rix": "rix",
+    "avg_sentence_length": "avg_sentence_length",
+    "avg_syllables_per_word": "avg_syllables_per_word",
+    "difficult_words": "difficult_words",
+    "polysyllable_count": "polysyllabcount",
+    "syllable_count": "syllable_count",
+    "lexicon_count": "lexicon_count",
+    "sentence_count": "sentence_count",
+}
+
+VOCABULARY = (
+    "i you we they it the a an and but so because well um uh like really just very "
+    "think know mean want need meeting report deadline budget finance team manager "
+    "schedule presentation quarterly customer feedback unfortunately absolutely "
+    "responsibility communication opportunity organization collaborate prioritize "
+    "double-check don't can't it's we'll they're o'clock e-mail 2024 15 3.5 "
+    "Friday Monday London OpenAI"
+).split()
+PUNCTUATION = [".", ".", ".", "?", "!", ",", ",", ";", ":", "...", ""]
+STRAY_TOKENS = ["-", ",", "—", "(", ")", "'", '"']
+
+
+def random_text(rng):
+    sentences = []
+    for _ in range(rng.randint(0, 8)):
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(1, 25))]
+        if rng.random() < 0.3:
+            words[0] = words[0].capitalize()
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(STRAY_TOKENS))
+        sentences.append(" ".join(words) + rng.choice(PUNCTUATION))
+    return " ".join(sentences)
+
+
+def textstat_scores(text):
+    return {ours: getattr(textstat, theirs)(text) for ours, theirs in TEXTSTAT_SCORES.items()}
+
+
+@pytest.fixture(autouse=True)
+def english_textstat():
+    textstat.set_lang("en_US")
+    textstat.set_rounding(True)
+
+
+@pytest.mark.parametrize("seed", range(500))
+def test_matches_textstat_on_random_text(seed):
+    text = random_text(random.Random(seed))
+    assert readability.readability_scores(text) == pytest.approx(textstat_scores(text)), text
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Okay.",
+    "Yes, sure!",
+    "Well... I think so.",
+    "The quarterly report is, um, basically finished. We still need to double-check the figures!",
+])
+def test_matches_textstat_on_edge_cases(text):
+    assert readability.readability_scores(text) == pytest.approx(textstat_scores(text))
+
+
+def merged_counts(turns):
+    total = readability.empty_counts()
+    for turn in turns:
+        readability.merge_counts(total, readability.text_counts(turn))
+    return total
+
+
+def test_merged_counts_add_up_turn_by_turn():
+    turns = [random_text(random.Random(seed)) for seed in range(20)]
+    total = merged_counts(turns)
+    for key in ("words", "sentences", "syllables", "polysyllables", "chars", "letters"):
+        assert total[key] == sum(readability.text_counts(turn)[key] for turn in turns)
+
+
+def test_unpunctuated_turns_are_sentences_of_their_own():
+    # Transcribed speech rarely has punctuation. Each turn of three or more
+    # words is one sentence, where the joined text would be a single one
+    turns = ["i think the budget is fine", "we can meet on friday morning", "okay sure"]
+    scores = readability.scores_from_counts(merged_counts(turns))
+    assert scores["sentence_count"] == 2
+    assert scores["lexicon_count"] == 14
+    assert scores["avg_sentence_length"] == 7.0
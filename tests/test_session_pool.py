@@ -0,0 +1,46 @@
+import json
+import threading
+import time
+
+from session_pool import SessionPool
+
+
+def minter():
+    minted = []
+
+    def mint(bot_id):
+        minted.append(bot_id)
+        return json.dumps({"id": len(minted), "client_secret": {"expires_at": time.time() + 60}}).encode()
+
+    return mint, minted
+
+
+def test_refills_stop_when_not_admitted():
+    mint, minted = minter()
+    budget = iter(range(3))
+
+    def admit():
+        next(budget)  # StopIteration once three refills were admitted
+
+    pool = SessionPool(mint, ["a", "b"], size=2, admit=admit)
+    pool.refill_once()
+    assert minted == ["a", "a", "b"]
+    assert pool.stats()["refills_not_admitted"] == 1
+    assert pool.stats()["ready"] == {"a": 2, "b": 1}
+
+
+def test_refills_are_admitted_one_by_one():
+    mint, minted = minter()
+    admitted = []
+    pool = SessionPool(mint, ["a"], size=2, admit=lambda: admitted.append(len(minted)))
+    pool.refill_once()
+    assert admitted == [0, 1]
+    assert pool.take("a") is not None
+
+
+def test_start_is_a_no_op_when_disabled():
+    pool = SessionPool(lambda bot_id: b"{}", ["a"], size=0)
+    threads = threading.active_count()
+    pool.start()
+    assert threading.active_count() == threads
+    assert pool.take("a") is None
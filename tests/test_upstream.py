@@ -0,0 +1,258 @@
+import pytest
+import requests
+
+import upstream
+from benchmarks.fake_upstream import start_fake
+from upstream import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, Hedger
+
+
+class Clock:
+    """Stands in for the time module in upstream.py."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream, "time", clock)
+    return clock
+
+
+def breaker(**settings):
+    return CircuitBreaker(**{"window": 30, "min_calls": 4, "error_rate": 0.5, "slow_call": 5,
+                             "slow_rate": 0.8, "open_seconds": 15, "probes": 1, **settings})
+
+
+def call(b, failed=False, seconds=0.1):
+    b.before_call()
+    b.record(failed, seconds)
+
+
+def trip(b):
+    for _ in range(b.min_calls):
+        call(b, failed=True)
+    assert b.state == OPEN
+
+
+def test_breaker_needs_min_calls_before_tripping(clock):
+    b = breaker()
+    for _ in range(3):
+        call(b, failed=True)
+    assert b.state == CLOSED
+    call(b, failed=True)
+    assert b.state == OPEN
+
+
+def test_breaker_opens_on_error_rate(clock):
+    b = breaker()
+    call(b)
+    call(b)
+    call(b, failed=True)
+    assert b.state == CLOSED
+    call(b, failed=True)  # 2 of 4 failed
+    assert b.state == OPEN
+    clock.now += 4
+    with pytest.raises(CircuitOpen) as e:
+        b.before_call()
+    assert e.value.retry_after == 11
+    assert b.stats()["rejected"] == 1
+
+
+def test_breaker_opens_on_slow_calls(clock):
+    b = breaker()
+    for _ in range(3):
+        call(b, seconds=6)
+    call(b, seconds=0.1)
+    assert b.state == CLOSED  # 3 of 4 slow is under 0.8
+    call(b, seconds=6)  # 4 of 5
+    assert b.state == OPEN
+
+
+def test_old_failures_leave_the_window(clock):
+    b = breaker()
+    for _ in range(3):
+        call(b, failed=True)
+    clock.now += 31
+    for _ in range(3):
+        call(b)
+    call(b, failed=True)
+    assert b.state == CLOSED  # 1 of 4 within the window
+
+
+def test_half_open_admits_only_the_probes(clock):
+    b = breaker(probes=1)
+    trip(b)
+    clock.now += 15
+    b.before_call()
+    assert b.state == HALF_OPEN
+    with pytest.raises(CircuitOpen) as e:
+        b.before_call()
+    assert e.value.retry_after == 1
+    assert b.stats()["probes"] == 1
+
+
+def test_fast_probe_closes(clock):
+    b = breaker()
+    trip(b)
+    clock.now += 15
+    call(b)
+    assert b.state == CLOSED
+    assert b.stats()["window_calls"] == 0  # the failures that tripped it are forgotten
+
+
+@pytest.mark.parametrize("failed, seconds", [(True, 0.1), (False, 6)])
+def test_failed_or_slow_probe_reopens(clock, failed, seconds):
+    b = breaker()
+    trip(b)
+    clock.now += 15
+    call(b, failed=failed, seconds=seconds)
+    assert b.state == OPEN
+    assert b.stats()["opened"] == 2
+    with pytest.raises(CircuitOpen) as e:
+        b.before_call()
+    assert e.value.retry_after == 15
+
+
+def test_stragglers_do_not_count_while_open(clock):
+    b = breaker()
+    trip(b)
+    b.record(False, 0.1)
+    b.record(True, 0.1)
+    assert b.state == OPEN
+    assert b.stats()["window_calls"] == 0
+
+
+def test_probe_is_released_when_the_call_raises(clock, monkeypatch):
+    b = breaker()
+    monkeypatch.setattr(upstream, "BREAKER", b)
+    trip(b)
+    clock.now += 15
+    b.before_call()
+
+    class Broken:
+        def post(self, *args, **kwargs):
+            raise ValueError("not a RequestException")
+
+    with pytest.raises(ValueError):
+        upstream._send(Broken(), "http://upstream.invalid", b"", {}, 1)
+    assert b.state == OPEN
+    clock.now += 15
+    b.before_call()  # a new probe is admitted
+    assert b.state == HALF_OPEN
+
+
+def test_hedger_waits_for_enough_samples():
+    h = Hedger(min_delay=0.05, budget=1.0)
+    for _ in range(upstream.HEDGE_MIN_SAMPLES - 1):
+        h.record_latency(0.2)
+    assert h.delay() is None
+    h.record_latency(0.2)
+    assert h.delay() == pytest.approx(0.2)
+
+
+def test_hedge_delay_is_the_p95_but_at_least_min_delay():
+    h = Hedger(min_delay=0.5, budget=1.0)
+    for i in range(100):
+        h.record_latency(i / 100)
+    assert h.delay() == pytest.approx(0.94)
+    fast = Hedger(min_delay=0.5, budget=1.0)
+    for _ in range(100):
+        fast.record_latency(0.01)
+    assert fast.delay() == 0.5
+
+
+def test_hedges_stay_within_the_budget():
+    h = Hedger(min_delay=0.05, budget=0.1)
+    for _ in range(upstream.HEDGE_MIN_SAMPLES):
+        h.record_latency(0.2)
+    for _ in range(200):
+        if h.delay() is not None:
+            h.count("hedged")  # as _send_hedged does when it sends the hedge
+    assert h.counters["attempts"] == 200
+    assert h.counters["hedged"] == 20
+
+
+@pytest.fixture
+def fresh_client(monkeypatch):
+    """A breaker that will not trip, no hedging and near-instant backoff."""
+    monkeypatch.setattr(upstream, "BREAKER", breaker(min_calls=1000))
+    monkeypatch.setattr(upstream, "HEDGER", Hedger())
+    monkeypatch.setattr(upstream, "UPSTREAM_HEDGE", False)
+    monkeypatch.setattr(upstream, "UPSTREAM_MAX_RETRIES", 2)
+    monkeypatch.setattr(upstream, "UPSTREAM_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(upstream, "UPSTREAM_BACKOFF_MAX", 0.02)
+
+
+def fake(**settings):
+    server, base_url, stats = start_fake(**settings)
+    return server, f"{base_url}/realtime/sessions", stats
+
+
+def post(url):
+    return upstream.post(url, b"{}", {"Authorization": "Bearer sk-test", "Content-Type": "application/json"})
+
+
+def test_server_errors_are_retried(fresh_client):
+    server, url, stats = fake(error_rate=1.0, error_status=503)
+    try:
+        resp = post(url)
+    finally:
+        server.shutdown()
+    assert resp.status_code == 503
+    assert stats["requests"] == 3
+
+
+def test_read_timeouts_are_not_retried(fresh_client, monkeypatch):
+    monkeypatch.setattr(upstream, "UPSTREAM_READ_TIMEOUT", 0.1)
+    server, url, stats = fake(latency=0.5)
+    try:
+        with pytest.raises(requests.ReadTimeout):
+            post(url)
+    finally:
+        server.shutdown()
+    assert stats["requests"] == 1
+
+
+def test_dropped_connections_are_retried(fresh_client):
+    server, url, _ = fake()
+    server.shutdown()
+    server.server_close()
+    before = upstream.stats().get("ConnectionError", 0)
+    with pytest.raises(requests.ConnectionError):
+        post(url)
+    assert upstream.stats()["ConnectionError"] - before == 3
+
+
+def test_breaker_stops_calls_to_a_failing_upstream(fresh_client, monkeypatch):
+    monkeypatch.setattr(upstream, "BREAKER", breaker(min_calls=3))
+    server, url, stats = fake(error_rate=1.0)
+    try:
+        assert post(url).status_code == 500
+        with pytest.raises(CircuitOpen):
+            post(url)
+    finally:
+        server.shutdown()
+    assert stats["requests"] == 3
+
+
+def test_slow_attempt_is_hedged(fresh_client, monkeypatch):
+    hedger = Hedger(min_delay=0.05, budget=1.0)
+    for _ in range(upstream.HEDGE_MIN_SAMPLES):
+        hedger.record_latency(0.01)
+    monkeypatch.setattr(upstream, "HEDGER", hedger)
+    monkeypatch.setattr(upstream, "UPSTREAM_HEDGE", True)
+    server, url, stats = fake(latency=0.3)
+    try:
+        assert post(url).status_code == 200
+    finally:
+        server.shutdown()
+    assert hedger.counters["hedged"] == 1
+    assert stats["requests"] == 2
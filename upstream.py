@@ -0,0 +1,362 @@
+# upstream.py — pooled, keep-alive HTTP client for calls to OpenAI
+# --------------------------------------------------------------
+# Every worker process keeps one requests.Session with a bounded connection
+# pool, so repeated /session calls reuse an open TCP+TLS connection instead
+# of paying a fresh handshake each time. 429/5xx answers and dropped
+# connections are retried with jittered exponential backoff.
+#
+# A circuit breaker per worker watches the last UPSTREAM_BREAKER_WINDOW
+# seconds of attempts. When too many of them fail (429, 5xx, timeouts,
+# dropped connections) or are slow, it opens: calls fail at once with
+# CircuitOpen for UPSTREAM_BREAKER_OPEN_SECONDS instead of each waiting out
+# the full timeout. Then a few probe calls go through (half-open); a
+# successful probe closes the breaker and a failed one opens it again.
+#
+# With UPSTREAM_HEDGE=1, an attempt still unanswered after the p95 of recent
+# latencies is sent a second time and whichever answers first is used.
+# Hedges are capped at UPSTREAM_HEDGE_BUDGET of all attempts so an incident
+# does not double the load on OpenAI. Each hedge can mint a session nobody
+# uses; unused ephemeral sessions simply expire.
+#
+# Tune with environment variables (seconds unless noted):
+#   UPSTREAM_CONNECT_TIMEOUT  UPSTREAM_READ_TIMEOUT
+#   UPSTREAM_POOL_SIZE (connections kept alive per worker)
+#   UPSTREAM_MAX_RETRIES (extra attempts after the first)
+#   UPSTREAM_BACKOFF_BASE  UPSTREAM_BACKOFF_MAX
+#   UPSTREAM_BREAKER_WINDOW  UPSTREAM_BREAKER_MIN_CALLS (attempts in the
+#   window before it can trip)  UPSTREAM_BREAKER_ERROR_RATE (fraction)
+#   UPSTREAM_BREAKER_SLOW_CALL  UPSTREAM_BREAKER_SLOW_RATE (fraction)
+#   UPSTREAM_BREAKER_OPEN_SECONDS  UPSTREAM_BREAKER_PROBES (half-open calls)
+#   UPSTREAM_HEDGE (0/1)  UPSTREAM_HEDGE_MIN_DELAY  UPSTREAM_HEDGE_BUDGET
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "10"))
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "10"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.25"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "2.0"))
+
+UPSTREAM_BREAKER_WINDOW = float(os.getenv("UPSTREAM_BREAKER_WINDOW", "30"))
+UPSTREAM_BREAKER_MIN_CALLS = int(os.getenv("UPSTREAM_BREAKER_MIN_CALLS", "5"))
+UPSTREAM_BREAKER_ERROR_RATE = float(os.getenv("UPSTREAM_BREAKER_ERROR_RATE", "0.5"))
+UPSTREAM_BREAKER_SLOW_CALL = float(os.getenv("UPSTREAM_BREAKER_SLOW_CALL", "5"))
+UPSTREAM_BREAKER_SLOW_RATE = float(os.getenv("UPSTREAM_BREAKER_SLOW_RATE", "0.8"))
+UPSTREAM_BREAKER_OPEN_SECONDS = float(os.getenv("UPSTREAM_BREAKER_OPEN_SECONDS", "15"))
+UPSTREAM_BREAKER_PROBES = int(os.getenv("UPSTREAM_BREAKER_PROBES", "1"))
+UPSTREAM_HEDGE = os.getenv("UPSTREAM_HEDGE", "0") == "1"
+UPSTREAM_HEDGE_MIN_DELAY = float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY", "0.5"))
+UPSTREAM_HEDGE_BUDGET = float(os.getenv("UPSTREAM_HEDGE_BUDGET", "0.1"))  # fraction of attempts
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+HEDGE_MIN_SAMPLES = 20  # latencies needed before the p95 means anything
+HEDGE_SAMPLES = 200
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+# Every attempt by outcome (status code or exception name), retries included
+attempt_counts = {}
+_counts_lock = threading.Lock()
+
+_hedge_pool = None
+_hedge_pool_pid = None
+
+
+class CircuitOpen(Exception):
+    """The breaker is open; retry_after is the wait in seconds until it probes again."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"OpenAI is not responding, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Error-rate and slow-call breaker over a sliding time window. Call
+    before_call() ahead of every attempt and record() with its outcome.
+    """
+
+    def __init__(self, window=UPSTREAM_BREAKER_WINDOW, min_calls=UPSTREAM_BREAKER_MIN_CALLS,
+                 error_rate=UPSTREAM_BREAKER_ERROR_RATE, slow_call=UPSTREAM_BREAKER_SLOW_CALL,
+                 slow_rate=UPSTREAM_BREAKER_SLOW_RATE, open_seconds=UPSTREAM_BREAKER_OPEN_SECONDS,
+                 probes=UPSTREAM_BREAKER_PROBES):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = CLOSED
+        self.counters = {"opened": 0, "rejected": 0, "probes": 0}
+        self._calls = deque()  # (finished at, failed, slow)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpen, or admit the call (as a probe when half-open)."""
+        with self._lock:
+            if self.state == OPEN:
+                wait_left = self._opened_at + self.open_seconds - time.monotonic()
+                if wait_left > 0:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpen(max(1, round(wait_left)))
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpen(1)
+                self._probes_in_flight += 1
+                self.counters["probes"] += 1
+
+    def record(self, failed, seconds):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or seconds >= self.slow_call:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._calls.clear()
+                return
+            if self.state == OPEN:
+                return  # a straggler from before the breaker opened
+            self._calls.append((now, failed, seconds >= self.slow_call))
+            while self._calls and self._calls[0][0] < now - self.window:
+                self._calls.popleft()
+            calls = len(self._calls)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow = sum(1 for _, _, slow in self._calls if slow)
+            if failures / calls >= self.error_rate or slow / calls >= self.slow_rate:
+                self._open(now)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["state"] = self.state
+            stats["window_calls"] = len(self._calls)
+            stats["window_failures"] = sum(1 for _, failed, _ in self._calls if failed)
+            stats["window_slow"] = sum(1 for _, _, slow in self._calls if slow)
+        return stats
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._calls.clear()
+        self.counters["opened"] += 1
+
+
+class Hedger:
+    """Recent latencies and the hedge budget; decides when to send a second attempt."""
+
+    def __init__(self, min_delay=UPSTREAM_HEDGE_MIN_DELAY, budget=UPSTREAM_HEDGE_BUDGET):
+        self.min_delay = min_delay
+        self.budget = budget
+        self.counters = {"attempts": 0, "hedged": 0, "hedge_won": 0}
+        self._latencies = deque(maxlen=HEDGE_SAMPLES)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Seconds to wait before hedging this attempt, or None to not hedge it."""
+        with self._lock:
+            self.counters["attempts"] += 1
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            if self.counters["hedged"] + 1 > self.budget * self.counters["attempts"]:
+                return None
+            ordered = sorted(self._latencies)
+        return max(self.min_delay, ordered[int(len(ordered) * 0.95) - 1])
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            ordered = sorted(self._latencies)
+        stats["enabled"] = UPSTREAM_HEDGE
+        stats["p95_ms"] = round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 1) \
+            if len(ordered) >= HEDGE_MIN_SAMPLES else None
+        return stats
+
+
+BREAKER = CircuitBreaker()
+HEDGER = Hedger()
+
+
+def get_session():
+    """
+    Return this process's pooled Session. Sockets must not be shared across
+    fork(), so a gunicorn worker that inherited one from the master builds
+    its own on first use.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                # pool_block=False: a burst larger than the pool opens extra
+                # short-lived connections instead of queueing behind the pool
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE,
+                                      pool_block=False, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def get_hedge_pool():
+    """This process's threads for hedged attempts (created after fork, like the Session)."""
+    global _hedge_pool, _hedge_pool_pid
+    pid = os.getpid()
+    if _hedge_pool is None or _hedge_pool_pid != pid:
+        with _session_lock:
+            if _hedge_pool is None or _hedge_pool_pid != pid:
+                _hedge_pool = ThreadPoolExecutor(max_workers=2 * UPSTREAM_POOL_SIZE,
+                                                 thread_name_prefix="upstream-hedge")
+                _hedge_pool_pid = pid
+    return _hedge_pool
+
+
+def stats():
+    """Attempts made by this process, by outcome."""
+    with _counts_lock:
+        return dict(attempt_counts)
+
+
+def _count(outcome):
+    with _counts_lock:
+        attempt_counts[outcome] = attempt_counts.get(outcome, 0) + 1
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After."""
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), UPSTREAM_BACKOFF_MAX)
+        except ValueError:
+            pass  # HTTP-date form; fall back to our own schedule
+    cap = min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def _send(session, url, data, headers, timeout):
+    """One attempt, counted and fed to the breaker and the latency samples."""
+    start = time.perf_counter()
+    try:
+        resp = session.post(url, data=data, headers=headers, timeout=timeout)
+    except BaseException as e:
+        # Anything raised here, not just RequestException, ends the attempt;
+        # a half-open probe that was never recorded would hold its slot forever
+        _count(type(e).__name__)
+        BREAKER.record(True, time.perf_counter() - start)
+        raise
+    elapsed = time.perf_counter() - start
+    _count(str(resp.status_code))
+    failed = resp.status_code in RETRY_STATUS_CODES
+    BREAKER.record(failed, elapsed)
+    if not failed:
+        HEDGER.record_latency(elapsed)
+    return resp
+
+
+def _answered(future):
+    """True when a finished attempt got a response that is not worth retrying."""
+    return future.exception() is None and future.result().status_code not in RETRY_STATUS_CODES
+
+
+def _close_unused(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+def _send_hedged(session, url, data, headers, timeout):
+    """
+    _send(), plus a second identical attempt if the first is still running
+    after the hedge delay. The first good answer wins; when neither is good,
+    the primary's response or error is what the caller sees.
+    """
+    delay = HEDGER.delay()
+    if delay is None:
+        return _send(session, url, data, headers, timeout)
+    pool = get_hedge_pool()
+    primary = pool.submit(_send, session, url, data, headers, timeout)
+    if wait([primary], timeout=delay).done:
+        return primary.result()
+    try:
+        BREAKER.before_call()
+    except CircuitOpen:
+        return primary.result()  # the breaker opened meanwhile; do not pile on
+    HEDGER.count("hedged")
+    hedge = pool.submit(_send, session, url, data, headers, timeout)
+
+    first = next(iter(wait([primary, hedge], return_when=FIRST_COMPLETED).done))
+    second = hedge if first is primary else primary
+    if _answered(first):
+        winner = first
+    else:
+        wait([second])
+        winner = second if _answered(second) else primary
+    loser = hedge if winner is primary else primary
+    loser.add_done_callback(_close_unused)
+    if winner is hedge:
+        HEDGER.count("hedge_won")
+    return winner.result()
+
+
+def post(url, data, headers):
+    """
+    POST through the pooled session. Returns the final Response (which may
+    still be an error status once retries run out) and raises the last
+    connection error if the upstream could never be reached, or CircuitOpen
+    while the breaker is open. Read timeouts are not retried: the upstream
+    may already have acted on the request.
+    """
+    session = get_session()
+    timeout = (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT)
+    send = _send_hedged if UPSTREAM_HEDGE else _send
+
+    for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+        last_attempt = attempt == UPSTREAM_MAX_RETRIES
+        BREAKER.before_call()
+        try:
+            resp = send(session, url, data, headers, timeout)
+        except requests.RequestException as e:
+            if not isinstance(e, requests.ConnectionError):
+                raise
+            if last_attempt:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        if resp.status_code in RETRY_STATUS_CODES and not last_attempt:
+            delay = backoff_delay(attempt, resp.headers.get("Retry-After"))
+            resp.close()
+            time.sleep(delay)
+            continue
+        return resp